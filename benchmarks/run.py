@@ -0,0 +1,181 @@
+"""Benchmarks on synthetic lines and DEMs: ``python -m line_node_processor.benchmarks.run``
+
+Times GeometrySampler, ElevationSampler, AttributeAssembler and the exporter
+separately and the whole NodePipeline end-to-end, for single and multipart
+lines of 10 … 1 000 000 vertices. Results (seconds, stations/s, peak traced
+memory) are compared with a JSON baseline; a stage slower or heavier than the
+baseline by more than ``--threshold`` fails the run (exit code 1).
+``--update`` rewrites the baseline instead.
+"""
+import argparse, json, os, platform, shutil, sys, tempfile, time, tracemalloc
+from typing import Callable, Dict, List
+import numpy as np
+
+from qgis.core import Qgis, QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsProject
+
+from ..core.sampling import GeometrySampler, ENGINE_NUMPY, ENGINES
+from ..core.elevation import ElevationSampler, MODE_WINDOW
+from ..core.raster_tiles import NEAREST
+from ..core.assembler import AttributeAssembler
+from ..core.columns import RowSchema, FeatureRecord
+from ..core.transform import BatchTransformer
+from ..infra.exporter import Exporter, StreamingExporter, CsvShpBackend
+from ..infra.pipeline import NodePipeline, PipelineParams, WGS84
+from .synthetic import EPSG, SEGMENT, line_geometry, line_layer, write_dem
+
+DEFAULT_SIZES = "10,1000,100000,1000000"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+STAGES = ("sampling", "elevation", "transform", "assembly", "export", "end_to_end")
+
+def measure(fn: Callable, repeat: int, memory: bool) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    out = {"seconds": best}
+    if memory:
+        # separate run: tracing slows Python-level allocation down
+        tracemalloc.start()
+        try:
+            fn()
+            out["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return out
+
+def run_case(name: str, n: int, parts: int, args, workdir: str) -> Dict[str, dict]:
+    geom = line_geometry(n, parts, seed=n)
+    bbox = geom.boundingBox()
+    margin = 10 * SEGMENT
+    dem_path = os.path.join(workdir, f"{name}.tif")
+    rlyr = write_dem(dem_path, bbox.xMinimum() - margin, bbox.yMinimum() - margin,
+                     bbox.xMaximum() + margin, bbox.yMaximum() + margin)
+    crs = QgsCoordinateReferenceSystem(f"EPSG:{EPSG}")
+    to_wgs84 = QgsCoordinateTransform(crs, WGS84, QgsProject.instance())
+    step = args.step
+
+    sampler = GeometrySampler(step, True, engine=args.engine)
+    xs, ys, kps = sampler.sample_arrays(geom)
+    stations = len(xs)
+    elev_sampler = ElevationSampler(rlyr, None, mode=args.dem_mode, interpolation=NEAREST)
+    elevs = elev_sampler.sample_xy(xs, ys)
+    batch = BatchTransformer(to_wgs84)
+    lons, lats = batch.transform_xy(xs, ys)
+    assembler = AttributeAssembler(to_wgs84, False)
+    record = FeatureRecord(0, "bench")
+    block = assembler.assemble_block(xs, ys, kps, elevs, lons, lats, record, step)
+    schema = RowSchema(None, int_distances=False)
+
+    def export():
+        out = os.path.join(workdir, "export")
+        os.makedirs(out, exist_ok=True)
+        stream = StreamingExporter([CsvShpBackend(Exporter(out, args.shp), crs, "bench", schema)])
+        stream.append_block("bench", block)
+        stream.close()
+
+    def elevation():
+        # the sampler (and its tile cache) is built once above: only the reads are timed,
+        # each repeat from a cold cache
+        if elev_sampler.tiles is not None:
+            elev_sampler.tiles.clear()
+        elev_sampler.sample_xy(xs, ys)
+
+    layer = line_layer([geom])
+
+    def end_to_end():
+        params = PipelineParams(os.path.join(workdir, "pipeline"), distance=step, dist_label="bench",
+                                write_shp=args.shp, engine=args.engine, dem_mode=args.dem_mode)
+        NodePipeline(layer, rlyr, params).run()
+
+    fns = {
+        "sampling": lambda: sampler.sample_arrays(geom),
+        "elevation": elevation,
+        "transform": lambda: batch.transform_xy(xs, ys),
+        "assembly": lambda: assembler.assemble_block(xs, ys, kps, elevs, lons, lats, record, step),
+        "export": export,
+        "end_to_end": end_to_end,
+    }
+    results = {}
+    for stage in STAGES:
+        r = measure(fns[stage], args.repeat, not args.no_memory)
+        r["stations"] = stations
+        r["stations_per_s"] = stations / r["seconds"] if r["seconds"] > 0 else float("inf")
+        results[stage] = r
+        print(f"{name:>16} {stage:>10}: {r['seconds']:9.4f}s {r['stations_per_s']:14.0f} st/s"
+              + (f" {r['peak_mb']:9.1f} MB" if "peak_mb" in r else ""), flush=True)
+    return results
+
+def compare(baseline: dict, current: dict, threshold: float, min_seconds: float = 0.005) -> List[str]:
+    """Regressions of ``current`` against ``baseline`` (both {case: {stage: metrics}})."""
+    out = []
+    for case, stages in current.items():
+        for stage, cur in stages.items():
+            ref = baseline.get(case, {}).get(stage)
+            if not ref:
+                continue
+            if cur["seconds"] >= min_seconds and cur["stations_per_s"] < ref["stations_per_s"] * (1 - threshold):
+                out.append(f"{case}/{stage}: {cur['stations_per_s']:.0f} st/s vs baseline {ref['stations_per_s']:.0f}")
+            if "peak_mb" in cur and "peak_mb" in ref and cur["peak_mb"] > ref["peak_mb"] * (1 + threshold) + 1.0:
+                out.append(f"{case}/{stage}: peak {cur['peak_mb']:.1f} MB vs baseline {ref['peak_mb']:.1f} MB")
+    return out
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="line_node_processor.benchmarks.run", description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="vertex counts, comma-separated")
+    ap.add_argument("--parts", default="1,10", help="part counts per line, comma-separated")
+    ap.add_argument("--step", type=float, default=SEGMENT, help="sampling distance (m)")
+    ap.add_argument("--engine", default=ENGINE_NUMPY, choices=list(ENGINES))
+    ap.add_argument("--dem-mode", default=MODE_WINDOW)
+    ap.add_argument("--shp", action="store_true", help="include Shapefile output in export stages")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    ap.add_argument("--output", help="also write the results to this JSON file")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    return ap
+
+def run(args) -> int:
+    workdir = tempfile.mkdtemp(prefix="lnp_bench_")
+    results = {}
+    try:
+        for n in (int(s) for s in args.sizes.split(",") if s.strip()):
+            for parts in (int(s) for s in args.parts.split(",") if s.strip()):
+                if parts > 1 and n < 2 * parts:
+                    continue
+                name = f"{'single' if parts == 1 else f'multi{parts}'}_{n}"
+                results[name] = run_case(name, n, parts, args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    doc = {"meta": {"python": platform.python_version(), "numpy": np.__version__, "qgis": Qgis.version(),
+                    "machine": platform.machine(), "engine": args.engine, "dem_mode": args.dem_mode,
+                    "step": args.step},
+           "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=1)
+    if args.update or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=1)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f).get("results", {})
+    regressions = compare(baseline, results, args.threshold)
+    for r in regressions:
+        print("REGRESSION", r, file=sys.stderr)
+    return 1 if regressions else 0
+
+def main(argv=None) -> int:
+    from ..cli import init_qgis
+    args = build_parser().parse_args(argv)
+    app = init_qgis()
+    try:
+        return run(args)
+    finally:
+        app.exitQgis()
+
+if __name__ == "__main__":
+    sys.exit(main())
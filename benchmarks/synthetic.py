@@ -0,0 +1,74 @@
+import math
+from typing import List, Tuple
+import numpy as np
+from qgis.core import QgsGeometry, QgsPointXY, QgsVectorLayer, QgsFeature, QgsField, QgsRasterLayer
+from qgis.PyQt.QtCore import QVariant
+
+try:
+    from osgeo import gdal, osr
+except ImportError:
+    gdal = None
+    osr = None
+
+EPSG = 32633       # projected, metres
+ORIGIN = (500000.0, 4500000.0)
+SEGMENT = 5.0      # mean vertex spacing (m)
+
+def random_walk(n: int, seed: int = 0, origin: Tuple[float, float] = ORIGIN) -> Tuple[np.ndarray, np.ndarray]:
+    # a gently meandering route of ``n`` vertices
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0.0, 0.15, n - 1))
+    step = rng.uniform(0.5, 1.5, n - 1) * SEGMENT
+    xs = np.concatenate([[0.0], np.cumsum(step * np.cos(heading))]) + origin[0]
+    ys = np.concatenate([[0.0], np.cumsum(step * np.sin(heading))]) + origin[1]
+    return xs, ys
+
+def line_geometry(n: int, parts: int = 1, seed: int = 0) -> QgsGeometry:
+    """A single- or multipart line with ``n`` vertices in total."""
+    xs, ys = random_walk(n, seed)
+    pts = [QgsPointXY(x, y) for x, y in zip(xs.tolist(), ys.tolist())]
+    if parts <= 1:
+        return QgsGeometry.fromPolylineXY(pts)
+    # consecutive pieces sharing their end vertices
+    bounds = np.linspace(0, n - 1, parts + 1).astype(int)
+    return QgsGeometry.fromMultiPolylineXY([pts[a:b + 1] for a, b in zip(bounds[:-1], bounds[1:]) if b > a])
+
+def line_layer(geoms: List[QgsGeometry], groups: int = 1) -> QgsVectorLayer:
+    # memory layer with an integer "route" group field and one text attribute
+    lyr = QgsVectorLayer(f"MultiLineString?crs=EPSG:{EPSG}", "bench_lines", "memory")
+    pr = lyr.dataProvider()
+    pr.addAttributes([QgsField("route", QVariant.Int), QgsField("name", QVariant.String)])
+    lyr.updateFields()
+    feats = []
+    for i, g in enumerate(geoms):
+        f = QgsFeature(lyr.fields())
+        f.setGeometry(g)
+        f.setAttributes([i % max(groups, 1), f"line {i}"])
+        feats.append(f)
+    pr.addFeatures(feats)
+    lyr.updateExtents()
+    return lyr
+
+def write_dem(path: str, xmin: float, ymin: float, xmax: float, ymax: float,
+              max_pixels: int = 4096, nodata: float = -9999.0) -> QgsRasterLayer:
+    """Smooth synthetic terrain as a tiled GeoTIFF covering the given extent."""
+    if gdal is None:
+        raise RuntimeError("GDAL Python bindings are required to write the synthetic DEM")
+    res = max((xmax - xmin) / max_pixels, (ymax - ymin) / max_pixels, 1.0)
+    nx = int(math.ceil((xmax - xmin) / res)) + 1
+    ny = int(math.ceil((ymax - ymin) / res)) + 1
+    ds = gdal.GetDriverByName("GTiff").Create(path, nx, ny, 1, gdal.GDT_Float32, options=["TILED=YES"])
+    ds.SetGeoTransform((xmin, res, 0.0, ymax, 0.0, -res))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ds.SetProjection(srs.ExportToWkt())
+    band = ds.GetRasterBand(1)
+    band.SetNoDataValue(nodata)
+    x = xmin + (np.arange(nx) + 0.5) * res
+    for r0 in range(0, ny, 256):
+        y = ymax - (np.arange(r0, min(r0 + 256, ny)) + 0.5) * res
+        z = 100.0 + 40.0 * np.sin(x[None, :] / 730.0) * np.cos(y[:, None] / 510.0) + 0.01 * (x[None, :] - xmin)
+        band.WriteArray(z.astype(np.float32), 0, r0)
+    ds.FlushCache()
+    ds = None
+    return QgsRasterLayer(path, "bench_dem")
@@ -0,0 +1,197 @@
+"""Batch runner: ``python -m line_node_processor.cli -o OUT [options] INPUT...``
+
+QGIS is initialised once per process and the DEM is opened once; every input
+file (or every vector file of an input folder) is written to ``OUT/<name>``.
+Set QGIS_PREFIX_PATH when QGIS is not installed in a standard location.
+"""
+import argparse, os, sys, time
+from typing import List
+
+from .core.options import (
+    ENGINES, ENGINE_NUMPY, GPKG_LAYOUTS, GPKG_SINGLE, DEM_ORDERS, ORDER_PRIORITY, Z_SOURCES, Z_GEOMETRY,
+    DEM_MODES, MODE_WINDOW, NEAREST, INDEX_FILE, TOPOLOGY_FILE
+)
+
+VECTOR_EXTS = (".shp", ".gpkg", ".geojson", ".json", ".fgb", ".gml", ".kml", ".tab", ".sqlite")
+
+class ConsoleFeedback:
+    # progress on stderr in 10 % steps
+    def __init__(self, name: str):
+        self.name = name
+        self.canceled = False
+        self._last = -1
+
+    def setProgress(self, value: float):
+        step = int(value) // 10
+        if step != self._last:
+            self._last = step
+            print(f"  {self.name}: {step * 10}%", file=sys.stderr, flush=True)
+
+    def isCanceled(self) -> bool:
+        return self.canceled
+
+def expand_inputs(paths: List[str]) -> List[str]:
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(os.path.join(p, f) for f in os.listdir(p) if f.lower().endswith(VECTOR_EXTS)))
+        else:
+            out.append(p)
+    return out
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="line_node_processor.cli", description="Sample nodes along line layers.")
+    ap.add_argument("inputs", nargs="+", help="line layers or folders of them")
+    ap.add_argument("-o", "--out", required=True, help="output folder (one sub-folder per input)")
+    ap.add_argument("-d", "--distance", default="", help='distance(s) in metres, e.g. "1,10,100"; blank ⇒ vertices only')
+    ap.add_argument("--dem", help="elevation raster")
+    ap.add_argument("--dem-tiles", nargs="+", default=[], help="raster files/folders sampled as one mosaic")
+    ap.add_argument("--dem-order", default=ORDER_PRIORITY, choices=list(DEM_ORDERS),
+                    help="mosaic fallback order: as listed, or finest resolution first")
+    ap.add_argument("--max-open-rasters", type=int, default=16)
+    ap.add_argument("--band", type=int, default=1)
+    ap.add_argument("--dem-mode", default=f"{MODE_WINDOW}:{NEAREST}", choices=[f"{m}:{i}" for m, i in DEM_MODES],
+                    help="read mode : interpolation")
+    ap.add_argument("--cache-mb", type=float, default=256)
+    ap.add_argument("--z-source", default=Z_GEOMETRY, choices=list(Z_SOURCES),
+                    help="3D lines: vertex Z with DEM gap filling, or the DEM only")
+    ap.add_argument("--group-field")
+    ap.add_argument("--where", help="process only the features matching this QGIS expression")
+    ap.add_argument("--extent", help="process only the features intersecting xmin,ymin,xmax,ymax (layer CRS)")
+    ap.add_argument("--cell-crossings", action="store_true", help="add a station at every cell boundary of --dem (numpy engine)")
+    ap.add_argument("--no-vertices", action="store_true", help="do not merge the original vertices")
+    ap.add_argument("--no-attrs", action="store_true", help="do not keep the layer attributes")
+    ap.add_argument("--formats", default="csv,shp", help="comma-separated: csv, shp, gpkg, parquet")
+    ap.add_argument("--gpkg-layout", default=GPKG_SINGLE, choices=list(GPKG_LAYOUTS))
+    ap.add_argument("--engine", default=ENGINE_NUMPY, choices=list(ENGINES))
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--cache", action="store_true", help="reuse results of unchanged features")
+    ap.add_argument("--profile", action="store_true", help="print stage timings and write node_timings.json")
+    ap.add_argument("--index", action="store_true", help=f"write {INDEX_FILE} for KP lookups")
+    ap.add_argument("--continuous-kp", action="store_true",
+                    help=f"chain the parts/features of each group into one route (gaps/branches: {TOPOLOGY_FILE})")
+    ap.add_argument("--snap-tolerance", type=float, default=0.01, help="endpoint snapping for --continuous-kp")
+    ap.add_argument("--group-ordered", action="store_true",
+                    help="read the features group by group and close each group's outputs when it is done")
+    return ap
+
+def init_qgis():
+    from qgis.core import QgsApplication
+    prefix = os.environ.get("QGIS_PREFIX_PATH")
+    if prefix:
+        QgsApplication.setPrefixPath(prefix, True)
+    app = QgsApplication([], False)
+    app.initQgis()
+    return app
+
+def run(args) -> int:
+    from qgis.core import QgsVectorLayer, QgsRasterLayer, QgsWkbTypes, QgsProject, QgsRectangle
+    from .infra.layer_io import CRSGuard
+    from .infra.pipeline import NodePipeline, PipelineParams, parse_distances
+    from .infra.timing import TIMINGS_FILE
+    from .core.mosaic import MosaicIndex
+
+    try:
+        distances, labels = parse_distances(args.distance)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    formats = {f.strip().lower() for f in args.formats.split(",") if f.strip()}
+    extent = None
+    if args.extent:
+        try:
+            xmin, ymin, xmax, ymax = (float(v) for v in args.extent.split(","))
+        except ValueError:
+            print("--extent must be xmin,ymin,xmax,ymax", file=sys.stderr)
+            return 2
+        if xmin > xmax or ymin > ymax:
+            print("--extent must be xmin,ymin,xmax,ymax with xmin <= xmax and ymin <= ymax", file=sys.stderr)
+            return 2
+        extent = QgsRectangle(xmin, ymin, xmax, ymax)
+    dem_mode, dem_interp = args.dem_mode.split(":")
+
+    rlyr = provider = None
+    if args.dem and not args.dem_tiles:
+        rlyr = QgsRasterLayer(args.dem, "dem")
+        if not rlyr.isValid():
+            print(f"Cannot open DEM {args.dem}", file=sys.stderr)
+            return 2
+        if CRSGuard.is_geographic(rlyr.crs()) or CRSGuard.map_units_not_meters(rlyr.crs()):
+            print("Elevation raster must be projected in meters.", file=sys.stderr)
+            return 2
+        provider = rlyr.dataProvider().clone()   # shared by every input
+
+    ctx = QgsProject.instance().transformContext()
+    mosaics = {}   # one MosaicIndex per input CRS, shared by the inputs
+    failed = 0
+    for path in expand_inputs(args.inputs):
+        name = os.path.splitext(os.path.basename(path))[0]
+        vlyr = QgsVectorLayer(path, name, "ogr")
+        if not vlyr.isValid() or vlyr.geometryType() != QgsWkbTypes.LineGeometry:
+            print(f"{path}: not a valid line layer, skipped", file=sys.stderr)
+            failed += 1
+            continue
+        if CRSGuard.is_geographic(vlyr.crs()) or CRSGuard.map_units_not_meters(vlyr.crs()):
+            print(f"{path}: layer must be projected in meters, skipped", file=sys.stderr)
+            failed += 1
+            continue
+        out_dir = os.path.join(args.out, name)
+        params = PipelineParams(
+            out_dir, distances=distances, dist_labels=labels,
+            keep_vertices=not args.distance.strip() or not args.no_vertices,
+            preserve_attrs=not args.no_attrs, write_shp="shp" in formats, group_field=args.group_field,
+            band=args.band, engine=args.engine, dem_mode=dem_mode, dem_interp=dem_interp,
+            cache_mb=args.cache_mb, workers=args.workers, write_csv="csv" in formats,
+            write_gpkg="gpkg" in formats, gpkg_layout=args.gpkg_layout,
+            write_parquet="parquet" in formats, use_cache=args.cache,
+            profile_path=os.path.join(out_dir, TIMINGS_FILE) if args.profile else None,
+            cell_crossings=args.cell_crossings, dem_sources=args.dem_tiles, dem_order=args.dem_order,
+            max_open_rasters=args.max_open_rasters, z_source=args.z_source, build_index=args.index,
+            continuous_kp=args.continuous_kp, snap_tolerance=args.snap_tolerance, group_ordered=args.group_ordered,
+            filter_expression=args.where, filter_extent=extent
+        )
+        mosaic = None
+        if args.dem_tiles:
+            key = vlyr.crs().authid() or vlyr.crs().toWkt()
+            if key not in mosaics:
+                try:
+                    mosaics[key] = MosaicIndex(args.dem_tiles, vlyr.crs(), ctx, order=args.dem_order)
+                except ValueError as e:
+                    print(e, file=sys.stderr)
+                    return 2
+                for p in mosaics[key].skipped:
+                    print(f"not a readable raster, skipped: {p}", file=sys.stderr)
+            mosaic = mosaics[key]
+        feedback = ConsoleFeedback(name)
+        t0 = time.perf_counter()
+        try:
+            pipeline = NodePipeline(vlyr, rlyr, params, transform_context=ctx, raster_provider=provider,
+                                    mosaic=mosaic)
+            result = pipeline.run(feedback)
+        except KeyboardInterrupt:
+            print(f"{path}: interrupted", file=sys.stderr)
+            return 130
+        except Exception as e:
+            print(f"{path}: failed: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        line = f"{path}: {result.features} features, {result.groups} groups in {time.perf_counter() - t0:.1f}s"
+        if result.cache_hits or result.cache_misses:
+            line += f" (cache {result.cache_hits} reused, {result.cache_misses} resampled)"
+        if result.topology_path:
+            line += f"; routes: {result.route_gaps} gaps, {result.route_branches} branches"
+        print(line)
+        if result.timings is not None:
+            print(result.timings.summary())
+    return 1 if failed else 0
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    app = init_qgis()
+    try:
+        return run(args)
+    finally:
+        app.exitQgis()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,62 @@
-from typing import Dict, Any, Optional
-from qgis.core import QgsPointXY, QgsCoordinateTransform, QgsFeature
+from typing import Optional
+import numpy as np
+from qgis.core import QgsCoordinateTransform, QgsFeature
+
+from .azimuth import Azimuth
+from .columns import FeatureRecord, SampleBlock, RowSchema
+from .rounding import round_array, round_array_by_distance
 
 class AttributeAssembler:
-    def __init__(self, xform_to_wgs84: QgsCoordinateTransform, preserve_attrs: bool):
+    def __init__(self, xform_to_wgs84: QgsCoordinateTransform, preserve_attrs: bool,
+                 schema: Optional[RowSchema] = None):
+        # schema: output header of the layer; built from the first feature when omitted
         self.to_wgs84 = xform_to_wgs84
         self.preserve_attrs = preserve_attrs
-    def assemble_row(self, xy: QgsPointXY, elev, d2d, d3d, azimuth, kp, total3d,
-                     feature: QgsFeature, group_field: Optional[str], group_value: str) -> Dict[str, Any]:
-        ll = self.to_wgs84.transform(xy)
-        row = {
-            "Longitude": round(ll.x(),8), "Latitude": round(ll.y(),8),
-            "Easting": xy.x(), "Northing": xy.y(),
-            "Elevation": elev, "Distance": d2d, "Length_3D": d3d,
-            "Azimuth": None if azimuth is None else round(azimuth, 3),
-            "KP": kp, "Total_3D_Length": total3d,
-        }
-        if group_field: row[group_field] = group_value
-        else: row["Group"] = group_value
-        if self.preserve_attrs:
-            for f in feature.fields():
-                name = f.name()
-                if name in row: row[f"attr_{name}"] = feature[name]
-                else: row[name] = feature[name]
-        return row
+        self.schema = schema
+
+    def _schema_for(self, feature: QgsFeature, group_field: Optional[str]) -> RowSchema:
+        # attr_ renames are resolved once per layer schema, not per row
+        if self.schema is None:
+            names = feature.fields().names() if self.preserve_attrs else ()
+            self.schema = RowSchema(group_field, names)
+        return self.schema
+
+    # ---- columnar path ----
+    def feature_record(self, feature: QgsFeature, group_value: str,
+                       group_field: Optional[str] = None) -> FeatureRecord:
+        schema = self._schema_for(feature, group_field)
+        attrs = feature.attributes() if (self.preserve_attrs and schema.attr_names) else ()
+        return FeatureRecord(feature.id(), group_value, attrs, schema.attr_columns)
+
+    def assemble_block(self, xs: np.ndarray, ys: np.ndarray, kps: np.ndarray, elevs: Optional[np.ndarray],
+                       lons: np.ndarray, lats: np.ndarray, record: FeatureRecord, step: float) -> SampleBlock:
+        # station values along one part; elevs is None without DEM
+        n = len(xs)
+        nan = np.full(n, np.nan)
+        d2d = nan.copy()
+        if n > 1:
+            dx, dy = np.diff(xs), np.diff(ys)
+            d2d[1:] = np.sqrt(dx*dx + dy*dy)
+        d2d_r = round_array_by_distance(d2d, step)
+
+        if elevs is not None:
+            # 若任一端 elevation 缺值 ⇒ 用 2D 代替該段 3D；否則真 3D
+            d3d = nan.copy()
+            if n > 1:
+                dz = np.diff(elevs)
+                d3d[1:] = np.where(np.isnan(dz), d2d[1:], np.sqrt(d2d[1:]*d2d[1:] + dz*dz))
+            d3d_r = round_array_by_distance(d3d, step)
+            # 保障 3D >= 2D
+            d3d_r = np.where(d3d_r < d2d_r, d2d_r, d3d_r)
+            total = np.cumsum(np.nan_to_num(d3d_r))
+            total3d = round_array_by_distance(total, step)
+            total3d[total == 0] = np.nan
+            elev = elevs
+        else:
+            d3d_r, total3d, elev = nan, nan, nan
+
+        return SampleBlock(
+            record, xs, ys, round_array(lons, 8), round_array(lats, 8), elev,
+            d2d_r, d3d_r, round_array(Azimuth.compute_array(xs, ys), 3),
+            round_array_by_distance(kps, step), total3d
+        )
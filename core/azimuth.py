@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from qgis.core import QgsPointXY
 class Azimuth:
     @staticmethod
@@ -8,3 +9,14 @@ class Azimuth:
         if dx == 0 and dy == 0: return None
         ang = math.degrees(math.atan2(dx, dy))  # 0=N, 90=E
         return (ang + 360.0) % 360.0
+
+    @staticmethod
+    def compute_array(xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        # azimuth from the previous station; NaN for the first station and zero-length steps
+        out = np.full(len(xs), np.nan)
+        if len(xs) < 2: return out
+        dx, dy = np.diff(xs), np.diff(ys)
+        ang = (np.degrees(np.arctan2(dx, dy)) + 360.0) % 360.0
+        ang[(dx == 0) & (dy == 0)] = np.nan
+        out[1:] = ang
+        return out
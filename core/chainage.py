@@ -0,0 +1,115 @@
+import math
+import numpy as np
+
+# Pure NumPy chainage helpers shared by the sampling engines (no QGIS imports).
+
+def cumulative_lengths(xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    n = len(xs)
+    chain = np.zeros(n, dtype=float)
+    if n > 1:
+        np.cumsum(np.hypot(np.diff(xs), np.diff(ys)), out=chain[1:])
+    return chain
+
+def fixed_step_distances(length: float, step: float) -> np.ndarray:
+    """Stations at 0, s, 2s, ... (< length) plus the endpoint, like the legacy while-loop."""
+    L = float(length)
+    s = float(step) if step and step > 0 else L
+    if L <= 0 or s <= 0:
+        return np.zeros(1, dtype=float)
+    n = max(int(math.ceil((L - 1e-9) / s)), 1)
+    ds = np.arange(n, dtype=float) * s
+    ds = ds[ds < L - 1e-9]
+    return np.append(ds, L)
+
+def interpolate_along(xs: np.ndarray, ys: np.ndarray, chain: np.ndarray, ds: np.ndarray):
+    """Positions at chainages ``ds`` (sorted) on the polyline ``xs/ys`` with cumulative ``chain``."""
+    n = len(xs)
+    if n < 2:
+        return np.full(len(ds), xs[0] if n else np.nan), np.full(len(ds), ys[0] if n else np.nan)
+    idx = np.searchsorted(chain, ds, side="right") - 1
+    np.clip(idx, 0, n - 2, out=idx)
+    seg = chain[idx + 1] - chain[idx]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(seg > 0, (ds - chain[idx]) / seg, 0.0)
+    x = xs[idx] + t * (xs[idx + 1] - xs[idx])
+    y = ys[idx] + t * (ys[idx + 1] - ys[idx])
+    return x, y
+
+def interpolate_z(chain: np.ndarray, zs: np.ndarray, ds: np.ndarray) -> np.ndarray:
+    """Vertex Z linearly interpolated at chainages ``ds``; NaN next to a vertex without Z."""
+    if not len(zs):
+        return np.full(len(ds), np.nan)
+    return np.interp(ds, chain, zs)
+
+def cell_crossings(fcol: np.ndarray, frow: np.ndarray, chain: np.ndarray) -> np.ndarray:
+    """Chainages where a polyline crosses a raster cell boundary (grid traversal).
+
+    ``fcol/frow`` are the vertices in fractional pixel coordinates, ``chain`` their
+    chainage; a crossing at parameter t of a segment is mapped to chain + t * length.
+    All segments are walked at once: each one yields the integer grid lines in
+    (lo, hi] of its column and row ranges.
+    """
+    if len(fcol) < 2:
+        return np.empty(0)
+    seg = np.diff(chain)
+    out = []
+    for c in (fcol, frow):
+        a, b = c[:-1], c[1:]
+        flo = np.floor(np.minimum(a, b))
+        n = (np.floor(np.maximum(a, b)) - flo).astype(np.int64)
+        total = int(n.sum())
+        if not total:
+            continue
+        idx = np.repeat(np.arange(len(a)), n)
+        # k-th grid line of a segment: flo + 1 + k
+        k = np.arange(total) - np.repeat(np.cumsum(n) - n, n)
+        lines = flo[idx] + 1 + k
+        t = (lines - a[idx]) / (b[idx] - a[idx])
+        out.append(chain[idx] + t * seg[idx])
+    return np.sort(np.concatenate(out)) if out else np.empty(0)
+
+# Two points closer than this in KP, x and y are considered the same station.
+COINCIDENT_TOL = 1e-6
+
+def merge_sorted(ax, ay, ak, bx, by, bk):
+    """Stable two-way merge of two KP-ordered station sets; on equal KP ``a`` comes first."""
+    n, m = len(ak), len(bk)
+    pos_a = np.arange(n) + np.searchsorted(bk, ak, side="left")
+    pos_b = np.arange(m) + np.searchsorted(ak, bk, side="right")
+    out = []
+    for a, b in ((ax, bx), (ay, by), (ak, bk)):
+        c = np.empty(n + m, dtype=float)
+        c[pos_a] = a; c[pos_b] = b
+        out.append(c)
+    return out[0], out[1], out[2]
+
+def drop_coincident(xs, ys, ks, tol: float = COINCIDENT_TOL):
+    # input is KP-ordered, so coincident stations are always neighbours
+    if len(ks) < 2:
+        return xs, ys, ks
+    keep = np.ones(len(ks), dtype=bool)
+    keep[1:] = ((np.abs(np.diff(ks)) > tol) | (np.abs(np.diff(xs)) > tol)
+                | (np.abs(np.diff(ys)) > tol))
+    return xs[keep], ys[keep], ks[keep]
+
+def merge_station_lists(a_pts, a_kp, b_pts, b_kp, tol: float = COINCIDENT_TOL):
+    """Streaming merge of two KP-ordered (point, kp) sequences with coincidence dedupe.
+
+    Points only need ``x()``/``y()``; stations from ``a`` win ties, as the stable
+    sort of the legacy implementation did.
+    """
+    out = []
+    i = j = 0
+    n, m = len(a_kp), len(b_kp)
+    last = None; lk = lx = ly = 0.0
+    while i < n or j < m:
+        if j >= m or (i < n and a_kp[i] <= b_kp[j]):
+            p, k = a_pts[i], a_kp[i]; i += 1
+        else:
+            p, k = b_pts[j], b_kp[j]; j += 1
+        x, y = p.x(), p.y()
+        if last is not None and abs(k - lk) <= tol and abs(x - lx) <= tol and abs(y - ly) <= tol:
+            continue
+        out.append((p, k))
+        last, lk, lx, ly = p, k, x, y
+    return out
@@ -0,0 +1,82 @@
+from typing import List, Optional, Sequence
+import numpy as np
+
+# Output columns computed per station, in CSV/SHP order.
+BASE_COLUMNS = [
+    "Longitude", "Latitude", "Easting", "Northing", "Elevation",
+    "Distance", "Length_3D", "Azimuth", "KP", "Total_3D_Length",
+]
+# columns rounded by round_by_distance (ints when the step is >= 10 m)
+DISTANCE_COLUMNS = ("Distance", "Length_3D", "KP", "Total_3D_Length")
+
+class RowSchema:
+    """Output header of one run: station columns, group column, preserved attributes."""
+
+    def __init__(self, group_field: Optional[str], attr_names: Sequence[str] = (), int_distances: bool = False):
+        self.group_column = group_field or "Group"
+        taken = set(BASE_COLUMNS) | {self.group_column}
+        # a layer field clashing with an output column is exported as attr_<name>
+        self.attr_names = list(attr_names)
+        self.attr_columns = [f"attr_{n}" if n in taken else n for n in self.attr_names]
+        self.header = BASE_COLUMNS + [self.group_column] + self.attr_columns
+        self.int_distances = bool(int_distances)
+
+class FeatureRecord:
+    # per-feature values shared by every station of the feature; writers broadcast
+    # them to the rows, ``columns`` is the (shared) renamed attribute header
+    __slots__ = ("fid", "group_value", "attrs", "columns", "_tail", "_cells")
+
+    def __init__(self, fid, group_value: str, attrs: Sequence = (), columns: Sequence[str] = ()):
+        self.fid = fid
+        self.group_value = group_value
+        self.attrs = tuple(attrs or ())
+        self.columns = columns
+        self._tail = None
+        self._cells = None
+
+    def tail(self) -> list:
+        if self._tail is None:
+            self._tail = [self.group_value, *self.attrs]
+        return self._tail
+
+    def cells(self, fmt) -> list:
+        # formatted tail, computed once per feature and formatter (multipart parts share it)
+        if self._cells is None or self._cells[0] is not fmt:
+            self._cells = (fmt, [fmt(v) for v in self.tail()])
+        return self._cells[1]
+
+class SampleBlock:
+    """Columnar stations of one line part (NaN marks a missing value)."""
+
+    __slots__ = ("record", "x", "y", "lon", "lat", "elev", "d2d", "d3d", "azimuth", "kp", "total3d")
+
+    def __init__(self, record: FeatureRecord, x, y, lon, lat, elev, d2d, d3d, azimuth, kp, total3d):
+        self.record = record
+        self.x, self.y, self.lon, self.lat = x, y, lon, lat
+        self.elev, self.d2d, self.d3d, self.azimuth = elev, d2d, d3d, azimuth
+        self.kp, self.total3d = kp, total3d
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def arrays(self) -> List[np.ndarray]:
+        # in BASE_COLUMNS order
+        return [self.lon, self.lat, self.x, self.y, self.elev,
+                self.d2d, self.d3d, self.azimuth, self.kp, self.total3d]
+
+    def column_values(self, schema: RowSchema) -> List[list]:
+        # Python values per base column: None for NaN, ints for integer-rounded distances
+        cols = []
+        for name, arr in zip(BASE_COLUMNS, self.arrays()):
+            vals = arr.tolist()
+            if schema.int_distances and name in DISTANCE_COLUMNS:
+                cols.append([None if v != v else int(v) for v in vals])
+            else:
+                cols.append([None if v != v else v for v in vals])
+        return cols
+
+    def rows(self, schema: RowSchema):
+        # row value lists (base columns + group + attributes)
+        tail = self.record.tail()
+        for vals in zip(*self.column_values(schema)):
+            yield list(vals) + tail
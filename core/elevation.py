@@ -1,16 +1,38 @@
-from typing import Optional, Any
+from typing import Optional, Any, Sequence
+import math
+import numpy as np
 from qgis.core import QgsRasterLayer, QgsPointXY
 
+from .transform import BatchTransformer
+from .options import MODE_POINT, MODE_WINDOW, MODE_TILED
+from .raster_tiles import RasterReader, TileCache, Window, interpolate_grid, NEAREST, BILINEAR
+
+# largest window read in one request; bigger batches are split along the point order
+MAX_WINDOW_PIXELS = 16 * 1024 * 1024
+
 class ElevationSampler:
-    def __init__(self, raster: Optional[QgsRasterLayer], xform_to_raster, band: int = 1):
+    def __init__(self, raster: Optional[QgsRasterLayer], xform_to_raster, band: int = 1,
+                 mode: str = MODE_POINT, interpolation: str = NEAREST, cache_mb: float = 256,
+                 provider=None):
+        # provider: optional clone of raster.dataProvider() for use off the main thread
         self.raster = raster
-        self.provider = raster.dataProvider() if raster else None
-        self.xform = xform_to_raster
+        self.provider = provider or (raster.dataProvider() if raster else None)
+        self.batch = xform_to_raster if isinstance(xform_to_raster, BatchTransformer) else BatchTransformer(xform_to_raster)
+        self.xform = None if self.batch.identity else self.batch.xform
         self.band = int(band or 1)
         try:
             self.nodata = self.provider.sourceNoDataValue(self.band) if self.provider else None
         except Exception:
             self.nodata = None
+        self.mode = mode
+        self.interpolation = interpolation if interpolation in (NEAREST, BILINEAR) else NEAREST
+        self.tiles = None
+        self.reader = None
+        if self.provider and mode == MODE_TILED:
+            self.tiles = TileCache(self.provider, self.band, nodata=self.nodata,
+                                   max_bytes=int(float(cache_mb) * 1024 * 1024))
+        elif self.provider and mode == MODE_WINDOW:
+            self.reader = RasterReader(self.provider, self.band, nodata=self.nodata)
 
     def _norm(self, res: Any):
         ok = True; val = None
@@ -30,10 +52,66 @@ class ElevationSampler:
             return None
         return v
 
+    def _tiled_raster_xy(self, rx: np.ndarray, ry: np.ndarray) -> np.ndarray:
+        fcol, frow = self.tiles.grid.to_pixel(rx, ry)
+        return interpolate_grid(self.tiles.values, fcol, frow, self.interpolation)
+
     def sample(self, xy: QgsPointXY):
         if not self.provider: return None
         try:
             pt = self.xform.transform(xy) if self.xform else xy
+            if self.tiles is not None:
+                v = float(self._tiled_raster_xy(np.array([pt.x()]), np.array([pt.y()]))[0])
+                return None if v != v else v
             return self._norm(self.provider.sample(pt, self.band))
         except Exception:
             return None
+
+    def _window_raster_xy(self, rx: np.ndarray, ry: np.ndarray) -> np.ndarray:
+        grid = self.reader.grid
+        fcol, frow = grid.to_pixel(rx, ry)
+        out = np.full(len(rx), np.nan)
+        ok = np.isfinite(fcol) & np.isfinite(frow)
+        if not ok.any():
+            return out
+        pad = 1 if self.interpolation == BILINEAR else 0
+        c0 = max(int(math.floor(fcol[ok].min())) - pad, 0)
+        r0 = max(int(math.floor(frow[ok].min())) - pad, 0)
+        c1 = min(int(math.floor(fcol[ok].max())) + pad, grid.width - 1)
+        r1 = min(int(math.floor(frow[ok].max())) + pad, grid.height - 1)
+        if c1 < c0 or r1 < r0:
+            return out  # batch lies entirely off the raster
+        if (c1 - c0 + 1) * (r1 - r0 + 1) > MAX_WINDOW_PIXELS and len(rx) > 1:
+            # long diagonal parts: halve the batch, stations are spatially ordered
+            h = len(rx) // 2
+            return np.concatenate((self._window_raster_xy(rx[:h], ry[:h]),
+                                   self._window_raster_xy(rx[h:], ry[h:])))
+        win = Window(self.reader, c0, r0, c1 - c0 + 1, r1 - r0 + 1)
+        return interpolate_grid(win.values, fcol, frow, self.interpolation)
+
+    def sample_xy(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Elevations for a batch of layer-CRS coordinates; NaN where there is no value."""
+        n = len(xs)
+        if not self.provider or n == 0:
+            return np.full(n, np.nan)
+        if self.tiles is None and self.reader is None:
+            vals = [self.sample(QgsPointXY(x, y)) for x, y in zip(xs, ys)]
+            return np.array([np.nan if v is None else v for v in vals], dtype=float)
+        try:
+            rx, ry = self.batch.transform_xy(xs, ys)
+            return self.sample_raster_xy(rx, ry)
+        except Exception:
+            return np.full(n, np.nan)
+
+    def sample_raster_xy(self, rx: np.ndarray, ry: np.ndarray) -> np.ndarray:
+        # coordinates already in the raster CRS (tiled/window modes)
+        if self.tiles is not None:
+            return self._tiled_raster_xy(rx, ry)
+        return self._window_raster_xy(rx, ry)
+
+    def sample_many(self, points: Sequence[QgsPointXY]) -> np.ndarray:
+        """Elevations for all stations of one line part (one window read in window mode)."""
+        n = len(points)
+        xs = np.fromiter((p.x() for p in points), dtype=float, count=n)
+        ys = np.fromiter((p.y() for p in points), dtype=float, count=n)
+        return self.sample_xy(xs, ys)
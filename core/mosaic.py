@@ -0,0 +1,159 @@
+import os, threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+import numpy as np
+from qgis.core import (
+    QgsRasterLayer, QgsSpatialIndex, QgsRectangle, QgsCoordinateTransform, QgsCoordinateReferenceSystem,
+    QgsUnitTypes
+)
+
+from .elevation import ElevationSampler, MODE_WINDOW
+from .raster_tiles import NEAREST
+from .options import ORDER_PRIORITY, ORDER_RESOLUTION
+
+RASTER_EXTS = (".tif", ".tiff", ".vrt", ".img", ".asc", ".dem", ".bil", ".hgt", ".nc", ".jp2")
+
+def expand_rasters(paths: Sequence[str]) -> List[str]:
+    # files as given; folders contribute their raster files sorted by name
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(os.path.join(p, f) for f in os.listdir(p) if f.lower().endswith(RASTER_EXTS)))
+        elif p:
+            out.append(p)
+    return out
+
+class RasterFootprint:
+    __slots__ = ("fid", "path", "crs", "extent", "res", "priority")
+
+    def __init__(self, fid: int, path: str, crs: QgsCoordinateReferenceSystem, extent: QgsRectangle,
+                 res: float, priority: int):
+        self.fid = fid
+        self.path = path
+        self.crs = crs
+        self.extent = extent      # in the line layer CRS
+        self.res = res            # cell size in layer CRS units
+        self.priority = priority
+
+class MosaicIndex:
+    """Footprints of a raster set in an R-tree, in the CRS of the line layer.
+
+    Every raster is opened once here to read its extent, CRS and cell size and
+    then released; samplers open providers on demand. Shared by worker threads.
+    Raises ValueError when a raster is not projected in metres (3D lengths and
+    the cell sizes compared by ORDER_RESOLUTION would be wrong).
+    """
+
+    def __init__(self, paths: Sequence[str], layer_crs: QgsCoordinateReferenceSystem, transform_context,
+                 order: str = ORDER_PRIORITY):
+        self.layer_crs = layer_crs
+        self.transform_context = transform_context
+        self.order = order
+        self.footprints: List[RasterFootprint] = []
+        self.skipped: List[str] = []
+        self.index = QgsSpatialIndex()
+        self._lock = threading.Lock()
+        not_metric = []
+        for path in expand_rasters(paths):
+            lyr = QgsRasterLayer(path, os.path.basename(path))
+            if not lyr.isValid():
+                self.skipped.append(path)
+                continue
+            if lyr.crs().isGeographic() or lyr.crs().mapUnits() != QgsUnitTypes.DistanceMeters:
+                not_metric.append(path)
+                continue
+            ext = lyr.extent()
+            if lyr.crs() != layer_crs:
+                ext = QgsCoordinateTransform(lyr.crs(), layer_crs, transform_context).transformBoundingBox(ext)
+            # cell size from the footprint in layer units, so that rasters in degrees
+            # and in metres compare for ORDER_RESOLUTION
+            res = max(ext.width() / max(lyr.width(), 1), ext.height() / max(lyr.height(), 1))
+            fp = RasterFootprint(len(self.footprints), path, lyr.crs(), ext, res, len(self.footprints))
+            self.footprints.append(fp)
+            self.index.addFeature(fp.fid, ext)
+        if not_metric:
+            raise ValueError("Elevation rasters must be projected in meters:\n" + "\n".join(not_metric[:10]))
+
+    def __len__(self) -> int:
+        return len(self.footprints)
+
+    def candidates(self, rect: QgsRectangle) -> List[RasterFootprint]:
+        with self._lock:
+            ids = self.index.intersects(rect)
+        fps = [self.footprints[i] for i in ids]
+        if self.order == ORDER_RESOLUTION:
+            fps.sort(key=lambda f: (f.res, f.priority))
+        else:
+            fps.sort(key=lambda f: f.priority)
+        return fps
+
+    def stamp(self) -> tuple:
+        # identity of the set for result caching
+        out = []
+        for fp in self.footprints:
+            try:
+                st = os.stat(fp.path)
+                out.append(f"{fp.path}:{st.st_mtime_ns}:{st.st_size}")
+            except OSError:
+                out.append(fp.path)
+        return (self.order, *out)
+
+class MosaicSampler:
+    """ElevationSampler over a MosaicIndex.
+
+    A batch goes only to the rasters whose footprint it touches, in fallback
+    order; later rasters fill just the stations still without a value. At most
+    ``max_open`` providers stay open (least recently used are dropped). One
+    instance per thread.
+    """
+
+    def __init__(self, mosaic: MosaicIndex, band: int = 1, mode: str = MODE_WINDOW,
+                 interpolation: str = NEAREST, cache_mb: float = 256, max_open: int = 16):
+        self.mosaic = mosaic
+        self.band = int(band or 1)
+        self.mode = mode
+        self.interpolation = interpolation
+        self.max_open = max(int(max_open), 1)
+        self.cache_mb = max(float(cache_mb) / self.max_open, 16.0)
+        self._open: "OrderedDict[int, ElevationSampler]" = OrderedDict()
+
+    def _sampler(self, fp: RasterFootprint) -> Optional[ElevationSampler]:
+        s = self._open.get(fp.fid)
+        if s is not None:
+            self._open.move_to_end(fp.fid)
+            return s
+        lyr = QgsRasterLayer(fp.path, os.path.basename(fp.path))
+        if not lyr.isValid():
+            return None
+        xform = None
+        if fp.crs != self.mosaic.layer_crs:
+            xform = QgsCoordinateTransform(self.mosaic.layer_crs, fp.crs, self.mosaic.transform_context)
+        s = ElevationSampler(lyr, xform, band=self.band, mode=self.mode, interpolation=self.interpolation,
+                             cache_mb=self.cache_mb)
+        while len(self._open) >= self.max_open:
+            self._open.popitem(last=False)
+        self._open[fp.fid] = s
+        return s
+
+    def sample_xy(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Elevations for a batch of layer-CRS coordinates; NaN where no raster has a value."""
+        n = len(xs)
+        out = np.full(n, np.nan)
+        if n == 0:
+            return out
+        ok = np.isfinite(xs) & np.isfinite(ys)
+        if not ok.any():
+            return out
+        rect = QgsRectangle(float(xs[ok].min()), float(ys[ok].min()), float(xs[ok].max()), float(ys[ok].max()))
+        for fp in self.mosaic.candidates(rect):
+            e = fp.extent
+            todo = np.flatnonzero(np.isnan(out) & ok & (xs >= e.xMinimum()) & (xs <= e.xMaximum())
+                                  & (ys >= e.yMinimum()) & (ys <= e.yMaximum()))
+            if not len(todo):
+                continue
+            s = self._sampler(fp)
+            if s is not None:
+                out[todo] = s.sample_xy(xs[todo], ys[todo])
+            if not np.isnan(out[ok]).any():
+                break
+        return out
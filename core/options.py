@@ -0,0 +1,35 @@
+# Option values and output file names shared by the engine modules and the front
+# ends. Nothing is imported here, so the Processing provider and the CLI parser
+# can use them without loading QGIS or NumPy modules.
+
+ENGINE_NUMPY = "numpy"   # vertex arrays + cumulative chainage, KP = chainage
+ENGINE_QGIS = "qgis"     # legacy: interpolate() + lineLocatePoint() per station
+ENGINES = (ENGINE_NUMPY, ENGINE_QGIS)
+
+MODE_POINT = "point"    # provider.sample() per station (legacy)
+MODE_WINDOW = "window"  # one provider.block() window per batch (line part)
+MODE_TILED = "tiled"    # provider.block() tiles in an LRU cache, batch evaluation
+
+NEAREST = "nearest"
+BILINEAR = "bilinear"
+# (read mode, interpolation) pairs the front ends offer; per-point reads have no interpolation
+DEM_MODES = ((MODE_WINDOW, NEAREST), (MODE_WINDOW, BILINEAR), (MODE_POINT, NEAREST),
+             (MODE_TILED, NEAREST), (MODE_TILED, BILINEAR))
+
+ORDER_PRIORITY = "priority"      # the order the rasters were given in (folders: by file name)
+ORDER_RESOLUTION = "resolution"  # finest cell size first, then priority
+DEM_ORDERS = (ORDER_PRIORITY, ORDER_RESOLUTION)
+
+Z_GEOMETRY = "geometry"   # Z of 3D lines; the DEM only fills stations without Z
+Z_DEM = "dem"             # DEM for every station, geometry Z ignored
+Z_SOURCES = (Z_GEOMETRY, Z_DEM)
+
+GPKG_SINGLE = "single"   # one layer, group column indexed
+GPKG_LAYERS = "layers"   # one layer per group
+GPKG_LAYOUTS = (GPKG_SINGLE, GPKG_LAYERS)
+
+FORMAT_PYTHON = "python"  # CSV numbers: float repr per cell
+FORMAT_NUMPY = "numpy"    # CSV numbers: whole columns formatted by NumPy
+
+INDEX_FILE = "chainage_index.npz"
+TOPOLOGY_FILE = "route_topology.csv"
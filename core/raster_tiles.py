@@ -0,0 +1,139 @@
+from collections import OrderedDict
+import math
+import numpy as np
+from qgis.core import Qgis, QgsRectangle
+
+from .options import NEAREST, BILINEAR
+
+_NP_DTYPES = {}
+for _name, _dt in (("Byte", np.uint8), ("UInt16", np.uint16), ("Int16", np.int16),
+                   ("UInt32", np.uint32), ("Int32", np.int32),
+                   ("Float32", np.float32), ("Float64", np.float64)):
+    _v = getattr(Qgis, _name, None)
+    if _v is None:
+        _v = getattr(getattr(Qgis, "DataType", None), _name, None)
+    if _v is not None:
+        _NP_DTYPES[_v] = _dt
+
+def block_to_array(block, data_type, width: int, height: int) -> np.ndarray:
+    # QgsRasterBlock → float64 (height, width); QGIS >= 3.34 has as_numpy()
+    as_numpy = getattr(block, "as_numpy", None)
+    if as_numpy is not None:
+        return np.asarray(as_numpy(use_masking=False), dtype=float).reshape(height, width)
+    dt = _NP_DTYPES.get(data_type)
+    if dt is None:
+        return np.array([[block.value(r, c) for c in range(width)] for r in range(height)], dtype=float)
+    return np.frombuffer(bytes(block.data()), dtype=dt, count=width * height).astype(float).reshape(height, width)
+
+class RasterGrid:
+    # pixel geometry of a provider (raster CRS); rows count down from yMaximum
+    def __init__(self, provider):
+        ext = provider.extent()
+        self.xmin, self.ymax = ext.xMinimum(), ext.yMaximum()
+        self.width, self.height = int(provider.xSize()), int(provider.ySize())
+        self.xres = ext.width() / self.width if self.width else 0.0
+        self.yres = ext.height() / self.height if self.height else 0.0
+
+    def to_pixel(self, rx: np.ndarray, ry: np.ndarray):
+        # fractional (col, row) pixel coordinates
+        return (rx - self.xmin) / self.xres, (self.ymax - ry) / self.yres
+
+    def window_extent(self, col0: int, row0: int, ncols: int, nrows: int) -> QgsRectangle:
+        x0 = self.xmin + col0 * self.xres
+        y1 = self.ymax - row0 * self.yres
+        return QgsRectangle(x0, y1 - nrows * self.yres, x0 + ncols * self.xres, y1)
+
+class RasterReader:
+    """Reads pixel-aligned windows of one band into float arrays (nodata → NaN)."""
+
+    def __init__(self, provider, band: int, nodata=None):
+        self.provider = provider
+        self.band = int(band)
+        self.grid = RasterGrid(provider)
+        self.nodata = nodata
+        self.data_type = provider.dataType(self.band)
+
+    def read_window(self, col0: int, row0: int, ncols: int, nrows: int) -> np.ndarray:
+        ext = self.grid.window_extent(col0, row0, ncols, nrows)
+        block = self.provider.block(self.band, ext, ncols, nrows)
+        arr = block_to_array(block, self.data_type, ncols, nrows)
+        if self.nodata is not None:
+            arr[arr == self.nodata] = np.nan
+        return arr
+
+class TileCache(RasterReader):
+    """LRU cache of raster tiles read with ``provider.block()``, bounded by ``max_bytes``."""
+
+    def __init__(self, provider, band: int, nodata=None, tile_size: int = 512,
+                 max_bytes: int = 256 * 1024 * 1024):
+        super().__init__(provider, band, nodata)
+        self.tile = max(int(tile_size), 16)
+        self.max_bytes = max(int(max_bytes), 0)
+        self.ntile_cols = int(math.ceil(self.grid.width / self.tile)) if self.grid.width else 0
+        self._tiles: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+
+    def clear(self):
+        self._tiles.clear()
+        self._bytes = 0
+
+    def _get(self, key: int) -> np.ndarray:
+        arr = self._tiles.get(key)
+        if arr is not None:
+            self._tiles.move_to_end(key)
+            return arr
+        tr, tc = divmod(key, self.ntile_cols)
+        c0, r0 = tc * self.tile, tr * self.tile
+        arr = self.read_window(c0, r0, min(self.tile, self.grid.width - c0), min(self.tile, self.grid.height - r0))
+        self._tiles[key] = arr
+        self._bytes += arr.nbytes
+        while self._bytes > self.max_bytes and len(self._tiles) > 1:
+            _, old = self._tiles.popitem(last=False)
+            self._bytes -= old.nbytes
+        return arr
+
+    def values(self, cols: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        # integer pixel indices → values (NaN outside raster / nodata)
+        out = np.full(len(cols), np.nan)
+        inside = (cols >= 0) & (rows >= 0) & (cols < self.grid.width) & (rows < self.grid.height)
+        if not inside.any():
+            return out
+        idx = np.nonzero(inside)[0]
+        c, r = cols[idx], rows[idx]
+        keys = (r // self.tile) * self.ntile_cols + (c // self.tile)
+        for key in np.unique(keys).tolist():
+            sel = keys == key
+            arr = self._get(key)
+            tr, tc = divmod(key, self.ntile_cols)
+            out[idx[sel]] = arr[r[sel] - tr * self.tile, c[sel] - tc * self.tile]
+        return out
+
+class Window:
+    # one window read from a RasterReader, looked up with absolute pixel indices
+    def __init__(self, reader: RasterReader, col0: int, row0: int, ncols: int, nrows: int):
+        self.col0, self.row0 = col0, row0
+        self.data = reader.read_window(col0, row0, ncols, nrows)
+
+    def values(self, cols: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        nr, nc = self.data.shape
+        c, r = cols - self.col0, rows - self.row0
+        inside = (c >= 0) & (r >= 0) & (c < nc) & (r < nr)
+        out = np.full(len(cols), np.nan)
+        out[inside] = self.data[r[inside], c[inside]]
+        return out
+
+def interpolate_grid(lookup, fcol: np.ndarray, frow: np.ndarray, method: str = NEAREST) -> np.ndarray:
+    """Evaluate ``lookup(cols, rows)`` at fractional pixel coordinates."""
+    ci, ri = np.floor(fcol).astype(np.int64), np.floor(frow).astype(np.int64)
+    nearest = lookup(ci, ri)
+    if method != BILINEAR:
+        return nearest
+    # bilinear between pixel centres; fall back to the containing pixel near nodata/edges
+    fc, fr = fcol - 0.5, frow - 0.5
+    c0, r0 = np.floor(fc).astype(np.int64), np.floor(fr).astype(np.int64)
+    tx, ty = fc - c0, fr - r0
+    v00, v10 = lookup(c0, r0), lookup(c0 + 1, r0)
+    v01, v11 = lookup(c0, r0 + 1), lookup(c0 + 1, r0 + 1)
+    bil = (v00 * (1 - tx) * (1 - ty) + v10 * tx * (1 - ty)
+           + v01 * (1 - tx) * ty + v11 * tx * ty)
+    return np.where(np.isnan(bil), nearest, bil)
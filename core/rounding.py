@@ -1,3 +1,5 @@
+import numpy as np
+
 # Equivalent to processor.round_by_distance
 def round_by_distance(value: float, step: float):
     if value is None:
@@ -12,3 +14,25 @@ def round_by_distance(value: float, step: float):
         return round(float(value), 1)
     else:
         return round(float(value))
+
+def digits_for_distance(step: float) -> int:
+    # decimals used by round_by_distance (0 ⇒ values become ints)
+    try:
+        s = float(step)
+    except Exception:
+        s = 0.0
+    return 2 if s < 1 else (1 if s < 10 else 0)
+
+def round_array(values: np.ndarray, ndigits: int) -> np.ndarray:
+    # np.round, with near-half cases redone by Python's exact round(); NaN stays NaN
+    values = np.asarray(values, dtype=float)
+    out = np.round(values, ndigits)
+    scaled = values * (10.0 ** ndigits)
+    with np.errstate(invalid="ignore"):
+        tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for i in np.nonzero(tie)[0].tolist():
+        out[i] = round(float(values[i]), ndigits)
+    return out
+
+def round_array_by_distance(values: np.ndarray, step: float) -> np.ndarray:
+    return round_array(values, digits_for_distance(step))
@@ -0,0 +1,329 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from .chainage import cumulative_lengths
+from .options import INDEX_FILE
+
+class Projection:
+    # nearest-segment projection of a batch of points; route is None (fid/part -1,
+    # kp/offset NaN) where no segment lies within the search distance
+    __slots__ = ("route", "kp", "offset", "fid", "part", "x", "y")
+
+    def __init__(self, n: int):
+        self.route: List[Optional[str]] = [None] * n
+        self.kp = np.full(n, np.nan)
+        self.offset = np.full(n, np.nan)   # distance from the point to the line
+        self.fid = np.full(n, -1, dtype=np.int64)
+        self.part = np.full(n, -1, dtype=np.int64)
+        self.x = np.full(n, np.nan)        # foot of the perpendicular
+        self.y = np.full(n, np.nan)
+
+class ChainageIndex:
+    """Vertices and chainage of every processed route, for KP ↔ coordinate lookups.
+
+    A route (group value) is a list of pieces, one per feature part, each with
+    the KP of its first vertex. KP along a piece is its 2D chainage, as in the
+    exported node files. ``locate`` is a binary search, first for the piece and
+    then along its chainage; ``project`` finds the nearest segment on grids of
+    the segments built on first use. Both work on whole batches in NumPy.
+    ``add_part`` may be called from worker threads.
+    """
+
+    RINGS = 2      # grid rings searched around a point before a coarser grid is tried
+    COARSER = 4    # cell size factor from one grid to the next
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._frozen = False
+        self._routes: List[str] = []
+        self._grids: Dict[tuple, tuple] = {}
+        self._reach: Dict[int, tuple] = {}
+
+    def add_part(self, route: str, xs: np.ndarray, ys: np.ndarray, zs: Optional[np.ndarray] = None,
+                 fid: int = -1, part: int = 0, kp0: float = 0.0):
+        if len(xs) < 1:
+            return
+        zs = np.full(len(xs), np.nan) if zs is None else np.asarray(zs, dtype=float)
+        item = (str(route), float(kp0), int(fid), int(part), np.asarray(xs, dtype=float),
+                np.asarray(ys, dtype=float), zs)
+        with self._lock:
+            self._pending.append(item)
+            self._frozen = False
+
+    def _freeze(self):
+        # flat vertex arrays; pieces ordered by route, start KP and digitising order
+        with self._lock:
+            if self._frozen:
+                return
+            items = sorted(self._pending, key=lambda t: t[:4])
+            names = sorted({t[0] for t in items})
+            rid = {name: i for i, name in enumerate(names)}
+            sizes = [len(t[4]) for t in items]
+            self._routes = names
+            self.piece_route = np.array([rid[t[0]] for t in items], dtype=np.int64)
+            self.piece_kp0 = np.array([t[1] for t in items], dtype=float)
+            self.piece_fid = np.array([t[2] for t in items], dtype=np.int64)
+            self.piece_part = np.array([t[3] for t in items], dtype=np.int64)
+            self.piece_start = np.cumsum([0] + sizes).astype(np.int64)
+            cat = lambda k: np.concatenate([t[k] for t in items]) if items else np.empty(0)
+            self.xs, self.ys, self.zs = cat(4), cat(5), cat(6)
+            self.kps = np.concatenate([t[1] + cumulative_lengths(t[4], t[5]) for t in items]) if items else np.empty(0)
+            self._route_pieces = [np.flatnonzero(self.piece_route == i) for i in range(len(names))]
+            self._grids, self._reach = {}, {}
+            self._frozen = True
+
+    @property
+    def routes(self) -> List[str]:
+        self._freeze()
+        return self._routes
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def pieces(self, route: str) -> np.ndarray:
+        self._freeze()
+        try:
+            return self._route_pieces[self.routes.index(str(route))]
+        except ValueError:
+            raise KeyError(route)
+
+    def length(self, route: str) -> Tuple[float, float]:
+        # (first, last) KP of the route
+        ps = self.pieces(route)
+        return float(self.kps[self.piece_start[ps]].min()), float(self.kps[self.piece_start[ps + 1] - 1].max())
+
+    def _piece_reach(self, ps: np.ndarray):
+        # first/last KP of pieces ``ps`` (ordered by first KP) and the running
+        # maximum of the last KP, for a binary search of the first piece holding a KP
+        first = self.kps[self.piece_start[ps]]
+        last = self.kps[self.piece_start[ps + 1] - 1]
+        return first, np.maximum.accumulate(last) if len(ps) else last
+
+    def _search(self, a: np.ndarray, b: np.ndarray, q: np.ndarray) -> np.ndarray:
+        # per query: last vertex i in [a, b) with kps[i] <= q (a - 1 if none), all at once
+        lo, hi = a - 1, b.copy()
+        while True:
+            todo = hi - lo > 1
+            if not todo.any():
+                return lo
+            mid = (lo + hi) // 2
+            le = self.kps[np.where(todo, mid, a)] <= q
+            lo = np.where(todo & le, mid, lo)
+            hi = np.where(todo & ~le, mid, hi)
+
+    def locate(self, route: str, kps, fid: Optional[int] = None, part: Optional[int] = None):
+        """KP → (x, y, z, azimuth) arrays on ``route``; NaN for KPs off the route.
+
+        Where pieces overlap in KP (every part restarts at 0) the first matching
+        piece wins; ``fid``/``part`` select a piece.
+        """
+        kps = np.atleast_1d(np.asarray(kps, dtype=float))
+        n = len(kps)
+        x, y, z, az = (np.full(n, np.nan) for _ in range(4))
+        ps = self.pieces(route)
+        if fid is not None or part is not None:
+            keep = np.ones(len(ps), dtype=bool)
+            if fid is not None:
+                keep &= self.piece_fid[ps] == fid
+            if part is not None:
+                keep &= self.piece_part[ps] == part
+            ps = ps[keep]
+            first, reach = self._piece_reach(ps)
+        else:
+            rid = self.routes.index(str(route))
+            if rid not in self._reach:
+                self._reach[rid] = self._piece_reach(ps)
+            first, reach = self._reach[rid]
+        if not len(ps):
+            return x, y, z, az
+        # the first piece whose last KP reaches the query must also start at or before it
+        j = np.searchsorted(reach, kps - 1e-9, side="left")
+        hit = np.isfinite(kps) & (j < len(ps))
+        hit[hit] = first[j[hit]] <= kps[hit] + 1e-9
+        hit = np.flatnonzero(hit)
+        if not len(hit):
+            return x, y, z, az
+        p = ps[j[hit]]
+        ds = kps[hit]
+        a, b = self.piece_start[p], self.piece_start[p + 1]
+        single = b - a < 2
+        if single.any():
+            h, v = hit[single], a[single]
+            x[h], y[h], z[h] = self.xs[v], self.ys[v], self.zs[v]
+        hit, ds, a, b = hit[~single], ds[~single], a[~single], b[~single]
+        i = np.clip(self._search(a, b, ds), a, b - 2)
+        seg = self.kps[i + 1] - self.kps[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(seg > 0, (ds - self.kps[i]) / seg, 0.0), 0.0, 1.0)
+        dx, dy = self.xs[i + 1] - self.xs[i], self.ys[i + 1] - self.ys[i]
+        x[hit] = self.xs[i] + t * dx
+        y[hit] = self.ys[i] + t * dy
+        z[hit] = self.zs[i] + t * (self.zs[i + 1] - self.zs[i])
+        # 0=N, 90=E as in the node files; NaN on zero-length segments
+        a_ = (np.degrees(np.arctan2(dx, dy)) + 360.0) % 360.0
+        a_[(dx == 0) & (dy == 0)] = np.nan
+        az[hit] = a_
+        return x, y, z, az
+
+    def _segments(self, route_id: Optional[int]) -> np.ndarray:
+        # index of the first vertex of every segment (of one route, or all)
+        ps = np.arange(len(self.piece_route)) if route_id is None else self._route_pieces[route_id]
+        first, count = self.piece_start[ps], np.maximum(self.piece_start[ps + 1] - self.piece_start[ps] - 1, 0)
+        return np.repeat(first, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+
+    _OFFSET = 1 << 30   # keeps cell numbers positive in the combined cell key
+
+    def _cell_key(self, ix: np.ndarray, iy: np.ndarray) -> np.ndarray:
+        lim = self._OFFSET - 1
+        return (np.clip(ix, -lim, lim) + self._OFFSET) * (2 * self._OFFSET) + np.clip(iy, -lim, lim) + self._OFFSET
+
+    def _grid(self, route_id: Optional[int], level: int):
+        """Segments of a route bucketed by grid cell: (segments, origin, cell, keys, starts, members).
+
+        Level 0 cells are the median segment length, each level ``COARSER``
+        times larger. A segment is entered in the cells of points sampled every
+        half cell along it, so every point of it lies in or next to one of its cells.
+        """
+        grid = self._grids.get((route_id, level))
+        if grid is not None:
+            return grid
+        segs = self._segments(route_id)
+        x0, y0 = self.xs[segs], self.ys[segs]
+        dx, dy = self.xs[segs + 1] - x0, self.ys[segs + 1] - y0
+        length = np.hypot(dx, dy)
+        span = max(float(np.ptp(self.xs[segs])) if len(segs) else 0.0, float(np.ptp(self.ys[segs])) if len(segs) else 0.0)
+        base = float(np.median(length)) if len(segs) else 0.0
+        cell = max(base, span * 1e-6, 1e-9) * self.COARSER ** level
+        k = np.ceil(length / (cell / 2)).astype(np.int64) + 1
+        rep = np.repeat(np.arange(len(segs)), k)
+        step = np.arange(len(rep)) - np.repeat(np.cumsum(k) - k, k)
+        t = step / np.repeat(np.maximum(k - 1, 1), k)
+        origin = (float(self.xs[segs].min()), float(self.ys[segs].min())) if len(segs) else (0.0, 0.0)
+        keys = self._cell_key(np.floor((x0[rep] + t * dx[rep] - origin[0]) / cell).astype(np.int64),
+                              np.floor((y0[rep] + t * dy[rep] - origin[1]) / cell).astype(np.int64))
+        order = np.lexsort((rep, keys))
+        keys, rep = keys[order], rep[order]
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (rep[1:] != rep[:-1])
+        keys, rep = keys[keep], rep[keep]
+        ukeys, starts = np.unique(keys, return_index=True)
+        grid = (segs, origin, cell, ukeys, np.append(starts, len(keys)), segs[rep], span)
+        self._grids[(route_id, level)] = grid
+        return grid
+
+    def _seg_dist(self, px: np.ndarray, py: np.ndarray, s: np.ndarray):
+        # point–segment distance and position t along the segment, pairwise
+        x0, y0 = self.xs[s], self.ys[s]
+        dx, dy = self.xs[s + 1] - x0, self.ys[s + 1] - y0
+        l2 = dx * dx + dy * dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(l2 > 0, ((px - x0) * dx + (py - y0) * dy) / l2, 0.0), 0.0, 1.0)
+        return np.hypot(x0 + t * dx - px, y0 + t * dy - py), t
+
+    def _keep_nearest(self, q, s, px, py, best_d, best_s, best_t):
+        # fold candidate pairs (query q, segment s), grouped by ascending q, into the best per query
+        if not len(q):
+            return
+        d, t = self._seg_dist(px[q], py[q], s)
+        heads = np.flatnonzero(np.r_[True, q[1:] != q[:-1]])
+        size = np.diff(np.append(heads, len(q)))
+        dmin = np.repeat(np.minimum.reduceat(d, heads), size)
+        smin = np.repeat(np.minimum.reduceat(np.where(d == dmin, s, np.iinfo(np.int64).max), heads), size)
+        pick = np.flatnonzero((d == dmin) & (s == smin))
+        pick = pick[np.r_[True, q[pick[1:]] != q[pick[:-1]]]]
+        q, s, d, t = q[pick], s[pick], d[pick], t[pick]
+        better = (d < best_d[q]) | ((d == best_d[q]) & (s < best_s[q]))
+        q, s, d, t = q[better], s[better], d[better], t[better]
+        best_d[q], best_s[q], best_t[q] = d, s, t
+
+    def _nearest(self, route_id: Optional[int], px: np.ndarray, py: np.ndarray, max_distance: Optional[float]):
+        # (distance, segment, t) of the nearest segment per point; segment -1 where none qualifies
+        n = len(px)
+        best_d, best_s, best_t = np.full(n, np.inf), np.full(n, -1, dtype=np.int64), np.zeros(n)
+        todo = np.flatnonzero(np.isfinite(px) & np.isfinite(py))
+        level = 0
+        while len(todo):
+            segs, origin, cell, ukeys, starts, members, span = self._grid(route_id, level)
+            if not len(segs):
+                break
+            if cell > 4 * span:
+                # beyond the coarsest useful grid: compare with every segment
+                for c in np.array_split(todo, max(1, len(todo) * len(segs) // 1_000_000)):
+                    self._keep_nearest(np.repeat(c, len(segs)), np.tile(segs, len(c)), px, py, best_d, best_s, best_t)
+                break
+            cx = np.floor((px[todo] - origin[0]) / cell).astype(np.int64)
+            cy = np.floor((py[todo] - origin[1]) / cell).astype(np.int64)
+            done = np.zeros(len(todo), dtype=bool)
+            for r in range(self.RINGS + 1):
+                ring = [(i, j) for i in range(-r, r + 1) for j in range(-r, r + 1) if max(abs(i), abs(j)) == r]
+                oi, oj = np.array(ring, dtype=np.int64).T
+                live = np.flatnonzero(~done)
+                keys = self._cell_key((cx[live, None] + oi).ravel(), (cy[live, None] + oj).ravel())
+                q = np.repeat(todo[live], len(ring))
+                pos = np.minimum(np.searchsorted(ukeys, keys), len(ukeys) - 1)
+                hit = ukeys[pos] == keys
+                q, pos = q[hit], pos[hit]
+                cnt = starts[pos + 1] - starts[pos]
+                idx = np.repeat(starts[pos], cnt) + np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+                self._keep_nearest(np.repeat(q, cnt), members[idx], px, py, best_d, best_s, best_t)
+                # segments not met yet have every point at least (r - 1) cells away
+                bound = (r - 1) * cell
+                done |= best_d[todo] <= bound
+                if max_distance is not None and bound > max_distance:
+                    done[:] = True
+            todo = todo[~done]
+            level += 1
+        if max_distance is not None:
+            best_s[best_d > max_distance] = -1
+        return best_d, best_s, best_t
+
+    def project(self, xs, ys, route: Optional[str] = None, max_distance: Optional[float] = None) -> Projection:
+        """Point → KP on the nearest segment (of ``route``, or of any route).
+
+        Same KP as ``lineLocatePoint`` on the feature part: 2D chainage to the
+        foot of the perpendicular.
+        """
+        self._freeze()
+        xs = np.atleast_1d(np.asarray(xs, dtype=float))
+        ys = np.atleast_1d(np.asarray(ys, dtype=float))
+        out = Projection(len(xs))
+        route_id = None
+        if route is not None:
+            if str(route) not in self.routes:
+                return out
+            route_id = self.routes.index(str(route))
+        if not len(self.xs):
+            return out
+        d, s, t = self._nearest(route_id, xs, ys, max_distance)
+        k = np.flatnonzero(s >= 0)
+        s, t = s[k], t[k]
+        p = np.searchsorted(self.piece_start, s, side="right") - 1
+        for i, r in zip(k.tolist(), self.piece_route[p].tolist()):
+            out.route[i] = self.routes[r]
+        out.kp[k] = self.kps[s] + t * (self.kps[s + 1] - self.kps[s])
+        out.offset[k] = d[k]
+        out.fid[k], out.part[k] = self.piece_fid[p], self.piece_part[p]
+        out.x[k] = self.xs[s] + t * (self.xs[s + 1] - self.xs[s])
+        out.y[k] = self.ys[s] + t * (self.ys[s + 1] - self.ys[s])
+        return out
+
+    def save(self, path: str):
+        self._freeze()
+        np.savez(path, routes=np.array(self.routes, dtype=str), piece_route=self.piece_route,
+                 piece_kp0=self.piece_kp0, piece_fid=self.piece_fid, piece_part=self.piece_part,
+                 piece_start=self.piece_start, xs=self.xs, ys=self.ys, zs=self.zs)
+
+    @classmethod
+    def load(cls, path: str) -> "ChainageIndex":
+        index = cls()
+        with np.load(path) as z:
+            data = {k: z[k] for k in z.files}
+        routes, start = data["routes"].tolist(), data["piece_start"]
+        xs, ys, zs = data["xs"], data["ys"], data["zs"]
+        for p, (r, kp0, fid, part) in enumerate(zip(data["piece_route"].tolist(), data["piece_kp0"].tolist(),
+                                                    data["piece_fid"].tolist(), data["piece_part"].tolist())):
+            a, b = start[p], start[p + 1]
+            index.add_part(routes[r], xs[a:b], ys[a:b], zs[a:b], fid, part, kp0)
+        return index
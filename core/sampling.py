@@ -1,24 +1,65 @@
-from typing import List, Tuple
-from qgis.core import QgsGeometry, QgsPointXY
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from qgis.core import QgsGeometry, QgsPointXY, QgsWkbTypes
+
+from .options import ENGINE_NUMPY, ENGINE_QGIS, ENGINES
+from .chainage import (
+    cumulative_lengths, fixed_step_distances, interpolate_along,
+    merge_sorted, drop_coincident, merge_station_lists, cell_crossings, interpolate_z
+)
+
+def part_arrays(geom: QgsGeometry) -> Tuple[np.ndarray, np.ndarray]:
+    # single-part line → vertex coordinate arrays (curves are segmentized by asPolyline)
+    pl = geom.asPolyline()
+    if not pl:
+        pl = [QgsPointXY(v) for v in geom.vertices()]
+    xs = np.fromiter((p.x() for p in pl), dtype=float, count=len(pl))
+    ys = np.fromiter((p.y() for p in pl), dtype=float, count=len(pl))
+    return xs, ys
+
+def part_arrays_z(geom: QgsGeometry) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    # part_arrays plus vertex Z; Z is None for 2D lines
+    if not QgsWkbTypes.hasZ(geom.wkbType()):
+        xs, ys = part_arrays(geom)
+        return xs, ys, None
+    line = geom.constGet()
+    if line.hasCurvedSegments():
+        line = line.segmentize()
+    if hasattr(line, "zVector"):
+        return (np.asarray(line.xVector(), dtype=float), np.asarray(line.yVector(), dtype=float),
+                np.asarray(line.zVector(), dtype=float))
+    vs = list(line.vertices())
+    return (np.fromiter((v.x() for v in vs), dtype=float, count=len(vs)),
+            np.fromiter((v.y() for v in vs), dtype=float, count=len(vs)),
+            np.fromiter((v.z() for v in vs), dtype=float, count=len(vs)))
+
+def _kp_ordered(pts: List[QgsPointXY], kps: List[float]):
+    # lineLocatePoint is only monotonic along simple lines; self-touching routes need a sort
+    if all(a <= b for a, b in zip(kps, kps[1:])):
+        return pts, kps
+    order = sorted(range(len(kps)), key=lambda i: (kps[i], pts[i].x(), pts[i].y()))
+    return [pts[i] for i in order], [kps[i] for i in order]
 
 class GeometrySampler:
-    def __init__(self, distance: float, preserve_nodes: bool):
+    def __init__(self, distance: float, preserve_nodes: bool, engine: str = ENGINE_NUMPY,
+                 to_pixel: Optional[Callable] = None):
+        # to_pixel(xs, ys) → fractional raster (col, row): switches on cell-crossing stations,
+        # one at every DEM cell boundary the line crosses (NumPy engine only)
         self.distance = float(distance) if (distance and distance > 0) else 0.0
         self.preserve_nodes = bool(preserve_nodes)
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown sampling engine: {engine}")
+        self.to_pixel = to_pixel
+        self.engine = ENGINE_NUMPY if to_pixel is not None else engine
 
+    # ---- legacy QGIS engine ----
     def _vertices_only(self, geom: QgsGeometry) -> List[Tuple[QgsPointXY, float]]:
-        pts: List[Tuple[QgsPointXY, float]] = []
+        pts: List[QgsPointXY] = []; kps: List[float] = []
         for v in geom.vertices():
             p = QgsPointXY(v)
-            kp = geom.lineLocatePoint(QgsGeometry.fromPointXY(p))
-            pts.append((p, float(kp)))
-        pts.sort(key=lambda t: (round(t[1],6), round(t[0].x(),6), round(t[0].y(),6)))
-        uniq, seen = [], set()
-        for p,kp in pts:
-            key = (round(kp,6), round(p.x(),6), round(p.y(),6))
-            if key in seen: continue
-            seen.add(key); uniq.append((p,kp))
-        return uniq
+            pts.append(p); kps.append(float(geom.lineLocatePoint(QgsGeometry.fromPointXY(p))))
+        pts, kps = _kp_ordered(pts, kps)
+        return merge_station_lists(pts, kps, (), ())
 
     def _fixed_step_with_optional_vertices(self, geom: QgsGeometry) -> List[Tuple[QgsPointXY, float]]:
         L = float(geom.length() or 0.0)
@@ -27,39 +68,149 @@ class GeometrySampler:
             return [(QgsPointXY(p), 0.0)]
         s = self.distance if self.distance > 0 else L
 
-        pts: List[Tuple[QgsPointXY, float]] = []
+        pts: List[QgsPointXY] = []; kps: List[float] = []
         d = 0.0
         while d < L - 1e-9:
-            p = geom.interpolate(d).asPoint()
-            kp = geom.lineLocatePoint(QgsGeometry.fromPointXY(QgsPointXY(p)))
-            pts.append((QgsPointXY(p), float(kp)))
+            p = QgsPointXY(geom.interpolate(d).asPoint())
+            pts.append(p); kps.append(float(geom.lineLocatePoint(QgsGeometry.fromPointXY(p))))
             d += s
         # endpoint
-        p_end = geom.interpolate(L).asPoint()
-        kp_end = geom.lineLocatePoint(QgsGeometry.fromPointXY(QgsPointXY(p_end)))
-        pts.append((QgsPointXY(p_end), float(kp_end)))
+        p_end = QgsPointXY(geom.interpolate(L).asPoint())
+        pts.append(p_end); kps.append(float(geom.lineLocatePoint(QgsGeometry.fromPointXY(p_end))))
+        pts, kps = _kp_ordered(pts, kps)
 
+        vpts: List[QgsPointXY] = []; vkps: List[float] = []
         if self.preserve_nodes:
             for v in geom.vertices():
                 p = QgsPointXY(v)
-                kp = geom.lineLocatePoint(QgsGeometry.fromPointXY(p))
-                pts.append((p, float(kp)))
+                vpts.append(p); vkps.append(float(geom.lineLocatePoint(QgsGeometry.fromPointXY(p))))
+            vpts, vkps = _kp_ordered(vpts, vkps)
+
+        # both sequences follow the line, so a streaming merge replaces sort + set dedupe
+        return merge_station_lists(pts, kps, vpts, vkps)
+
+    # ---- NumPy engine ----
+    def _np_vertices_only(self, geom: QgsGeometry):
+        # KP runs continuously over the parts, as lineLocatePoint does on a multi-line
+        parts = [QgsGeometry(p.clone()) for p in geom.constParts()] if geom.isMultipart() else [geom]
+        xs_l, ys_l, kp_l, offset = [], [], [], 0.0
+        for part in parts:
+            xs, ys = part_arrays(part)
+            if not len(xs): continue
+            chain = cumulative_lengths(xs, ys)
+            xs_l.append(xs); ys_l.append(ys); kp_l.append(chain + offset)
+            offset += chain[-1]
+        if not xs_l:
+            return np.empty(0), np.empty(0), np.empty(0)
+        return drop_coincident(np.concatenate(xs_l), np.concatenate(ys_l), np.concatenate(kp_l))
+
+    def _np_fixed_step_with_optional_vertices(self, geom: QgsGeometry):
+        xs, ys = part_arrays(geom)
+        return self._np_part_stations(xs, ys, cumulative_lengths(xs, ys), self.distance)
+
+    def _np_part_stations(self, xs: np.ndarray, ys: np.ndarray, chain: np.ndarray, distance: float):
+        # stations of one part from its vertex arrays and chainage
+        if self.to_pixel is not None:
+            return self._np_cell_stations(xs, ys, chain, distance)
+        if distance <= 0:
+            return drop_coincident(xs, ys, chain)
+        L = float(chain[-1]) if len(chain) else 0.0
+        if L == 0:
+            return xs[:1], ys[:1], np.zeros(min(len(xs), 1))
+        ds = fixed_step_distances(L, distance)
+        sx, sy = interpolate_along(xs, ys, chain, ds)
+        if self.preserve_nodes:
+            sx, sy, ds = merge_sorted(sx, sy, ds, xs, ys, chain)
+        return drop_coincident(sx, sy, ds)
+
+    def _np_cell_stations(self, xs: np.ndarray, ys: np.ndarray, chain: np.ndarray, distance: float):
+        # cell-boundary crossings, merged with the fixed-step stations (distance > 0)
+        # and the vertices (vertices-only runs, or preserve_nodes)
+        L = float(chain[-1]) if len(chain) else 0.0
+        if L == 0:
+            return xs[:1], ys[:1], np.zeros(min(len(xs), 1))
+        fcol, frow = self.to_pixel(xs, ys)
+        ds = cell_crossings(np.asarray(fcol, dtype=float), np.asarray(frow, dtype=float), chain)
+        ends = fixed_step_distances(L, distance) if distance > 0 else np.array([0.0, L])
+        ds = np.sort(np.concatenate([ends, ds]))
+        sx, sy = interpolate_along(xs, ys, chain, ds)
+        if distance <= 0 or self.preserve_nodes:
+            sx, sy, ds = merge_sorted(sx, sy, ds, xs, ys, chain)
+        return drop_coincident(sx, sy, ds)
+
+    def _np_sample(self, geom: QgsGeometry) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (x, y, kp) arrays, KP taken directly from cumulative chainage
+        if self.distance <= 0 and self.to_pixel is None:
+            return self._np_vertices_only(geom)
+        if geom.isMultipart():
+            # parts one after another in digitising order, KP continuing over them
+            xs_l, ys_l, kp_l, offset = [], [], [], 0.0
+            for p in geom.constParts():
+                xs, ys = part_arrays(QgsGeometry(p.clone()))
+                if not len(xs): continue
+                chain = cumulative_lengths(xs, ys)
+                sx, sy, sk = self._np_part_stations(xs, ys, chain, self.distance)
+                xs_l.append(sx); ys_l.append(sy); kp_l.append(sk + offset)
+                offset += chain[-1]
+            if not xs_l:
+                return np.empty(0), np.empty(0), np.empty(0)
+            return drop_coincident(np.concatenate(xs_l), np.concatenate(ys_l), np.concatenate(kp_l))
+        return self._np_fixed_step_with_optional_vertices(geom)
+
+    def sample_arrays(self, geom: QgsGeometry) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Stations as (x, y, kp) arrays for either engine."""
+        if self.engine == ENGINE_NUMPY:
+            return self._np_sample(geom)
+        pts = self.sample_geometry_with_kp(geom)
+        n = len(pts)
+        return (np.fromiter((p.x() for p, _ in pts), dtype=float, count=n),
+                np.fromiter((p.y() for p, _ in pts), dtype=float, count=n),
+                np.fromiter((kp for _, kp in pts), dtype=float, count=n))
+
+    def sample_arrays_multi(self, geom: QgsGeometry, distances, with_z: bool = False) -> List[tuple]:
+        """Stations for several distances; one (x, y, kp) triple per distance.
 
-        pts.sort(key=lambda t: (round(t[1],6), round(t[0].x(),6), round(t[0].y(),6)))
-        uniq, seen = [], set()
-        for p,kp in pts:
-            key = (round(kp,6), round(p.x(),6), round(p.y(),6))
-            if key in seen: continue
-            seen.add(key); uniq.append((p,kp))
-        return uniq
+        With the NumPy engine a single-part line is read and its chainage built
+        once, then every distance is stepped along the same arrays. ``with_z``
+        adds the station Z, interpolated between vertices by chainage (None for
+        2D lines): (x, y, kp, z).
+        """
+        distances = [float(d) if (d and d > 0) else 0.0 for d in distances]
+        if self.engine != ENGINE_NUMPY or geom.isMultipart():
+            sets = [GeometrySampler(d, self.preserve_nodes, self.engine, self.to_pixel).sample_arrays(geom)
+                    for d in distances]
+            if not with_z:
+                return sets
+            xs, ys, zs = part_arrays_z(geom) if not geom.isMultipart() else (None, None, None)
+            if zs is None:
+                return [(sx, sy, kps, None) for sx, sy, kps in sets]
+            chain = cumulative_lengths(xs, ys)
+            return [(sx, sy, kps, interpolate_z(chain, zs, kps)) for sx, sy, kps in sets]
+        if not with_z:
+            xs, ys = part_arrays(geom)
+            chain = cumulative_lengths(xs, ys)
+            return [self._np_part_stations(xs, ys, chain, d) for d in distances]
+        xs, ys, zs = part_arrays_z(geom)
+        chain = cumulative_lengths(xs, ys)
+        out = []
+        for d in distances:
+            sx, sy, kps = self._np_part_stations(xs, ys, chain, d)
+            out.append((sx, sy, kps, interpolate_z(chain, zs, kps) if zs is not None else None))
+        return out
 
     def sample_geometry_with_kp(self, geom: QgsGeometry) -> List[Tuple[QgsPointXY, float]]:
+        if self.engine == ENGINE_NUMPY:
+            xs, ys, kps = self._np_sample(geom)
+            return [(QgsPointXY(x, y), kp) for x, y, kp in zip(xs.tolist(), ys.tolist(), kps.tolist())]
         if self.distance <= 0:
             return self._vertices_only(geom)
         if geom.isMultipart():
+            # per-part KP shifted by the preceding parts, as on the numpy path
             all_pts: List[Tuple[QgsPointXY, float]] = []
+            offset = 0.0
             for part in geom.constParts():
-                all_pts.extend(self._fixed_step_with_optional_vertices(QgsGeometry(part.clone())))
-            all_pts.sort(key=lambda t: (round(t[1],6), round(t[0].x(),6), round(t[0].y(),6)))
+                pg = QgsGeometry(part.clone())
+                all_pts.extend((p, kp + offset) for p, kp in self._fixed_step_with_optional_vertices(pg))
+                offset += float(pg.length() or 0.0)
             return all_pts
         return self._fixed_step_with_optional_vertices(geom)
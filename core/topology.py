@@ -0,0 +1,249 @@
+import heapq, math
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+from .options import TOPOLOGY_FILE
+
+# Route building for continuous KP: pieces (feature parts) of one group are chained
+# end to end through their shared endpoints (no QGIS imports).
+
+GAP = "gap"          # consecutive chains do not touch; size = distance between them
+BRANCH = "branch"    # more than two piece ends meet; size = number of ends
+
+class RouteIssue:
+    __slots__ = ("group", "kind", "x", "y", "size", "kp")
+
+    def __init__(self, group: str, kind: str, x: float, y: float, size: float, kp: float):
+        self.group = group
+        self.kind = kind
+        self.x, self.y = x, y
+        self.size = size
+        self.kp = kp
+
+class EndpointIndex:
+    """Endpoints snapped to nodes: a point within ``tol`` of a node joins it.
+
+    Nodes are hashed on a grid of ``tol``-sized cells, so a lookup checks the
+    3 × 3 cells around the point.
+    """
+
+    def __init__(self, tol: float):
+        self.tol = max(float(tol), 1e-9)
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.xy: List[Tuple[float, float]] = []
+
+    def node(self, x: float, y: float) -> int:
+        cx, cy = int(math.floor(x / self.tol)), int(math.floor(y / self.tol))
+        best, best_d = -1, self.tol
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for n in self.cells.get((i, j), ()):
+                    d = math.hypot(self.xy[n][0] - x, self.xy[n][1] - y)
+                    if d <= best_d:
+                        best, best_d = n, d
+        if best >= 0:
+            return best
+        self.xy.append((x, y))
+        self.cells.setdefault((cx, cy), []).append(len(self.xy) - 1)
+        return len(self.xy) - 1
+
+class RouteLayout:
+    # route position of every piece: key → (KP of its first station, reversed)
+    def __init__(self):
+        self.pieces: Dict[Hashable, Tuple[float, bool]] = {}
+        self.order: List[Hashable] = []
+        self.issues: List[RouteIssue] = []
+        self.length = 0.0
+
+class ChainEnds:
+    """Chain ends still free for linking, removed as their chains are placed.
+
+    Ends within ``tol`` of a point come from a ``tol`` grid as in
+    EndpointIndex; the nearest end beyond that from a k-d tree that keeps a
+    count of free ends per node, so that used-up branches are skipped.
+    """
+
+    LEAF = 8
+
+    def __init__(self, points: Sequence[Tuple[float, float]], tol: float):
+        self.points = list(points)
+        self.tol = max(float(tol), 1e-9)
+        self.free = [True] * len(self.points)
+        self.alive = len(self.points)
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        for i, (x, y) in enumerate(self.points):
+            self.cells.setdefault(self._cell(x, y), []).append(i)
+        # k-d tree: per node its box, children (or leaf items), parent and free count
+        self.boxes: List[Tuple[float, float, float, float]] = []
+        self.kids: List[Tuple[int, int]] = []
+        self.items: List[List[int]] = []
+        self.parent: List[int] = []
+        self.count: List[int] = []
+        self.leaf = [0] * len(self.points)
+        if self.points:
+            self._build(list(range(len(self.points))), -1)
+
+    def _build(self, ids: List[int], parent: int) -> int:
+        node = len(self.boxes)
+        xs = [self.points[i][0] for i in ids]
+        ys = [self.points[i][1] for i in ids]
+        self.boxes.append((min(xs), min(ys), max(xs), max(ys)))
+        self.kids.append((-1, -1))
+        self.items.append([])
+        self.parent.append(parent)
+        self.count.append(len(ids))
+        if len(ids) <= self.LEAF:
+            self.items[node] = ids
+            for i in ids:
+                self.leaf[i] = node
+            return node
+        axis = 0 if max(xs) - min(xs) >= max(ys) - min(ys) else 1
+        ids.sort(key=lambda i: self.points[i][axis])
+        mid = len(ids) // 2
+        self.kids[node] = (self._build(ids[:mid], node), self._build(ids[mid:], node))
+        return node
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.tol)), int(math.floor(y / self.tol))
+
+    def __len__(self) -> int:
+        return self.alive
+
+    def remove(self, i: int):
+        if not self.free[i]:
+            return
+        self.free[i] = False
+        self.alive -= 1
+        node = self.leaf[i]
+        while node >= 0:
+            self.count[node] -= 1
+            node = self.parent[node]
+
+    def _dist(self, i: int, x: float, y: float) -> float:
+        return math.hypot(self.points[i][0] - x, self.points[i][1] - y)
+
+    def touching(self, x: float, y: float) -> List[int]:
+        cx, cy = self._cell(x, y)
+        return [i for u in (cx - 1, cx, cx + 1) for v in (cy - 1, cy, cy + 1)
+                for i in self.cells.get((u, v), ()) if self.free[i] and self._dist(i, x, y) <= self.tol]
+
+    def _box_dist(self, node: int, x: float, y: float) -> float:
+        x0, y0, x1, y1 = self.boxes[node]
+        return math.hypot(max(x0 - x, 0.0, x - x1), max(y0 - y, 0.0, y - y1))
+
+    def nearest(self, x: float, y: float) -> Tuple[float, int]:
+        # (distance, end) of the nearest free end; ties go to the lower end number
+        best = (math.inf, -1)
+        if not self.alive:
+            return best
+        heap = [(0.0, 0)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > best[0]:
+                break
+            if not self.count[node]:
+                continue
+            lo, hi = self.kids[node]
+            if lo < 0:
+                for i in self.items[node]:
+                    if self.free[i]:
+                        best = min(best, (self._dist(i, x, y), i))
+                continue
+            for kid in (lo, hi):
+                if self.count[kid]:
+                    heapq.heappush(heap, (self._box_dist(kid, x, y), kid))
+        return best
+
+def build_route(group: str, keys: Sequence[Hashable], starts: Sequence[Tuple[float, float]],
+                ends: Sequence[Tuple[float, float]], lengths: Sequence[float], tol: float = 0.01) -> RouteLayout:
+    """Chains the pieces of one group into a route with continuous KP.
+
+    Pieces meeting at a node with exactly two ends are joined (flipped where
+    digitised against the route); a node with more ends is a branch and ends
+    the chains through it. The chain holding the first piece keeps that
+    piece's direction; the others follow greedily, nearest end first. KP runs
+    over the piece lengths only: a gap between chains is reported, not counted.
+    """
+    out = RouteLayout()
+    n = len(keys)
+    if not n:
+        return out
+    index = EndpointIndex(tol)
+    a = [index.node(*p) for p in starts]
+    b = [index.node(*p) for p in ends]
+    ends_at: Dict[int, List[int]] = {}
+    for i in range(n):
+        ends_at.setdefault(a[i], []).append(i)
+        ends_at.setdefault(b[i], []).append(i)
+    degree = {node: len(ps) for node, ps in ends_at.items()}
+
+    def walk(node: int, prev: int, chain: List[Tuple[int, bool]], seen: set):
+        # follow two-ended nodes from ``node``, leaving piece ``prev``
+        while degree[node] == 2:
+            nxt = [p for p in ends_at[node] if p != prev]
+            if not nxt or nxt[0] in seen:
+                break
+            p = nxt[0]
+            seen.add(p)
+            fwd = a[p] == node
+            chain.append((p, not fwd))
+            node, prev = (b[p] if fwd else a[p]), p
+
+    seen: set = set()
+    chains: List[List[Tuple[int, bool]]] = []
+    for i in range(n):
+        if i in seen:
+            continue
+        seen.add(i)
+        ahead: List[Tuple[int, bool]] = []
+        walk(b[i], i, ahead, seen)
+        behind: List[Tuple[int, bool]] = []
+        walk(a[i], i, behind, seen)
+        # pieces found walking backwards run the other way along the route
+        chains.append([(p, not rev) for p, rev in reversed(behind)] + [(i, False)] + ahead)
+
+    def chain_ends(chain):
+        (p0, r0), (p1, r1) = chain[0], chain[-1]
+        head = ends[p0] if r0 else starts[p0]
+        tail = starts[p1] if r1 else ends[p1]
+        return head, tail
+
+    # end 2j is the head of chain j (joined as is), end 2j + 1 its tail (chain flipped)
+    sizes = [sum(lengths[p] for p, _ in c) for c in chains]
+    points = []
+    for c in chains:
+        points.extend(chain_ends(c))
+    free = ChainEnds(points, tol)
+
+    kp = 0.0
+    branch_kp: Dict[int, float] = {}
+    j = 0
+    while True:
+        chain = chains[j]
+        free.remove(2 * j)
+        free.remove(2 * j + 1)
+        for p, rev in chain:
+            out.pieces[keys[p]] = (kp, rev)
+            out.order.append(keys[p])
+            for node in (a[p], b[p]):
+                if degree[node] > 2:
+                    branch_kp.setdefault(node, kp + (lengths[p] if (node == b[p]) != rev else 0.0))
+            kp += float(lengths[p])
+        if not len(free):
+            break
+        tail = chain_ends(chain)[1]
+        # among chains touching the tail (a branch) the longest, else the nearest end
+        touching = free.touching(*tail)
+        if touching:
+            e = min(touching, key=lambda e: (-sizes[e // 2], e))
+        else:
+            d, e = free.nearest(*tail)
+            out.issues.append(RouteIssue(group, GAP, tail[0], tail[1], d, kp))
+        j = e // 2
+        if e % 2:
+            chains[j] = [(p, not rev) for p, rev in reversed(chains[j])]
+    out.length = kp
+    for node, d in degree.items():
+        if d > 2:
+            out.issues.append(RouteIssue(group, BRANCH, *index.xy[node], d, branch_kp.get(node, math.nan)))
+    out.issues.sort(key=lambda t: (math.isnan(t.kp), t.kp))
+    return out
@@ -0,0 +1,42 @@
+from typing import Optional, Tuple
+import numpy as np
+from qgis.core import QgsCoordinateTransform, QgsLineString, QgsGeometry
+
+# points per PROJ call; keeps the temporary geometry small on huge parts
+CHUNK = 500_000
+
+def is_identity(xform: Optional[QgsCoordinateTransform]) -> bool:
+    if xform is None:
+        return True
+    try:
+        if xform.isShortCircuited():
+            return True
+        return xform.sourceCrs() == xform.destinationCrs()
+    except Exception:
+        return False
+
+class BatchTransformer:
+    """Transforms coordinate arrays with one QgsCoordinateTransform call per chunk."""
+
+    def __init__(self, xform: Optional[QgsCoordinateTransform]):
+        self.xform = xform
+        self.identity = is_identity(xform)
+
+    def _chunk(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        ls = QgsLineString(xs.tolist(), ys.tolist())
+        ls.transform(self.xform)
+        if hasattr(ls, "xVector"):
+            return np.asarray(ls.xVector(), dtype=float), np.asarray(ls.yVector(), dtype=float)
+        pts = QgsGeometry(ls).asPolyline()
+        n = len(pts)
+        return (np.fromiter((p.x() for p in pts), dtype=float, count=n),
+                np.fromiter((p.y() for p in pts), dtype=float, count=n))
+
+    def transform_xy(self, xs, ys) -> Tuple[np.ndarray, np.ndarray]:
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        if self.identity or len(xs) == 0:
+            return xs, ys
+        if len(xs) <= CHUNK:
+            return self._chunk(xs, ys)
+        parts = [self._chunk(xs[i:i + CHUNK], ys[i:i + CHUNK]) for i in range(0, len(xs), CHUNK)]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
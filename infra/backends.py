@@ -0,0 +1,253 @@
+import json
+from typing import Dict, List, Optional
+import numpy as np
+from qgis.core import (
+    QgsFields, QgsWkbTypes, QgsVectorFileWriter, QgsCoordinateReferenceSystem, QgsProject
+)
+from qgis.PyQt.QtCore import QVariant
+
+from ..core.columns import BASE_COLUMNS, RowSchema, SampleBlock
+from ..core.options import GPKG_SINGLE, GPKG_LAYERS
+from .exporter import OutputBackend, fields_for_schema, block_features, format_cell
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; the GDAL Parquet driver is used instead
+    pa = None
+    pq = None
+
+try:
+    from osgeo import ogr
+except ImportError:
+    ogr = None
+
+def _create_writer(path: str, layer: str, driver: str, fields: QgsFields, crs, transform_context,
+                   action=None) -> QgsVectorFileWriter:
+    opts = QgsVectorFileWriter.SaveVectorOptions()
+    opts.driverName = driver
+    opts.fileEncoding = "UTF-8"
+    opts.layerName = layer
+    if action is not None:
+        opts.actionOnExistingFile = action
+    w = QgsVectorFileWriter.create(path, fields, QgsWkbTypes.Point, crs,
+                                   transform_context or QgsProject.instance().transformContext(), opts)
+    if w.hasError() != QgsVectorFileWriter.NoError:
+        raise RuntimeError(f"Cannot create {driver} output {path}: {w.errorMessage()}")
+    return w
+
+class GpkgBackend(OutputBackend):
+    """All groups in one GeoPackage.
+
+    QgsVectorFileWriter wraps its inserts in one OGR transaction per writer, so
+    batches go in as bulk transactions. Only one writer is open at a time (SQLite
+    allows a single writing transaction). In ``layers`` layout batches of groups
+    other than the open layer's are held back until their group is closed or
+    ``max_pending`` rows are held, then written one layer after another, so a
+    layer is reopened once per group and spill rather than once per batch.
+    """
+
+    def __init__(self, path: str, crs: QgsCoordinateReferenceSystem, distance_label, schema: RowSchema,
+                 layout: str = GPKG_SINGLE, transform_context=None, max_pending: int = 200_000):
+        self.path = path
+        self.crs = crs
+        self.distance_label = distance_label
+        self.schema = schema
+        self.layout = layout
+        self.transform_context = transform_context
+        self.fields: Optional[QgsFields] = None
+        self._file_created = False
+        self._layers_created = set()
+        self._writer = None
+        self._writer_layer = None
+        self.max_pending = max(int(max_pending), 1)
+        self._pending: Dict[str, List[SampleBlock]] = {}
+        self._pending_rows = 0
+
+    def _layer_name(self, group: str) -> str:
+        if self.layout == GPKG_LAYERS:
+            return f"{group}_{self.distance_label}_node"
+        return f"nodes_{self.distance_label}"
+
+    def _open(self, layer: str, first: SampleBlock):
+        if self._writer_layer == layer:
+            return
+        self._commit()
+        if self.fields is None:
+            self.fields = fields_for_schema(self.schema, first.record)
+        if not self._file_created:
+            action = QgsVectorFileWriter.CreateOrOverwriteFile
+        elif layer not in self._layers_created:
+            action = QgsVectorFileWriter.CreateOrOverwriteLayer
+        else:
+            action = QgsVectorFileWriter.AppendToLayerNoNewFields
+        self._writer = _create_writer(self.path, layer, "GPKG", self.fields, self.crs,
+                                      self.transform_context, action)
+        self._file_created = True
+        self._layers_created.add(layer)
+        self._writer_layer = layer
+
+    def _commit(self):
+        # deleting the writer commits its transaction
+        self._writer = None
+        self._writer_layer = None
+
+    def _write(self, layer: str, blocks: List[SampleBlock]):
+        self._open(layer, blocks[0])
+        feats = []
+        for block in blocks:
+            feats.extend(block_features(block, self.fields, self.schema))
+        self._writer.addFeatures(feats)
+
+    def _write_pending(self, groups=None):
+        for group in list(self._pending) if groups is None else groups:
+            blocks = self._pending.pop(group, None)
+            if blocks:
+                self._pending_rows -= sum(len(b) for b in blocks)
+                self._write(self._layer_name(group), blocks)
+
+    def append(self, group: str, blocks: List[SampleBlock]):
+        with self.timer.stage("gpkg"):
+            layer = self._layer_name(group)
+            if group not in self._pending and self._writer_layer in (None, layer):
+                self._write(layer, blocks)
+                return
+            # another layer is open: hold the group back instead of switching per batch
+            self._pending.setdefault(group, []).extend(blocks)
+            self._pending_rows += sum(len(b) for b in blocks)
+            if self._pending_rows >= self.max_pending:
+                self._write_pending()
+
+    def close_group(self, group: str):
+        # layers layout: the group's layer is complete, write what is held back and commit
+        if self.layout != GPKG_LAYERS:
+            return
+        with self.timer.stage("gpkg"):
+            self._write_pending([group])
+            if self._writer_layer == self._layer_name(group):
+                self._commit()
+
+    def close(self):
+        with self.timer.stage("gpkg"):
+            self._write_pending()
+            self._commit()
+        if self.layout == GPKG_SINGLE and self._file_created and ogr is not None:
+            # index the group column so one group can be pulled out of the shared layer
+            layer = self._layer_name("")
+            ds = ogr.Open(self.path, 1)
+            if ds is not None:
+                ds.ExecuteSQL(f'CREATE INDEX IF NOT EXISTS "idx_{layer}_group" '
+                              f'ON "{layer}" ("{self.schema.group_column}")')
+                ds = None
+
+def _arrow_type(qtype):
+    if qtype in (QVariant.Int, QVariant.LongLong, QVariant.UInt, QVariant.ULongLong):
+        return pa.int64()
+    if qtype == QVariant.Double:
+        return pa.float64()
+    if qtype == QVariant.Bool:
+        return pa.bool_()
+    return pa.string()
+
+def _arrow_value(v, atype):
+    if v is None or (isinstance(v, QVariant) and v.isNull()):
+        return None
+    if atype == pa.string():
+        return format_cell(v)
+    return v
+
+def _point_wkb(xs: np.ndarray, ys: np.ndarray):
+    # little-endian WKB points built in one NumPy pass
+    n = len(xs)
+    rec = np.empty(n, dtype=np.dtype([("bo", "u1"), ("t", "<u4"), ("x", "<f8"), ("y", "<f8")]))
+    rec["bo"] = 1; rec["t"] = 1; rec["x"] = xs; rec["y"] = ys
+    offsets = np.arange(0, 21 * (n + 1), 21, dtype=np.int32)
+    return pa.Array.from_buffers(pa.binary(), n, [None, pa.py_buffer(offsets), pa.py_buffer(rec.tobytes())])
+
+def _projjson(crs: QgsCoordinateReferenceSystem):
+    to_json = getattr(crs, "toJsonString", None)
+    if to_json is not None:
+        try:
+            return json.loads(to_json())
+        except Exception:
+            pass
+    try:
+        from pyproj import CRS
+        return CRS.from_wkt(crs.toWkt()).to_json_dict()
+    except Exception:
+        return None  # left undefined rather than mislabelled as CRS84
+
+class ParquetBackend(OutputBackend):
+    """All groups in one (Geo)Parquet file; each batch becomes a row group.
+
+    Uses pyarrow when installed, otherwise GDAL's Parquet driver.
+    """
+
+    def __init__(self, path: str, crs: QgsCoordinateReferenceSystem, schema: RowSchema,
+                 layer_fields: Optional[QgsFields] = None, transform_context=None):
+        self.path = path
+        self.crs = crs
+        self.schema = schema
+        self.transform_context = transform_context
+        self._writer = None
+        self._ogr_fields: Optional[QgsFields] = None
+        types: Dict[str, object] = {}
+        if pa is not None:
+            for name, col in zip(schema.attr_names, schema.attr_columns):
+                idx = layer_fields.indexFromName(name) if layer_fields is not None else -1
+                types[col] = _arrow_type(layer_fields.at(idx).type()) if idx >= 0 else pa.string()
+        self._attr_types = types
+
+    # ---- pyarrow ----
+    def _arrow_table(self, blocks: List[SampleBlock]):
+        cols: Dict[str, list] = {name: [] for name in BASE_COLUMNS}
+        group, attrs, wkb = [], {c: [] for c in self.schema.attr_columns}, []
+        for block in blocks:
+            n = len(block)
+            for name, arr in zip(BASE_COLUMNS, block.arrays()):
+                cols[name].append(pa.array(arr, mask=np.isnan(arr), type=pa.float64()))
+            group.append(pa.array([block.record.group_value] * n, type=pa.string()))
+            for col, v in zip(self.schema.attr_columns, block.record.attrs):
+                t = self._attr_types[col]
+                attrs[col].append(pa.array([_arrow_value(v, t)] * n, type=t))
+            wkb.append(_point_wkb(block.x, block.y))
+        names = BASE_COLUMNS + [self.schema.group_column] + self.schema.attr_columns + ["geometry"]
+        arrays = [pa.concat_arrays(cols[n]) for n in BASE_COLUMNS] + [pa.concat_arrays(group)]
+        arrays += [pa.concat_arrays(attrs[c]) for c in self.schema.attr_columns]
+        arrays.append(pa.concat_arrays(wkb))
+        return pa.Table.from_arrays(arrays, names=names)
+
+    def _geo_metadata(self) -> bytes:
+        col = {"encoding": "WKB", "geometry_types": ["Point"]}
+        col["crs"] = _projjson(self.crs)
+        return json.dumps({"version": "1.0.0", "primary_column": "geometry", "columns": {"geometry": col}}).encode()
+
+    def append(self, group: str, blocks: List[SampleBlock]):
+        with self.timer.stage("parquet"):
+            if pa is None:
+                return self._append_ogr(blocks)
+            table = self._arrow_table(blocks)
+            if self._writer is None:
+                schema = table.schema.with_metadata({b"geo": self._geo_metadata()})
+                self._writer = pq.ParquetWriter(self.path, schema)
+            self._writer.write_table(table.replace_schema_metadata(self._writer.schema.metadata))
+
+    # ---- GDAL fallback ----
+    def _append_ogr(self, blocks: List[SampleBlock]):
+        if self._writer is None:
+            self._ogr_fields = fields_for_schema(self.schema, blocks[0].record)
+            try:
+                self._writer = _create_writer(self.path, "nodes", "Parquet", self._ogr_fields, self.crs,
+                                              self.transform_context)
+            except RuntimeError as e:
+                raise RuntimeError(f"Parquet output needs pyarrow or GDAL with the Parquet driver ({e})")
+        feats = []
+        for block in blocks:
+            feats.extend(block_features(block, self._ogr_fields, self.schema))
+        self._writer.addFeatures(feats)
+
+    def close(self):
+        with self.timer.stage("parquet"):
+            if pa is not None and self._writer is not None:
+                self._writer.close()
+            self._writer = None
@@ -0,0 +1,93 @@
+import hashlib, io, os, sqlite3, threading
+from typing import List, Optional, Sequence
+import numpy as np
+
+from ..core.columns import SampleBlock, FeatureRecord
+
+CACHE_FILE = ".node_cache.sqlite"
+
+def file_stamp(path: str) -> str:
+    # modification time + size of a file source ("" when it is not a plain file)
+    path = (path or "").split("|")[0]
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+def _pack(blocks: Sequence[SampleBlock]) -> bytes:
+    # all parts of one feature as a (10, n) matrix plus part offsets
+    sizes = [len(b) for b in blocks]
+    data = np.concatenate([np.vstack(b.arrays()) for b in blocks], axis=1) if blocks else np.empty((10, 0))
+    buf = io.BytesIO()
+    np.savez(buf, data=data, offsets=np.cumsum([0] + sizes))
+    return buf.getvalue()
+
+def _unpack(blob: bytes, record: FeatureRecord) -> List[SampleBlock]:
+    with np.load(io.BytesIO(blob)) as z:
+        data, offsets = z["data"], z["offsets"]
+    blocks = []
+    for a, b in zip(offsets[:-1], offsets[1:]):
+        lon, lat, x, y, elev, d2d, d3d, az, kp, total3d = data[:, a:b]
+        blocks.append(SampleBlock(record, x, y, lon, lat, elev, d2d, d3d, az, kp, total3d))
+    return blocks
+
+class ResultCache:
+    """Sampled blocks per (feature geometry, distance), kept in the output folder.
+
+    Keys hash the feature WKB together with the run settings that change the
+    stations (``settings``: distance-independent parameters such as the
+    preserve-vertices flag, DEM source/band/mtime). Entries not used by a
+    completed run are pruned on close. Safe to share between worker threads.
+    """
+
+    def __init__(self, out_dir: str, settings: Sequence):
+        self.path = os.path.join(out_dir, CACHE_FILE)
+        self.settings = "|".join(str(s) for s in settings).encode("utf-8")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending = []
+        self._used = []
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS blocks (key TEXT PRIMARY KEY, data BLOB)")
+        self._db.execute("CREATE TEMP TABLE used (key TEXT PRIMARY KEY)")
+
+    def key(self, wkb: bytes, distance: float) -> str:
+        h = hashlib.sha1(self.settings)
+        h.update(repr(float(distance)).encode("ascii"))
+        h.update(bytes(wkb))
+        return h.hexdigest()
+
+    def get(self, key: str, record: FeatureRecord) -> Optional[List[SampleBlock]]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM blocks WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used.append((key,))
+        return _unpack(row[0], record)
+
+    def put(self, key: str, blocks: Sequence[SampleBlock]):
+        blob = _pack(blocks)
+        with self._lock:
+            self._pending.append((key, blob))
+            self._used.append((key,))
+            if len(self._pending) >= 256:
+                self._flush()
+
+    def _flush(self):
+        self._db.executemany("INSERT OR REPLACE INTO blocks (key, data) VALUES (?, ?)", self._pending)
+        self._db.executemany("INSERT OR IGNORE INTO used (key) VALUES (?)", self._used)
+        self._db.commit()
+        self._pending, self._used = [], []
+
+    def close(self, prune: bool = True):
+        # ``prune`` drops entries of features that were edited or deleted since the last run
+        with self._lock:
+            self._flush()
+            if prune:
+                self._db.execute("DELETE FROM blocks WHERE key NOT IN (SELECT key FROM used)")
+                self._db.commit()
+            self._db.close()
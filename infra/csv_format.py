@@ -0,0 +1,71 @@
+import csv, io
+from typing import Callable, List
+import numpy as np
+
+from ..core.columns import BASE_COLUMNS, DISTANCE_COLUMNS, RowSchema, SampleBlock
+from ..core.options import FORMAT_PYTHON, FORMAT_NUMPY
+
+LINE_END = "\r\n"  # csv.writer default
+
+# Every formatter below reproduces str() of the value the legacy row dict held:
+# shortest round-trip repr for floats, int for distances rounded at >= 10 m, "" for None.
+
+def float_cells(arr: np.ndarray) -> List[str]:
+    r = float.__repr__
+    return ["" if v != v else r(v) for v in arr.tolist()]
+
+def int_cells(arr: np.ndarray) -> List[str]:
+    return ["" if v != v else str(int(v)) for v in arr.tolist()]
+
+def float_cells_np(arr: np.ndarray) -> List[str]:
+    s = arr.astype(str)
+    return np.where(np.isnan(arr), "", s).tolist()
+
+def fixed_cells_np(arr: np.ndarray, ndigits: int) -> List[str]:
+    # values already rounded to ``ndigits``: printf, then trim to the repr form ("1.50" → "1.5")
+    nan = np.isnan(arr)
+    s = np.char.mod(f"%.{ndigits}f", np.where(nan, 0.0, arr))
+    s = np.char.rstrip(s, "0")
+    s = np.where(np.char.endswith(s, "."), np.char.add(s, "0"), s)
+    return np.where(nan, "", s).tolist()
+
+def int_cells_np(arr: np.ndarray) -> List[str]:
+    nan = np.isnan(arr)
+    s = np.where(nan, 0.0, arr).astype(np.int64).astype(str)
+    return np.where(nan, "", s).tolist()
+
+def quoted_tail(cells: List[str]) -> str:
+    # group/attribute cells may need CSV quoting; done once per feature
+    if len(cells) == 1 and cells[0] == "":
+        return ""  # csv.writer would emit '""' for a lone empty field
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator=LINE_END).writerow(cells)
+    return buf.getvalue()[:-len(LINE_END)]
+
+class CsvBlockFormatter:
+    """Formats SampleBlocks to CSV text with per-column formatters resolved once from the schema."""
+
+    def __init__(self, schema: RowSchema, numeric: str = FORMAT_PYTHON, distance_digits: int = 2):
+        self.schema = schema
+        self.numeric = numeric
+        self.formatters: List[Callable[[np.ndarray], List[str]]] = []
+        for name in BASE_COLUMNS:
+            is_distance = name in DISTANCE_COLUMNS
+            if is_distance and schema.int_distances:
+                fmt = int_cells_np if numeric == FORMAT_NUMPY else int_cells
+            elif numeric == FORMAT_NUMPY:
+                if is_distance and 0 < distance_digits <= 6:
+                    fmt = (lambda d: (lambda a: fixed_cells_np(a, d)))(distance_digits)
+                else:
+                    fmt = float_cells_np
+            else:
+                fmt = float_cells
+            self.formatters.append(fmt)
+
+    def text(self, block: SampleBlock, cell: Callable) -> str:
+        # ``cell`` formats group/attribute values (to_csv_cell)
+        if not len(block):
+            return ""
+        cols = [fmt(arr) for fmt, arr in zip(self.formatters, block.arrays())]
+        tail = "," + quoted_tail(block.record.cells(cell))
+        return "".join(",".join(vals) + tail + LINE_END for vals in zip(*cols))
@@ -1,11 +1,18 @@
-import os, re, csv, datetime
-from typing import List, Tuple, Dict, Any
+import abc, os, re, csv, datetime
+from collections import OrderedDict
+from typing import List, Dict, Optional
 from qgis.core import (
     QgsFields, QgsField, QgsFeature, QgsWkbTypes, QgsGeometry, QgsPointXY,
     QgsVectorFileWriter, QgsCoordinateReferenceSystem, QgsProject
 )
 from qgis.PyQt.QtCore import QVariant, QDate, QDateTime, QTime
 
+from ..core.columns import BASE_COLUMNS, RowSchema, FeatureRecord, SampleBlock
+from .csv_format import CsvBlockFormatter, FORMAT_PYTHON
+from .timing import NULL_TIMER
+
+CSV_BUFFER = 1 << 20
+
 def sanitize_name(name: str) -> str:
     safe = re.sub(r'[^0-9a-zA-Z_]+', '_', str(name).strip())
     return safe or "group"
@@ -28,10 +35,25 @@ def to_csv_cell(v):
     if isinstance(v, datetime.time): return v.strftime("%H:%M:%S")
     return "" if v is None else str(v)
 
+# type → formatter, looked up once per cell instead of the isinstance chain
+_CELL_FORMATTERS = {
+    type(None): lambda v: "",
+    float: float.__repr__,
+    int: int.__repr__,
+    bool: str,
+    str: lambda v: v,
+}
+
+def format_cell(v) -> str:
+    f = _CELL_FORMATTERS.get(type(v))
+    return f(v) if f is not None else to_csv_cell(v)
+
 class Exporter:
-    def __init__(self, out_dir: str, write_shp: bool):
+    def __init__(self, out_dir: str, write_shp: bool, transform_context=None, write_csv: bool = True):
         self.out_dir = out_dir
         self.write_shp = write_shp
+        self.write_csv_files = write_csv
+        self.transform_context = transform_context
 
     def _csv_path(self, group: str, distance_label) -> str:
         return os.path.join(self.out_dir, f"{group}_{distance_label}_node.csv")
@@ -39,50 +61,214 @@ class Exporter:
     def _shp_path(self, group: str, distance_label) -> str:
         return os.path.join(self.out_dir, f"{group}_{distance_label}_node.shp")
 
-    def write_csv(self, group: str, rows: List[Dict[str, Any]], distance_label):
-        if not rows: return
-        path = self._csv_path(group, distance_label)
-        fieldnames = list(rows[0].keys())
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(fieldnames)
-            for r in rows:
-                w.writerow([to_csv_cell(r.get(k)) for k in fieldnames])
-
-    def write_point_shp(self, group: str, pts: List[Tuple[QgsPointXY, Dict[str, Any]]],
-                        rows: List[Dict[str, Any]], crs: QgsCoordinateReferenceSystem, distance_label):
-        if not self.write_shp or not pts: return
-        path = self._shp_path(group, distance_label)
-
-        header = list(rows[0].keys())
-        fields = QgsFields()
-        sample = rows[0]
-        for h in header:
-            fields.append(QgsField(h, qvariant_type_of(sample.get(h))))
-
-        opts = QgsVectorFileWriter.SaveVectorOptions()
-        opts.driverName = "ESRI Shapefile"
-        opts.fileEncoding = "UTF-8"
-        opts.layerName = f"{group}_{distance_label}_node"
-
-        writer = QgsVectorFileWriter.create(
-            path, fields, QgsWkbTypes.Point, crs, QgsProject.instance().transformContext(), opts
-        )
-        del writer  # ensure file exists
-
-        writer = QgsVectorFileWriter(path, "UTF-8", fields, QgsWkbTypes.Point, crs, "ESRI Shapefile")
-        if writer.hasError() != QgsVectorFileWriter.NoError:
-            return
-
-        for (pt, row) in pts:
-            feat = QgsFeature()
-            feat.setGeometry(QgsGeometry.fromPointXY(pt))
-            attrs = []
-            for h in header:
-                v = row.get(h)
-                if isinstance(v, str) and len(v) > 254: v = v[:254]
-                attrs.append(v)
-            feat.setAttributes(attrs)
-            writer.addFeature(feat)
-
-        del writer
+def fields_for_schema(schema: RowSchema, record: FeatureRecord) -> QgsFields:
+    fields = QgsFields()
+    for h in BASE_COLUMNS:
+        fields.append(QgsField(h, QVariant.Double))
+    fields.append(QgsField(schema.group_column, QVariant.String))
+    for h, v in zip(schema.attr_columns, record.attrs):
+        fields.append(QgsField(h, qvariant_type_of(v)))
+    return fields
+
+def block_features(block: SampleBlock, fields: QgsFields, schema: RowSchema, text_limit: Optional[int] = None):
+    # point features for every station of a block (SHP/GPKG writers)
+    cols = block.column_values(schema)
+    tail = block.record.tail()
+    if text_limit:
+        tail = [v[:text_limit] if isinstance(v, str) and len(v) > text_limit else v for v in tail]
+    feats = []
+    for x, y, vals in zip(block.x.tolist(), block.y.tolist(), zip(*cols)):
+        feat = QgsFeature(fields)
+        feat.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        feat.setAttributes(list(vals) + tail)
+        feats.append(feat)
+    return feats
+
+class OutputBackend(abc.ABC):
+    """Output format fed by StreamingExporter with batches of SampleBlocks per group."""
+
+    timer = NULL_TIMER  # set by StreamingExporter; backends time their own writes
+
+    @abc.abstractmethod
+    def append(self, group: str, blocks: List[SampleBlock]):
+        pass
+
+    def close_group(self, group: str):
+        pass
+
+    def close(self):
+        pass
+
+class GroupWriter:
+    """Append-only CSV (+ optional point SHP) output of one group.
+
+    The first ``open`` creates the files (SHP field types follow the first
+    feature's attributes); later opens append, so a writer can be closed and
+    reopened at any time.
+    """
+
+    def __init__(self, exporter: "Exporter", group: str, distance_label,
+                 crs: QgsCoordinateReferenceSystem, schema: RowSchema, formatter: CsvBlockFormatter):
+        self.exporter = exporter
+        self.formatter = formatter
+        self.group = group
+        self.distance_label = distance_label
+        self.crs = crs
+        self.schema = schema
+        self.fields: Optional[QgsFields] = None
+        self._csv = None
+        self._shp = None
+        self._open = False
+        self.rows_written = 0
+        self.timer = NULL_TIMER
+
+    @property
+    def is_open(self) -> bool:
+        return self._open
+
+    def open(self, first: SampleBlock):
+        if self.is_open: return
+        ex = self.exporter
+        created = self.fields is None
+        if created:
+            self.fields = fields_for_schema(self.schema, first.record)
+        self._open = True
+        if ex.write_csv_files:
+            self._csv = open(ex._csv_path(self.group, self.distance_label), "w" if created else "a",
+                             newline="", encoding="utf-8", buffering=CSV_BUFFER)
+            if created:
+                csv.writer(self._csv).writerow(self.schema.header)
+        if ex.write_shp:
+            opts = QgsVectorFileWriter.SaveVectorOptions()
+            opts.driverName = "ESRI Shapefile"
+            opts.fileEncoding = "UTF-8"
+            opts.layerName = f"{self.group}_{self.distance_label}_node"
+            if not created:
+                opts.actionOnExistingFile = QgsVectorFileWriter.AppendToLayerNoNewFields
+            w = QgsVectorFileWriter.create(
+                ex._shp_path(self.group, self.distance_label), self.fields, QgsWkbTypes.Point, self.crs,
+                ex.transform_context or QgsProject.instance().transformContext(), opts
+            )
+            self._shp = w if w.hasError() == QgsVectorFileWriter.NoError else None
+
+    def append(self, blocks: List[SampleBlock]):
+        # one write per batch of blocks
+        if self._csv is not None:
+            with self.timer.stage("csv"):
+                self._csv.write("".join(self.formatter.text(b, format_cell) for b in blocks))
+        if self._shp is not None:
+            with self.timer.stage("shp"):
+                for block in blocks:
+                    self._shp.addFeatures(block_features(block, self.fields, self.schema, text_limit=254))
+        self.rows_written += sum(len(b) for b in blocks)
+
+    def close(self):
+        if self._csv is not None:
+            with self.timer.stage("csv"):
+                self._csv.close()
+        self._csv = None
+        if self._shp is not None:
+            with self.timer.stage("shp"):
+                self._shp = None  # deleting the writer flushes the shapefile
+        self._open = False
+
+class CsvShpBackend(OutputBackend):
+    """Per-group CSV/SHP files; at most ``max_open`` groups keep their files open,
+    the least recently used ones are closed and reopened for append."""
+
+    def __init__(self, exporter: "Exporter", crs: QgsCoordinateReferenceSystem, distance_label,
+                 schema: RowSchema, max_open: int = 64, csv_numeric: str = FORMAT_PYTHON,
+                 distance_digits: int = 2):
+        self.exporter = exporter
+        self.crs = crs
+        self.distance_label = distance_label
+        self.schema = schema
+        self.max_open = max(int(max_open), 1)
+        self.formatter = CsvBlockFormatter(schema, numeric=csv_numeric, distance_digits=distance_digits)
+        self.writers: Dict[str, GroupWriter] = {}
+        self._open: "OrderedDict[str, GroupWriter]" = OrderedDict()
+
+    def _writer(self, group: str, first: SampleBlock) -> GroupWriter:
+        w = self.writers.get(group)
+        if w is None:
+            w = self.writers[group] = GroupWriter(self.exporter, group, self.distance_label, self.crs,
+                                                  self.schema, self.formatter)
+            w.timer = self.timer
+        if group in self._open:
+            self._open.move_to_end(group)
+        else:
+            while len(self._open) >= self.max_open:
+                _, old = self._open.popitem(last=False)
+                old.close()
+            w.open(first)
+            self._open[group] = w
+        return w
+
+    def append(self, group: str, blocks: List[SampleBlock]):
+        self._writer(group, blocks[0]).append(blocks)
+
+    def close_group(self, group: str):
+        w = self._open.pop(group, None)
+        if w is not None:
+            w.close()
+
+    def close(self):
+        for w in self._open.values():
+            w.close()
+        self._open.clear()
+
+class StreamingExporter:
+    """Buffers SampleBlocks per group and hands them to the output backends in batches.
+
+    A group is flushed once it holds ``batch_size`` rows; all groups are flushed
+    when ``max_buffered`` rows are pending overall.
+    """
+
+    def __init__(self, backends: List[OutputBackend], batch_size: int = 2048, max_buffered: int = 200_000,
+                 timer=NULL_TIMER):
+        self.backends = backends
+        for b in backends:
+            b.timer = timer
+        self.batch_size = max(int(batch_size), 1)
+        self.max_buffered = max(int(max_buffered), self.batch_size)
+        self._seen = set()
+        self._buffers: Dict[str, List[SampleBlock]] = {}
+        self._counts: Dict[str, int] = {}
+        self._buffered = 0
+
+    def flush_group(self, group: str):
+        buf = self._buffers.pop(group, None)
+        if not buf: return
+        self._buffered -= self._counts.pop(group, 0)
+        for b in self.backends:
+            b.append(group, buf)
+
+    def append_block(self, group: str, block: SampleBlock):
+        if not len(block): return
+        self._seen.add(group)
+        self._buffers.setdefault(group, []).append(block)
+        count = self._counts.get(group, 0) + len(block)
+        self._counts[group] = count
+        self._buffered += len(block)
+        if count >= self.batch_size:
+            self.flush_group(group)
+        elif self._buffered >= self.max_buffered:
+            for g in list(self._buffers):
+                self.flush_group(g)
+
+    def close_group(self, group: str):
+        self.flush_group(group)
+        for b in self.backends:
+            b.close_group(group)
+
+    def close(self):
+        try:
+            for g in list(self._buffers):
+                self.flush_group(g)
+        finally:
+            for b in self.backends:
+                b.close()
+
+    @property
+    def groups(self) -> int:
+        return len(self._seen)
@@ -1,4 +1,7 @@
-from qgis.core import QgsCoordinateReferenceSystem, QgsUnitTypes
+import os
+from qgis.core import QgsCoordinateReferenceSystem, QgsUnitTypes, QgsVectorLayer, QgsRasterLayer
+
+from .cache import file_stamp
 class CRSGuard:
     @staticmethod
     def is_geographic(crs: 'QgsCoordinateReferenceSystem') -> bool:
@@ -6,3 +9,27 @@ class CRSGuard:
     @staticmethod
     def map_units_not_meters(crs: 'QgsCoordinateReferenceSystem') -> bool:
         return crs.mapUnits() != QgsUnitTypes.DistanceMeters
+
+class LayerHandleCache:
+    # external files opened by the dialog; a handle is reused until the file's
+    # modification time or size changes
+    def __init__(self):
+        self._items = {}
+
+    def _get(self, kind: str, path: str, open_layer):
+        stamp = file_stamp(path)
+        hit = self._items.get((kind, path))
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+        lyr = open_layer(path)
+        self._items[(kind, path)] = (stamp, lyr)
+        return lyr
+
+    def vector(self, path: str) -> QgsVectorLayer:
+        return self._get("ogr", path, lambda p: QgsVectorLayer(p, os.path.basename(p), "ogr"))
+
+    def raster(self, path: str) -> QgsRasterLayer:
+        return self._get("gdal", path, lambda p: QgsRasterLayer(p, os.path.basename(p)))
+
+    def clear(self):
+        self._items.clear()
@@ -0,0 +1,656 @@
+import csv, math, os, queue, re, time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, Dict, List, Sequence
+from qgis.core import (
+    QgsProject, QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsFeatureRequest,
+    QgsExpression, QgsExpressionContext, QgsExpressionContextUtils, QgsRectangle,
+    QgsGeometry, QgsVectorLayerFeatureSource, QgsVectorLayer, QgsRasterLayer, QgsWkbTypes
+)
+
+from ..core.sampling import GeometrySampler, ENGINE_NUMPY, part_arrays, part_arrays_z
+from ..core.chainage import cumulative_lengths
+from ..core.assembler import AttributeAssembler
+from ..core.elevation import ElevationSampler, MODE_WINDOW
+from ..core.raster_tiles import NEAREST, RasterGrid
+from ..core.rounding import digits_for_distance, round_array_by_distance
+from ..core.columns import RowSchema
+from ..core.transform import BatchTransformer
+from ..core.mosaic import MosaicIndex, MosaicSampler, ORDER_PRIORITY
+from ..core.route_index import ChainageIndex, INDEX_FILE
+from ..core.topology import build_route, TOPOLOGY_FILE, GAP, BRANCH
+from ..core.options import Z_GEOMETRY, Z_DEM
+from .exporter import Exporter, StreamingExporter, CsvShpBackend, OutputBackend, sanitize_name
+from .backends import GpkgBackend, ParquetBackend, GPKG_SINGLE
+from .csv_format import FORMAT_PYTHON
+from .cache import ResultCache, file_stamp
+from .timing import StageTimer, NULL_TIMER, timed_iter
+
+WGS84 = QgsCoordinateReferenceSystem('EPSG:4326')
+
+def distance_label(distance: float) -> str:
+    # "10" rather than "10.0" for whole metres
+    return str(int(distance)) if abs(distance - int(distance)) < 1e-9 else str(distance)
+
+def parse_distances(text: str):
+    """"1, 10, 100" → (distances, labels); blank means vertices only ([0.0], ["verts"]).
+
+    Raises ValueError for a non-numeric or negative entry.
+    """
+    text = (text or "").strip()
+    if not text:
+        return [0.0], ["verts"]
+    try:
+        distances = [float(t) for t in re.split(r"[,;\s]+", text) if t]
+    except ValueError:
+        raise ValueError("Distance must be a number (or a comma-separated list) or left blank.")
+    if any(d < 0 for d in distances):
+        raise ValueError("Distance must be >= 0.")
+    distances = list(dict.fromkeys(distances))
+    return distances, [distance_label(d) for d in distances]
+
+class PipelineParams:
+    def __init__(self, out_dir: str, distance: float = 0.0, keep_vertices: bool = True,
+                 dist_label: str = "verts", preserve_attrs: bool = True, write_shp: bool = True,
+                 group_field: Optional[str] = None, band: int = 1, engine: str = ENGINE_NUMPY,
+                 dem_mode: str = MODE_WINDOW, dem_interp: str = NEAREST, cache_mb: float = 256,
+                 workers: int = 1, chunk_size: int = 32, max_open_groups: int = 64,
+                 csv_numeric: str = FORMAT_PYTHON, write_csv: bool = True, write_gpkg: bool = False,
+                 gpkg_layout: str = GPKG_SINGLE, write_parquet: bool = False,
+                 distances: Optional[Sequence[float]] = None, dist_labels: Optional[Sequence[str]] = None,
+                 use_cache: bool = False, profile: bool = False, profile_path: Optional[str] = None,
+                 cell_crossings: bool = False, dem_sources: Optional[Sequence[str]] = None,
+                 dem_order: str = ORDER_PRIORITY, max_open_rasters: int = 16, z_source: str = Z_GEOMETRY,
+                 build_index: bool = False, continuous_kp: bool = False, snap_tolerance: float = 0.01,
+                 filter_expression: Optional[str] = None, filter_extent: Optional[QgsRectangle] = None,
+                 group_ordered: bool = False):
+        self.out_dir = out_dir
+        # several distances share one pass; each gets its own set of outputs
+        if distances:
+            self.distances = [float(d or 0.0) for d in distances]
+            self.dist_labels = list(dist_labels) if dist_labels else [distance_label(d) for d in self.distances]
+        else:
+            self.distances = [float(distance or 0.0)]
+            self.dist_labels = [dist_label]
+        self.distance = self.distances[0]
+        self.keep_vertices = keep_vertices
+        self.dist_label = self.dist_labels[0]
+        self.preserve_attrs = preserve_attrs
+        self.write_shp = write_shp
+        self.group_field = group_field or None
+        self.band = int(band or 1)
+        self.engine = engine
+        self.dem_mode = dem_mode
+        self.dem_interp = dem_interp
+        self.cache_mb = cache_mb
+        self.workers = max(int(workers or 1), 1)
+        self.chunk_size = max(int(chunk_size or 1), 1)
+        self.max_open_groups = max(int(max_open_groups or 1), 1)
+        self.csv_numeric = csv_numeric
+        self.write_csv = write_csv
+        self.write_gpkg = write_gpkg
+        self.gpkg_layout = gpkg_layout
+        self.write_parquet = write_parquet
+        self.use_cache = use_cache
+        self.cell_crossings = cell_crossings   # add a station at every DEM cell boundary
+        # raster files/folders sampled as one mosaic instead of a single raster layer
+        self.dem_sources = list(dem_sources or ())
+        self.dem_order = dem_order
+        self.max_open_rasters = max(int(max_open_rasters or 1), 1)
+        self.z_source = z_source
+        self.build_index = build_index   # write a KP ↔ coordinate index of the routes
+        # chain the parts/features of a group into one route with continuous KP;
+        # endpoints closer than snap_tolerance (layer units) are joined
+        self.continuous_kp = continuous_kp
+        self.snap_tolerance = float(snap_tolerance or 0.0)
+        # process a subset only: features matching the expression and/or
+        # intersecting the extent (layer CRS)
+        self.filter_expression = (filter_expression or "").strip() or None
+        # a null rectangle means no extent; a zero-width/height one (a corridor) is kept
+        self.filter_extent = filter_extent if filter_extent is not None and not filter_extent.isNull() else None
+        # read the features group by group and write out / release every group as
+        # soon as it is complete: memory is bounded by the largest group
+        self.group_ordered = group_ordered
+        # per-stage timings; written as JSON to profile_path when given
+        self.profile = bool(profile or profile_path)
+        self.profile_path = profile_path
+
+class PipelineResult:
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.features = 0
+        self.groups = 0
+        self.canceled = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.seconds = 0.0
+        self.timings: Optional[StageTimer] = None
+        self.index_path: Optional[str] = None
+        self.route_gaps = 0
+        self.route_branches = 0
+        self.topology_path: Optional[str] = None
+
+class WorkerContext:
+    # per-thread sampling objects; GDAL handles are not thread-safe, so every
+    # context owns its raster provider and coordinate transforms
+    def __init__(self, pipeline: "NodePipeline", provider, schema: RowSchema):
+        p = pipeline.params
+        to_wgs84 = QgsCoordinateTransform(pipeline.xform_to_wgs84)
+        to_raster = QgsCoordinateTransform(pipeline.xform_to_raster) if pipeline.xform_to_raster else None
+        if pipeline.mosaic is not None:
+            self.elev_sampler = MosaicSampler(pipeline.mosaic, band=p.band, mode=p.dem_mode,
+                                              interpolation=p.dem_interp, cache_mb=p.cache_mb,
+                                              max_open=p.max_open_rasters)
+        else:
+            self.elev_sampler = ElevationSampler(pipeline.raster, to_raster, band=p.band, mode=p.dem_mode,
+                                                 interpolation=p.dem_interp, cache_mb=p.cache_mb,
+                                                 provider=provider)
+        to_pixel = None
+        if p.cell_crossings:
+            grid, batch = RasterGrid(provider), self.elev_sampler.batch
+            to_pixel = lambda xs, ys: grid.to_pixel(*batch.transform_xy(xs, ys))
+        self.sampler = GeometrySampler(p.distance, p.keep_vertices, engine=p.engine, to_pixel=to_pixel)
+        self.assembler = AttributeAssembler(to_wgs84, p.preserve_attrs, schema=schema)
+        self.to_wgs84 = BatchTransformer(to_wgs84)
+        self.timer = StageTimer() if p.profile else NULL_TIMER
+        pipeline.contexts.append(self)
+
+def write_route_issues(path: str, issues):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Group", "Issue", "Easting", "Northing", "Size", "KP"])
+        for t in issues:
+            w.writerow([t.group, t.kind, t.x, t.y, t.size, "" if t.kp != t.kp else t.kp])
+
+class RouteJoiner:
+    """Emit wrapper for continuous-KP runs.
+
+    Blocks of a group arrive together (features are read group by group); on
+    the next group they are written in KP order with Total_3D_Length carried
+    over from each piece to the next.
+    """
+
+    def __init__(self, emit: Callable, distances: Sequence[float]):
+        self.emit = emit
+        self.distances = list(distances)
+        self.group = None
+        self.blocks: List[tuple] = []
+
+    def __call__(self, k: int, group: str, block):
+        if group != self.group:
+            self.flush()
+            self.group = group
+        self.blocks.append((k, block))
+
+    def flush(self):
+        blocks, self.blocks = self.blocks, []
+        for k, step in enumerate(self.distances):
+            total = 0.0
+            for block in sorted((b for kk, b in blocks if kk == k), key=lambda b: b.kp[0]):
+                t = block.total3d
+                if total and len(t) and not np.isnan(t).all():
+                    t = np.nan_to_num(t) + total
+                    block.total3d = round_array_by_distance(t, step)
+                if len(t) and not np.isnan(t[-1]):
+                    total = float(t[-1])
+                self.emit(k, self.group, block)
+
+class GroupCloser:
+    """Emit wrapper for group-ordered runs: when the next group starts, the
+    previous one is flushed to every output and its buffers and files released."""
+
+    def __init__(self, emit: Callable, streams: Sequence[StreamingExporter]):
+        self.emit = emit
+        self.streams = streams
+        self.group = None
+
+    def __call__(self, k: int, group: str, block):
+        if group != self.group:
+            if self.group is not None:
+                for stream in self.streams:
+                    stream.close_group(self.group)
+            self.group = group
+        self.emit(k, group, block)
+
+class NodePipeline:
+    """Sampling → DEM → assembly → export for one line layer.
+
+    Construct on the main thread: layers are snapshotted (feature source, cloned
+    raster provider) so that ``run`` can execute inside a QgsTask.
+    """
+
+    def __init__(self, vlyr: QgsVectorLayer, rlyr: Optional[QgsRasterLayer], params: PipelineParams,
+                 transform_context=None, raster_provider=None, mosaic: Optional[MosaicIndex] = None):
+        # ``raster_provider``: an already cloned provider of ``rlyr`` to reuse (batch runs);
+        # ``mosaic``: a prebuilt MosaicIndex of params.dem_sources in the layer CRS
+        self.params = params
+        self.source = QgsVectorLayerFeatureSource(vlyr)
+        self.crs = vlyr.crs()
+        self.total = vlyr.featureCount() or 0   # progress scale; a filtered run counts its features in run()
+        self.fields = vlyr.fields()
+        attr_names = self.fields.names() if params.preserve_attrs else ()
+        self.schemas = [RowSchema(params.group_field, attr_names, int_distances=digits_for_distance(d) == 0)
+                        for d in params.distances]
+        self.schema = self.schemas[0]
+        ctx = transform_context or QgsProject.instance().transformContext()
+        self.transform_context = ctx
+        self.xform_to_wgs84 = QgsCoordinateTransform(self.crs, WGS84, ctx)
+        self.raster = rlyr
+        self.raster_provider = None
+        if rlyr:
+            self.raster_provider = raster_provider or rlyr.dataProvider().clone()
+        self.xform_to_raster = None
+        if rlyr and rlyr.crs() != self.crs:
+            self.xform_to_raster = QgsCoordinateTransform(self.crs, rlyr.crs(), ctx)
+        self.mosaic = None
+        if params.dem_sources:
+            self.mosaic = mosaic or MosaicIndex(params.dem_sources, self.crs, ctx, order=params.dem_order)
+            if not len(self.mosaic):
+                raise ValueError("None of the DEM sources could be opened as a raster.")
+            self.raster, self.raster_provider, self.xform_to_raster = None, None, None
+        self.has_dem = self.raster_provider is not None or self.mosaic is not None
+        if params.cell_crossings:
+            # the crossings are found on the grid of one raster, by the NumPy sampler
+            if self.mosaic is not None:
+                raise ValueError("DEM cell crossings need a single elevation raster, not a mosaic.")
+            if self.raster_provider is None:
+                raise ValueError("DEM cell crossings need an elevation raster.")
+            if params.engine != ENGINE_NUMPY:
+                raise ValueError("DEM cell crossings need the NumPy engine.")
+        self.use_geometry_z = QgsWkbTypes.hasZ(vlyr.wkbType()) and params.z_source != Z_DEM
+        # everything besides geometry and distance that changes the sampled values
+        if self.mosaic is not None:
+            dem = (*self.mosaic.stamp(), params.band, params.dem_interp)
+        else:
+            dem = (rlyr.source(), file_stamp(rlyr.source()), params.band, params.dem_interp) if rlyr else ()
+        self.cache_settings = (params.keep_vertices, params.engine, self.crs.authid(), *dem)
+        if params.continuous_kp:
+            self.cache_settings += ("route", params.snap_tolerance)
+        if self.use_geometry_z:
+            self.cache_settings += ("z",)
+        if params.cell_crossings:
+            self.cache_settings += ("cells",)
+        self.filtered = params.filter_expression is not None or params.filter_extent is not None
+        self.request = self.feature_request(vlyr, params.preserve_attrs)
+        self.route_request = self.feature_request(vlyr, False)
+        self.cache: Optional[ResultCache] = None
+        self.route_index: Optional[ChainageIndex] = None
+        self.layout: Optional[Dict[tuple, tuple]] = None   # (fid, part) → (KP0, reversed)
+        self.contexts: List[WorkerContext] = []
+
+    def _part_samples(self, part, ctx: WorkerContext, distances: Sequence[float]):
+        # (xs, ys, kps, lons, lats, elevs) per distance; vertices and chainage are read
+        # once, and stations shared between distances are transformed and sampled once.
+        # Elevations come from geometry Z when present; the DEM fills the gaps.
+        timer = ctx.timer
+        with timer.stage("sampling"):
+            sets = ctx.sampler.sample_arrays_multi(part, distances, with_z=self.use_geometry_z)
+        zs_list = [s[3] for s in sets] if self.use_geometry_z else [None] * len(sets)
+        sets = [s[:3] for s in sets]
+        sizes = [len(xs) for xs, _, _ in sets]
+        if not sum(sizes):
+            return []
+        has_z = zs_list[0] is not None
+        if len(sets) == 1:
+            xs, ys, _ = sets[0]
+            ux, uy, uz, inv = xs, ys, zs_list[0], None
+        else:
+            ax, ay, ak = (np.concatenate(c) for c in zip(*sets))
+            # a station is identified by its chainage along the part
+            _, first, inv = np.unique(np.round(ak, 6), return_index=True, return_inverse=True)
+            ux, uy = ax[first], ay[first]
+            uz = np.concatenate(zs_list)[first] if has_z else None
+        with timer.stage("transform"):
+            lons, lats = ctx.to_wgs84.transform_xy(ux, uy)
+        elevs = uz
+        if self.has_dem:
+            gap = np.isnan(uz) if has_z else None
+            if gap is None or gap.any():
+                with timer.stage("dem"):
+                    if gap is None:
+                        elevs = ctx.elev_sampler.sample_xy(ux, uy)
+                    else:
+                        elevs = uz.copy()
+                        elevs[gap] = ctx.elev_sampler.sample_xy(ux[gap], uy[gap])
+        if inv is None:
+            return [(xs, ys, sets[0][2], lons, lats, elevs)]
+        out, start = [], 0
+        for (xs, ys, kps), n in zip(sets, sizes):
+            idx = inv[start:start + n]
+            start += n
+            out.append((xs, ys, kps, lons[idx], lats[idx], elevs[idx] if elevs is not None else None))
+        return out
+
+    def feature_request(self, vlyr: QgsVectorLayer, all_attributes: bool) -> QgsFeatureRequest:
+        """Request for the features of the run, fetching only the attributes it needs.
+
+        Without ``all_attributes`` only the group field (and the columns of the
+        filter expression) are read; with neither, geometries only.
+        """
+        p = self.params
+        request = QgsFeatureRequest()
+        names = [p.group_field] if p.group_field and self.fields.indexOf(p.group_field) >= 0 else []
+        if p.filter_expression:
+            expr = QgsExpression(p.filter_expression)
+            if expr.hasParserError():
+                raise ValueError(f"Invalid filter expression: {expr.parserErrorString()}")
+            request.setFilterExpression(p.filter_expression)
+            request.setExpressionContext(QgsExpressionContext(QgsExpressionContextUtils.globalProjectLayerScopes(vlyr)))
+            cols = expr.referencedColumns()
+            if QgsFeatureRequest.ALL_ATTRIBUTES in cols:
+                all_attributes = True
+            names += [c for c in cols if c not in names]
+        if p.filter_extent is not None:
+            request.setFilterRect(self.filter_rect(p.filter_extent))
+        if all_attributes:
+            return request
+        if names:
+            request.setSubsetOfAttributes(names, self.fields)
+        else:
+            request.setNoAttributes()
+        return request
+
+    @staticmethod
+    def filter_rect(extent: QgsRectangle) -> QgsRectangle:
+        """The extent filter as a rectangle providers apply.
+
+        Raises ValueError for non-finite or inverted bounds. A zero width or
+        height is widened by a hair, since an empty rectangle reads as no filter.
+        """
+        bounds = (extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum())
+        if not all(math.isfinite(v) for v in bounds) or bounds[0] > bounds[2] or bounds[1] > bounds[3]:
+            raise ValueError(f"Invalid filter extent: {', '.join(repr(v) for v in bounds)}")
+        if extent.width() > 0 and extent.height() > 0:
+            return extent
+        eps = 1e-9 * max(1.0, *(abs(v) for v in bounds))
+        return QgsRectangle(bounds[0] - eps, bounds[1] - eps, bounds[2] + eps, bounds[3] + eps)
+
+    def group_value(self, feat) -> str:
+        group_field = self.params.group_field
+        if group_field and group_field in feat.fields().names():
+            return str(feat[group_field])
+        return f"feat_{feat.id()}"
+
+    @staticmethod
+    def feature_parts(geom) -> List[QgsGeometry]:
+        return [geom] if not geom.isMultipart() else [QgsGeometry(g.clone()) for g in geom.constParts()]
+
+    def build_routes(self, timer=NULL_TIMER):
+        """Route layout of every group (continuous KP): one pass over the geometries.
+
+        Returns ({group: [fid, ...]}, [RouteIssue, ...]) and sets ``self.layout``.
+        """
+        groups: Dict[str, List[int]] = {}
+        pieces: Dict[str, list] = {}
+        for feat in timed_iter(self.source.getFeatures(self.route_request), timer, "read"):
+            gval = self.group_value(feat)
+            groups.setdefault(gval, []).append(feat.id())
+            geom = feat.geometry()
+            if not geom or geom.isEmpty():
+                continue
+            with timer.stage("topology"):
+                for i, part in enumerate(self.feature_parts(geom)):
+                    xs, ys = part_arrays(part)
+                    if len(xs):
+                        length = float(cumulative_lengths(xs, ys)[-1])
+                        pieces.setdefault(gval, []).append(((feat.id(), i), (xs[0], ys[0]), (xs[-1], ys[-1]), length))
+        layout, issues = {}, []
+        with timer.stage("topology"):
+            for gval, ps in pieces.items():
+                route = build_route(gval, *zip(*ps), tol=self.params.snap_tolerance)
+                layout.update(route.pieces)
+                issues.extend(route.issues)
+        self.layout = layout
+        return groups, issues
+
+    def group_features(self, timer=NULL_TIMER) -> Dict[str, List[int]]:
+        # {output group: [fid, ...]} in first-seen order; attributes only unless
+        # the extent filter needs the geometry
+        request = QgsFeatureRequest(self.route_request)
+        if self.params.filter_extent is None:
+            request.setFlags(request.flags() | QgsFeatureRequest.NoGeometry)
+        groups: Dict[str, List[int]] = {}
+        for feat in timed_iter(self.source.getFeatures(request), timer, "read"):
+            groups.setdefault(sanitize_name(self.group_value(feat)), []).append(feat.id())
+        return groups
+
+    def count_features(self, timer=NULL_TIMER) -> int:
+        # features passing the filters: the filter columns only, no geometry unless
+        # the extent filter needs it
+        request = QgsFeatureRequest(self.route_request)
+        if self.params.filter_extent is None:
+            request.setFlags(request.flags() | QgsFeatureRequest.NoGeometry)
+        return sum(1 for _ in timed_iter(self.source.getFeatures(request), timer, "read"))
+
+    def _route_features(self, groups: Dict[str, List[int]]):
+        # the features of one group after another, so that groups can be completed
+        for fids in groups.values():
+            request = QgsFeatureRequest(self.request).setFilterFids(fids)
+            feats = {f.id(): f for f in self.source.getFeatures(request)}
+            for fid in fids:
+                if fid in feats:
+                    yield feats.pop(fid)
+
+    def _index_part(self, part, ctx: WorkerContext, route: str, fid: int, i: int, kp0: float = 0.0):
+        # vertices with geometry Z, else DEM elevations, for the chainage index
+        if self.use_geometry_z:
+            xs, ys, zs = part_arrays_z(part)
+        else:
+            (xs, ys), zs = part_arrays(part), None
+        if self.has_dem and (zs is None or np.isnan(zs).any()):
+            with ctx.timer.stage("dem"):
+                dem = ctx.elev_sampler.sample_xy(xs, ys)
+            zs = dem if zs is None else np.where(np.isnan(zs), dem, zs)
+        self.route_index.add_part(route, xs, ys, zs, fid, i, kp0)
+
+    def process_feature(self, feat, ctx: WorkerContext, emit: Callable):
+        # emit(k, group, SampleBlock) for every part of the feature and every distance k
+        assembler, timer = ctx.assembler, ctx.timer
+        distances = self.params.distances
+
+        geom = feat.geometry()
+        if not geom or geom.isEmpty():
+            return
+
+        gval = self.group_value(feat)
+        parts = self.feature_parts(geom)
+        # route position per part: KP of its first station, digitised against the route
+        lays = [(0.0, False)] * len(parts)
+        if self.layout is not None:
+            lays = [self.layout.get((feat.id(), i), (0.0, False)) for i in range(len(parts))]
+            parts = [QgsGeometry(part.constGet().reversed()) if rev else part for part, (_, rev) in zip(parts, lays)]
+        with timer.stage("assembly"):
+            safe = sanitize_name(gval)
+            record = assembler.feature_record(feat, gval)
+
+        cache = self.cache
+        blocks = [None] * len(distances)
+        if cache is not None:
+            with timer.stage("cache"):
+                wkb = bytes(geom.asWkb())
+                if self.layout is not None:
+                    wkb += repr(lays).encode("ascii")
+                keys = [cache.key(wkb, d) for d in distances]
+                blocks = [cache.get(key, record) for key in keys]
+        todo = [k for k, b in enumerate(blocks) if b is None]
+
+        if self.route_index is not None:
+            with timer.stage("index"):
+                for i, (part, (kp0, _)) in enumerate(zip(parts, lays)):
+                    self._index_part(part, ctx, gval, feat.id(), i, kp0)
+
+        if todo:
+            for k in todo:
+                blocks[k] = []
+            for part, (kp0, _) in zip(parts, lays):
+                sets = self._part_samples(part, ctx, [distances[k] for k in todo])
+                for k, (xs, ys, kps, lons, lats, elevs) in zip(todo, sets):
+                    if len(xs):
+                        if kp0:
+                            kps = kps + kp0
+                        with timer.stage("azimuth/length"):
+                            block = assembler.assemble_block(xs, ys, kps, elevs, lons, lats, record, distances[k])
+                        blocks[k].append(block)
+            if cache is not None:
+                with timer.stage("cache"):
+                    for k in todo:
+                        cache.put(keys[k], blocks[k])
+
+        for k, part_blocks in enumerate(blocks):
+            for block in part_blocks:
+                emit(k, safe, block)
+
+    def backends(self, k: int = 0) -> List[OutputBackend]:
+        # outputs of the k-th distance
+        p = self.params
+        ctx = self.transform_context
+        distance, label, schema = p.distances[k], p.dist_labels[k], self.schemas[k]
+        out = []
+        if p.write_csv or p.write_shp:
+            exporter = Exporter(p.out_dir, p.write_shp, transform_context=ctx, write_csv=p.write_csv)
+            out.append(CsvShpBackend(exporter, self.crs, label, schema, max_open=p.max_open_groups,
+                                     csv_numeric=p.csv_numeric, distance_digits=digits_for_distance(distance)))
+        if p.write_gpkg:
+            out.append(GpkgBackend(os.path.join(p.out_dir, f"nodes_{label}.gpkg"), self.crs, label,
+                                   schema, layout=p.gpkg_layout, transform_context=ctx))
+        if p.write_parquet:
+            out.append(ParquetBackend(os.path.join(p.out_dir, f"nodes_{label}.parquet"), self.crs,
+                                      schema, layer_fields=self.fields, transform_context=ctx))
+        return out
+
+    def _run_serial(self, feats, feedback, result: PipelineResult, emit: Callable) -> bool:
+        ctx = WorkerContext(self, self.raster_provider, self.schema)
+        total = self.total
+        for i, feat in enumerate(feats):
+            if feedback is not None:
+                if feedback.isCanceled():
+                    return False
+                if total:
+                    feedback.setProgress(100.0 * i / total)
+            self.process_feature(feat, ctx, emit)
+            result.features += 1
+        return True
+
+    def _run_parallel(self, feats, feedback, result: PipelineResult, emit: Callable) -> bool:
+        # chunks of features go to a thread pool; results are replayed in submission
+        # order so the output is identical to a serial run
+        p = self.params
+        contexts = queue.Queue()
+        for _ in range(p.workers):
+            provider = self.raster_provider.clone() if self.raster_provider else None
+            contexts.put(WorkerContext(self, provider, self.schema))
+
+        def work(chunk):
+            ctx = contexts.get()
+            try:
+                out = []
+                add = lambda k, g, block: out.append((k, g, block))
+                for feat in chunk:
+                    self.process_feature(feat, ctx, add)
+                return out
+            finally:
+                contexts.put(ctx)
+
+        pending = deque()
+        total = self.total
+
+        def drain(limit: int):
+            while len(pending) > limit:
+                fut, count = pending.popleft()
+                for k, g, block in fut.result():
+                    emit(k, g, block)
+                result.features += count
+                if feedback is not None and total:
+                    feedback.setProgress(100.0 * result.features / total)
+
+        with ThreadPoolExecutor(max_workers=p.workers) as pool:
+            chunk = []
+            for feat in feats:
+                if feedback is not None and feedback.isCanceled():
+                    for fut, _ in pending:
+                        fut.cancel()
+                    return False
+                chunk.append(feat)
+                if len(chunk) >= p.chunk_size:
+                    pending.append((pool.submit(work, chunk), len(chunk)))
+                    chunk = []
+                    drain(2 * p.workers)   # bound the number of chunks in flight
+            if chunk:
+                pending.append((pool.submit(work, chunk), len(chunk)))
+            drain(0)
+        return True
+
+    def run(self, feedback=None) -> PipelineResult:
+        """Process every feature and write the per-group outputs.
+
+        ``feedback`` is anything with ``setProgress``/``isCanceled`` (QgsTask, QgsFeedback).
+        """
+        p = self.params
+        t0 = time.perf_counter()
+        result = PipelineResult(p.out_dir)
+        os.makedirs(p.out_dir, exist_ok=True)
+        timer = StageTimer() if p.profile else NULL_TIMER   # main thread: reads and output
+        self.contexts = []
+        self.cache = ResultCache(p.out_dir, self.cache_settings) if p.use_cache else None
+        self.route_index = ChainageIndex() if p.build_index else None
+        self.layout = None
+        groups, issues = None, []
+        if p.continuous_kp:
+            groups, issues = self.build_routes(timer)
+        elif p.group_ordered and p.group_field:
+            groups = self.group_features(timer)
+        if groups is not None:
+            self.total = sum(len(fids) for fids in groups.values())
+        elif self.filtered:
+            self.total = self.count_features(timer)
+        streams = [StreamingExporter(self.backends(k), timer=timer) for k in range(len(p.distances))]
+        emit = lambda k, g, block: streams[k].append_block(g, block)
+        if p.group_ordered:
+            emit = GroupCloser(emit, streams)
+        joiner = None
+        if p.continuous_kp:
+            emit = joiner = RouteJoiner(emit, p.distances)
+
+        if groups is not None and p.group_field:
+            feats = timed_iter(self._route_features(groups), timer, "read")
+        else:
+            feats = timed_iter(self.source.getFeatures(self.request), timer, "read")
+        runner = self._run_parallel if p.workers > 1 else self._run_serial
+        ok = False
+        try:
+            ok = runner(feats, feedback, result, emit)
+        finally:
+            if joiner is not None:
+                joiner.flush()
+            for stream in streams:
+                stream.close()
+            if self.cache is not None:
+                # only a complete, unfiltered run knows which entries are stale
+                self.cache.close(prune=ok and not self.filtered)
+                result.cache_hits, result.cache_misses = self.cache.hits, self.cache.misses
+                self.cache = None
+        result.groups = max(stream.groups for stream in streams)
+        result.seconds = time.perf_counter() - t0
+        if p.profile:
+            for ctx in self.contexts:
+                timer.merge(ctx.timer)
+            result.timings = timer
+            if p.profile_path:
+                timer.write_json(p.profile_path, seconds=round(result.seconds, 6), features=result.features,
+                                 workers=p.workers)
+        self.contexts = []
+        if not ok:
+            result.canceled = True
+            return result
+        if self.route_index is not None:
+            result.index_path = os.path.join(p.out_dir, INDEX_FILE)
+            self.route_index.save(result.index_path)
+        if p.continuous_kp:
+            result.route_gaps = sum(1 for t in issues if t.kind == GAP)
+            result.route_branches = sum(1 for t in issues if t.kind == BRANCH)
+            result.topology_path = os.path.join(p.out_dir, TOPOLOGY_FILE)
+            write_route_issues(result.topology_path, issues)
+        if feedback is not None:
+            feedback.setProgress(100.0)
+        return result
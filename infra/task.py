@@ -0,0 +1,33 @@
+from typing import Callable, Optional
+from qgis.core import QgsTask
+
+from .pipeline import NodePipeline, PipelineResult
+
+class NodePipelineTask(QgsTask):
+    """Runs a NodePipeline in the QGIS task manager.
+
+    ``on_done(result, error)`` is called on the main thread when the task ends;
+    ``result.canceled`` is set if the user cancelled it.
+    """
+
+    def __init__(self, pipeline: NodePipeline, on_done: Callable[[Optional[PipelineResult], Optional[Exception]], None]):
+        super().__init__("Line Node Processor", QgsTask.CanCancel)
+        self.pipeline = pipeline
+        self.on_done = on_done
+        self.result: Optional[PipelineResult] = None
+        self.error: Optional[Exception] = None
+
+    def run(self) -> bool:
+        try:
+            self.result = self.pipeline.run(self)
+        except Exception as e:
+            self.error = e
+            return False
+        return not self.result.canceled
+
+    def finished(self, ok: bool):
+        if self.result is None and self.error is None:
+            # cancelled before run() started
+            self.result = PipelineResult(self.pipeline.params.out_dir)
+            self.result.canceled = True
+        self.on_done(self.result, self.error)
@@ -0,0 +1,96 @@
+import json, time
+from typing import Dict, Iterable, Iterator
+
+TIMINGS_FILE = "node_timings.json"
+
+class _Stage:
+    __slots__ = ("timer", "name", "t0")
+
+    def __init__(self, timer: "StageTimer", name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.t0)
+        return False
+
+class StageTimer:
+    """Wall time and call count per named stage.
+
+    Not thread-safe: give every worker its own timer and ``merge`` them.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def add(self, name: str, seconds: float, calls: int = 1):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def merge(self, other: "StageTimer"):
+        for name, s in other.seconds.items():
+            self.add(name, s, other.calls.get(name, 0))
+
+    def to_dict(self) -> dict:
+        return {name: {"seconds": round(s, 6), "calls": self.calls.get(name, 0)}
+                for name, s in sorted(self.seconds.items(), key=lambda kv: -kv[1])}
+
+    def summary(self) -> str:
+        lines = [f"{name:<16}{s:10.3f} s {self.calls.get(name, 0):>10} calls"
+                 for name, s in sorted(self.seconds.items(), key=lambda kv: -kv[1])]
+        return "\n".join(lines)
+
+    def write_json(self, path: str, **extra):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**extra, "stages": self.to_dict()}, f, indent=1)
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class NullTimer:
+    # instrumentation switched off: stage() hands back one shared no-op context
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name: str) -> _NullStage:
+        return self._stage
+
+    def add(self, name: str, seconds: float, calls: int = 1):
+        pass
+
+    def merge(self, other):
+        pass
+
+NULL_TIMER = NullTimer()
+
+def timed_iter(items: Iterable, timer, name: str) -> Iterator:
+    # times each next() of ``items`` (e.g. feature reads from the provider)
+    if not timer.enabled:
+        yield from items
+        return
+    it = iter(items)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            timer.add(name, time.perf_counter() - t0, 0)
+            return
+        timer.add(name, time.perf_counter() - t0)
+        yield item
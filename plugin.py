@@ -1,15 +1,25 @@
 import os
 from qgis.PyQt.QtWidgets import QAction
 from qgis.PyQt.QtGui import QIcon
-from .ui.dialog import LineNodeProcessorDialog
+from qgis.core import QgsApplication
+
+# Only the menu action and the Processing provider are set up at QGIS startup;
+# the dialog (and with it the pipeline, NumPy and the exporters) loads on first use.
 
 class LineNodeProcessorPlugin:
     def __init__(self, iface):
         self.iface = iface
         self.action = None
         self.dlg = None
+        self.provider = None
+
+    def initProcessing(self):
+        from .processing_provider.provider import LineNodeProvider
+        self.provider = LineNodeProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
 
     def initGui(self):
+        self.initProcessing()
         icon_path = os.path.join(os.path.dirname(__file__), 'icons', 'icon.ico')
         self.action = QAction(QIcon(icon_path), "Line Node Processor…", self.iface.mainWindow())
         self.action.triggered.connect(self.run_dialog)
@@ -17,6 +27,9 @@ class LineNodeProcessorPlugin:
         self.iface.addToolBarIcon(self.action)
 
     def unload(self):
+        if self.provider:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
         if self.action:
             self.iface.removePluginMenu("&Line Node Processor", self.action)
             self.iface.removeToolBarIcon(self.action)
@@ -27,6 +40,7 @@ class LineNodeProcessorPlugin:
 
     def run_dialog(self):
         if not self.dlg:
+            from .ui.dialog import LineNodeProcessorDialog
             self.dlg = LineNodeProcessorDialog(self.iface)
         self.dlg.show()
         self.dlg.raise_()
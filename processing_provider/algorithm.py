@@ -0,0 +1,206 @@
+import os
+from qgis.core import (
+    QgsProcessing, QgsProcessingAlgorithm, QgsProcessingException,
+    QgsProcessingParameterVectorLayer, QgsProcessingParameterRasterLayer, QgsProcessingParameterField,
+    QgsProcessingParameterString, QgsProcessingParameterBoolean, QgsProcessingParameterBand,
+    QgsProcessingParameterEnum, QgsProcessingParameterNumber, QgsProcessingParameterFolderDestination,
+    QgsProcessingOutputNumber, QgsProcessingParameterMultipleLayers, QgsProcessingParameterFile,
+    QgsProcessingParameterExpression, QgsProcessingParameterExtent
+)
+
+from ..infra.timing import TIMINGS_FILE
+# option values only: the provider is registered at QGIS startup, the pipeline
+# modules are imported when the algorithm first runs
+from ..core.options import (
+    ENGINES, GPKG_LAYOUTS, DEM_ORDERS, DEM_MODES, Z_SOURCES, INDEX_FILE
+)
+
+# one name per DEM_MODES entry
+DEM_MODE_NAMES = ["Per-part window – nearest", "Per-part window – bilinear", "Per point (provider.sample)",
+                  "Tiled cache – nearest", "Tiled cache – bilinear"]
+
+class LineNodeAlgorithm(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    DEM = "DEM"
+    DEM_TILES = "DEM_TILES"
+    DEM_FOLDER = "DEM_FOLDER"
+    DEM_ORDER = "DEM_ORDER"
+    BAND = "BAND"
+    DEM_MODE = "DEM_MODE"
+    Z_SOURCE = "Z_SOURCE"
+    GROUP_FIELD = "GROUP_FIELD"
+    DISTANCES = "DISTANCES"
+    KEEP_VERTICES = "KEEP_VERTICES"
+    PRESERVE_ATTRS = "PRESERVE_ATTRS"
+    ENGINE = "ENGINE"
+    WRITE_CSV = "WRITE_CSV"
+    WRITE_SHP = "WRITE_SHP"
+    WRITE_GPKG = "WRITE_GPKG"
+    GPKG_LAYOUT = "GPKG_LAYOUT"
+    WRITE_PARQUET = "WRITE_PARQUET"
+    USE_CACHE = "USE_CACHE"
+    PROFILE = "PROFILE"
+    BUILD_INDEX = "BUILD_INDEX"
+    CONTINUOUS_KP = "CONTINUOUS_KP"
+    SNAP_TOLERANCE = "SNAP_TOLERANCE"
+    GROUP_ORDERED = "GROUP_ORDERED"
+    FILTER_EXPRESSION = "FILTER_EXPRESSION"
+    FILTER_EXTENT = "FILTER_EXTENT"
+    CELL_CROSSINGS = "CELL_CROSSINGS"
+    WORKERS = "WORKERS"
+    OUTPUT = "OUTPUT"
+    FEATURES = "FEATURES"
+    GROUPS = "GROUPS"
+
+    def __init__(self):
+        super().__init__()
+        self._pipeline = None
+
+    def name(self):
+        return "line_node_processor"
+
+    def displayName(self):
+        return "Line Node Processor"
+
+    def group(self):
+        return "Line Tools"
+
+    def groupId(self):
+        return "line_tools"
+
+    def shortHelpString(self):
+        return ("Samples stations along lines at fixed distances and/or the original vertices, with KP, "
+                "azimuth, 2D/3D lengths and DEM elevation. Writes {group}_{distance}_node outputs per group "
+                "into the output folder. Several distances (\"1, 10, 100\") are sampled in one pass.")
+
+    def createInstance(self):
+        return LineNodeAlgorithm()
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(self.INPUT, "Input line layer",
+                                                            [QgsProcessing.TypeVectorLine]))
+        self.addParameter(QgsProcessingParameterRasterLayer(self.DEM, "Elevation raster", optional=True))
+        self.addParameter(QgsProcessingParameterMultipleLayers(self.DEM_TILES, "DEM tiles (mosaic, replaces the raster)",
+                                                               QgsProcessing.TypeRaster, optional=True))
+        self.addParameter(QgsProcessingParameterFile(self.DEM_FOLDER, "DEM tile folder (mosaic)",
+                                                     behavior=QgsProcessingParameterFile.Folder, optional=True))
+        self.addParameter(QgsProcessingParameterEnum(self.DEM_ORDER, "Mosaic fallback order",
+                                                     ["listed order", "finest first"], defaultValue=0))
+        self.addParameter(QgsProcessingParameterBand(self.BAND, "DEM band", 1, self.DEM, optional=True))
+        self.addParameter(QgsProcessingParameterEnum(self.DEM_MODE, "DEM read mode", DEM_MODE_NAMES, defaultValue=0))
+        self.addParameter(QgsProcessingParameterEnum(self.Z_SOURCE, "Elevation of 3D lines",
+                                                     ["Geometry Z (DEM fills gaps)", "DEM only"], defaultValue=0))
+        self.addParameter(QgsProcessingParameterField(self.GROUP_FIELD, "Group field", parentLayerParameterName=self.INPUT,
+                                                      optional=True))
+        self.addParameter(QgsProcessingParameterExpression(self.FILTER_EXPRESSION, "Only features matching",
+                                                           parentLayerParameterName=self.INPUT, optional=True))
+        self.addParameter(QgsProcessingParameterExtent(self.FILTER_EXTENT, "Only features intersecting",
+                                                       optional=True))
+        self.addParameter(QgsProcessingParameterString(self.DISTANCES, "Sampling distance(s) in metres "
+                                                       "(blank ⇒ vertices only)", defaultValue="", optional=True))
+        self.addParameter(QgsProcessingParameterBoolean(self.KEEP_VERTICES, "Preserve vertices", defaultValue=True))
+        self.addParameter(QgsProcessingParameterBoolean(self.CELL_CROSSINGS, "Add a station at every DEM cell crossing",
+                                                        defaultValue=False))
+        self.addParameter(QgsProcessingParameterBoolean(self.CONTINUOUS_KP, "Continuous KP along each group route",
+                                                        defaultValue=False))
+        self.addParameter(QgsProcessingParameterNumber(self.SNAP_TOLERANCE, "Endpoint snapping tolerance",
+                                                       QgsProcessingParameterNumber.Double, defaultValue=0.01,
+                                                       minValue=0.0))
+        self.addParameter(QgsProcessingParameterBoolean(self.GROUP_ORDERED, "Process and write one group at a time",
+                                                        defaultValue=False))
+        self.addParameter(QgsProcessingParameterBoolean(self.PRESERVE_ATTRS, "Keep attributes", defaultValue=True))
+        self.addParameter(QgsProcessingParameterEnum(self.ENGINE, "Sampling engine", list(ENGINES), defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean(self.WRITE_CSV, "Write CSV", defaultValue=True))
+        self.addParameter(QgsProcessingParameterBoolean(self.WRITE_SHP, "Write Shapefile", defaultValue=True))
+        self.addParameter(QgsProcessingParameterBoolean(self.WRITE_GPKG, "Write GeoPackage", defaultValue=False))
+        self.addParameter(QgsProcessingParameterEnum(self.GPKG_LAYOUT, "GeoPackage layout",
+                                                     ["one layer (group column)", "layer per group"], defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean(self.WRITE_PARQUET, "Write GeoParquet", defaultValue=False))
+        self.addParameter(QgsProcessingParameterBoolean(self.USE_CACHE, "Reuse unchanged features", defaultValue=False))
+        self.addParameter(QgsProcessingParameterBoolean(self.PROFILE, f"Stage timings ({TIMINGS_FILE})",
+                                                        defaultValue=False))
+        self.addParameter(QgsProcessingParameterBoolean(self.BUILD_INDEX, f"KP index ({INDEX_FILE})",
+                                                        defaultValue=False))
+        self.addParameter(QgsProcessingParameterNumber(self.WORKERS, "Worker threads", defaultValue=1, minValue=1))
+        self.addParameter(QgsProcessingParameterFolderDestination(self.OUTPUT, "Output folder"))
+        self.addOutput(QgsProcessingOutputNumber(self.FEATURES, "Processed features"))
+        self.addOutput(QgsProcessingOutputNumber(self.GROUPS, "Groups written"))
+
+    def prepareAlgorithm(self, parameters, context, feedback):
+        # main thread: layers are snapshotted here, processAlgorithm only runs the pipeline
+        from ..infra.layer_io import CRSGuard
+        from ..infra.pipeline import NodePipeline, PipelineParams, parse_distances
+        vlyr = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        if vlyr is None:
+            raise QgsProcessingException("Invalid input line layer.")
+        if CRSGuard.is_geographic(vlyr.crs()) or CRSGuard.map_units_not_meters(vlyr.crs()):
+            raise QgsProcessingException("Input layer must be projected in meters (not geographic).")
+        dem_sources = [l.source() for l in self.parameterAsLayerList(parameters, self.DEM_TILES, context)]
+        folder = self.parameterAsFile(parameters, self.DEM_FOLDER, context)
+        if folder:
+            dem_sources.append(folder)
+        rlyr = None if dem_sources else self.parameterAsRasterLayer(parameters, self.DEM, context)
+        if rlyr and (CRSGuard.is_geographic(rlyr.crs()) or CRSGuard.map_units_not_meters(rlyr.crs())):
+            raise QgsProcessingException("Elevation raster must be projected in meters.")
+
+        dist_txt = self.parameterAsString(parameters, self.DISTANCES, context)
+        try:
+            distances, labels = parse_distances(dist_txt)
+        except ValueError as e:
+            raise QgsProcessingException(str(e))
+        fields = self.parameterAsFields(parameters, self.GROUP_FIELD, context)
+        dem_mode, dem_interp = DEM_MODES[self.parameterAsEnum(parameters, self.DEM_MODE, context)]
+        flag = lambda name: self.parameterAsBoolean(parameters, name, context)
+        if not any(flag(n) for n in (self.WRITE_CSV, self.WRITE_SHP, self.WRITE_GPKG, self.WRITE_PARQUET)):
+            raise QgsProcessingException("Please select at least one output format.")
+
+        out_dir = self.parameterAsString(parameters, self.OUTPUT, context)
+        params = PipelineParams(
+            out_dir,
+            distances=distances, dist_labels=labels,
+            keep_vertices=True if not dist_txt.strip() else flag(self.KEEP_VERTICES),
+            preserve_attrs=flag(self.PRESERVE_ATTRS), write_shp=flag(self.WRITE_SHP),
+            group_field=fields[0] if fields else None,
+            band=self.parameterAsInt(parameters, self.BAND, context) or 1,
+            engine=ENGINES[self.parameterAsEnum(parameters, self.ENGINE, context)],
+            dem_mode=dem_mode, dem_interp=dem_interp,
+            workers=self.parameterAsInt(parameters, self.WORKERS, context),
+            write_csv=flag(self.WRITE_CSV), write_gpkg=flag(self.WRITE_GPKG),
+            gpkg_layout=GPKG_LAYOUTS[self.parameterAsEnum(parameters, self.GPKG_LAYOUT, context)],
+            write_parquet=flag(self.WRITE_PARQUET), use_cache=flag(self.USE_CACHE),
+            profile_path=os.path.join(out_dir, TIMINGS_FILE) if flag(self.PROFILE) else None,
+            cell_crossings=flag(self.CELL_CROSSINGS), dem_sources=dem_sources,
+            dem_order=DEM_ORDERS[self.parameterAsEnum(parameters, self.DEM_ORDER, context)],
+            z_source=Z_SOURCES[self.parameterAsEnum(parameters, self.Z_SOURCE, context)],
+            build_index=flag(self.BUILD_INDEX), continuous_kp=flag(self.CONTINUOUS_KP),
+            snap_tolerance=self.parameterAsDouble(parameters, self.SNAP_TOLERANCE, context),
+            group_ordered=flag(self.GROUP_ORDERED),
+            filter_expression=self.parameterAsExpression(parameters, self.FILTER_EXPRESSION, context),
+            filter_extent=self.parameterAsExtent(parameters, self.FILTER_EXTENT, context, vlyr.crs())
+        )
+        try:
+            self._pipeline = NodePipeline(vlyr, rlyr, params, transform_context=context.transformContext())
+        except ValueError as e:
+            raise QgsProcessingException(str(e))
+        mosaic = self._pipeline.mosaic
+        if mosaic is not None:
+            for path in mosaic.skipped:
+                feedback.pushWarning(f"Not a readable raster, skipped: {path}")
+            feedback.pushInfo(f"DEM mosaic: {len(mosaic)} rasters")
+        return True
+
+    def processAlgorithm(self, parameters, context, feedback):
+        result = self._pipeline.run(feedback)
+        self._pipeline = None
+        if result.cache_hits or result.cache_misses:
+            feedback.pushInfo(f"Cache: {result.cache_hits} reused, {result.cache_misses} resampled")
+        if result.topology_path:
+            feedback.pushInfo(f"Routes: {result.route_gaps} gaps, {result.route_branches} branches "
+                              f"({result.topology_path})")
+        if result.index_path:
+            feedback.pushInfo(f"KP index: {result.index_path}")
+        if result.timings is not None:
+            feedback.pushInfo(f"Total {result.seconds:.2f} s; per stage:\n{result.timings.summary()}")
+        if result.canceled:
+            feedback.reportError("Processing was canceled; outputs may be incomplete.")
+        return {self.OUTPUT: result.out_dir, self.FEATURES: result.features, self.GROUPS: result.groups}
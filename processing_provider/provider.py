@@ -0,0 +1,17 @@
+import os
+from qgis.core import QgsProcessingProvider
+from qgis.PyQt.QtGui import QIcon
+
+class LineNodeProvider(QgsProcessingProvider):
+    def loadAlgorithms(self):
+        from .algorithm import LineNodeAlgorithm
+        self.addAlgorithm(LineNodeAlgorithm())
+
+    def id(self):
+        return "line_node_processor"
+
+    def name(self):
+        return "Line Node Processor"
+
+    def icon(self):
+        return QIcon(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'icons', 'icon.ico'))
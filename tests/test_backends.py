@@ -0,0 +1,49 @@
+import os, tempfile, unittest
+import numpy as np
+from qgis.core import QgsApplication, QgsCoordinateReferenceSystem, QgsVectorLayer
+from line_node_processor.cli import init_qgis
+from line_node_processor.core.columns import FeatureRecord, RowSchema, SampleBlock
+from line_node_processor.infra import backends
+from line_node_processor.infra.backends import GpkgBackend, GPKG_LAYERS
+from line_node_processor.infra.exporter import StreamingExporter
+
+_app = None
+
+def setUpModule():
+    global _app
+    if QgsApplication.instance() is None:
+        _app = init_qgis()
+
+def _block(group: str, n: int = 3) -> SampleBlock:
+    xs = np.arange(n, dtype=float)
+    col = np.full(n, 1.0)
+    return SampleBlock(FeatureRecord(0, group), xs, xs, xs, xs, col, col, col, col, xs, col)
+
+class TestGpkgLayers(unittest.TestCase):
+    def test_interleaved_groups_open_each_layer_once(self):
+        opened = []
+        create = backends._create_writer
+
+        def counting(path, layer, *args, **kwargs):
+            opened.append(layer)
+            return create(path, layer, *args, **kwargs)
+
+        groups = [f"g{i}" for i in range(20)]
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "nodes.gpkg")
+            backends._create_writer = counting
+            try:
+                backend = GpkgBackend(path, QgsCoordinateReferenceSystem("EPSG:32633"), "10", RowSchema(None),
+                                      layout=GPKG_LAYERS)
+                stream = StreamingExporter([backend], batch_size=1)
+                for _ in range(5):
+                    for g in groups:
+                        stream.append_block(g, _block(g))
+                stream.close()
+            finally:
+                backends._create_writer = create
+            self.assertEqual(sorted(opened), sorted(set(opened)))
+            self.assertEqual(len(opened), len(groups))
+            for g in groups:
+                lyr = QgsVectorLayer(f"{path}|layername={g}_10_node", g, "ogr")
+                self.assertEqual(lyr.featureCount(), 15)
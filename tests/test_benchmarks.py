@@ -0,0 +1,21 @@
+import unittest
+from line_node_processor.benchmarks.run import compare
+
+def _m(rate, peak=10.0):
+    return {"seconds": 1.0, "stations": rate, "stations_per_s": rate, "peak_mb": peak}
+
+class TestBenchmarkCompare(unittest.TestCase):
+    def setUp(self):
+        self.baseline = {"single_1000": {"sampling": _m(1000.0), "export": _m(500.0)}}
+
+    def test_within_threshold(self):
+        current = {"single_1000": {"sampling": _m(800.0), "export": _m(520.0, 12.0)}}
+        self.assertEqual(compare(self.baseline, current, 0.25), [])
+
+    def test_slower_or_heavier_fails(self):
+        current = {"single_1000": {"sampling": _m(700.0), "export": _m(500.0, 30.0)},
+                   "single_10": {"sampling": _m(1.0)}}   # not in the baseline: ignored
+        out = compare(self.baseline, current, 0.25)
+        self.assertEqual(len(out), 2)
+        self.assertTrue(out[0].startswith("single_1000/sampling"))
+        self.assertIn("peak", out[1])
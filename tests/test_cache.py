@@ -0,0 +1,74 @@
+import os, tempfile, unittest
+import numpy as np
+from line_node_processor.core.columns import FeatureRecord, SampleBlock
+from line_node_processor.infra.cache import ResultCache, _pack, _unpack, file_stamp
+
+def _block(record: FeatureRecord, n: int, seed: int) -> SampleBlock:
+    rng = np.random.default_rng(seed)
+    cols = [rng.uniform(0, 100, n) for _ in range(10)]
+    cols[4][::3] = np.nan   # elevation gaps
+    lon, lat, x, y, elev, d2d, d3d, az, kp, total3d = cols
+    return SampleBlock(record, x, y, lon, lat, elev, d2d, d3d, az, kp, total3d)
+
+class TestPacking(unittest.TestCase):
+    def test_roundtrip(self):
+        rec = FeatureRecord(3, "A", (1, "x"))
+        blocks = [_block(rec, 7, 0), _block(rec, 1, 1), _block(rec, 12, 2)]
+        back = _unpack(_pack(blocks), rec)
+        self.assertEqual([len(b) for b in back], [7, 1, 12])
+        for a, b in zip(blocks, back):
+            self.assertIs(b.record, rec)
+            for u, v in zip(a.arrays(), b.arrays()):
+                np.testing.assert_array_equal(u, v)
+
+    def test_empty(self):
+        self.assertEqual(_unpack(_pack([]), FeatureRecord(0, "A")), [])
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _key(self, settings, distance=10.0, wkb=b"line"):
+        cache = ResultCache(self.dir, settings)
+        try:
+            return cache.key(wkb, distance)
+        finally:
+            cache.close(prune=False)
+
+    def test_key_follows_settings(self):
+        dem = os.path.join(self.dir, "dem.tif")
+        with open(dem, "wb") as f:
+            f.write(b"0")
+        # keep_vertices, engine, CRS, DEM source, DEM stamp, band, interpolation
+        base = (True, "numpy", "EPSG:32633", dem, file_stamp(dem), 1, "nearest")
+        key = self._key(base)
+        self.assertEqual(self._key(base), key)
+        self.assertNotEqual(self._key((False,) + base[1:]), key)
+        self.assertNotEqual(self._key(base[:5] + (2,) + base[6:]), key)
+        self.assertNotEqual(self._key(base, distance=5.0), key)
+        self.assertNotEqual(self._key(base, wkb=b"other line"), key)
+        st = os.stat(dem)
+        os.utime(dem, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertNotEqual(self._key(base[:4] + (file_stamp(dem),) + base[5:]), key)
+
+    def _run(self, keys, prune):
+        # one run that reads or stores the given keys; returns the hit count
+        rec = FeatureRecord(0, "A")
+        cache = ResultCache(self.dir, ("s",))
+        for k in keys:
+            if cache.get(k, rec) is None:
+                cache.put(k, [_block(rec, 3, 0)])
+        hits = cache.hits
+        cache.close(prune=prune)
+        return hits
+
+    def test_prune_drops_unused_entries(self):
+        self.assertEqual(self._run(["a", "b", "c"], prune=True), 0)
+        self.assertEqual(self._run(["a"], prune=False), 1)
+        self.assertEqual(self._run(["a", "b", "c"], prune=True), 3)   # kept without pruning
+        self.assertEqual(self._run(["a"], prune=True), 1)
+        self.assertEqual(self._run(["a", "b", "c"], prune=True), 1)   # b and c were pruned
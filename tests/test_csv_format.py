@@ -0,0 +1,40 @@
+import csv, io, unittest
+import numpy as np
+from line_node_processor.core.columns import FeatureRecord, RowSchema, SampleBlock
+from line_node_processor.core.rounding import round_array, digits_for_distance
+from line_node_processor.infra.csv_format import CsvBlockFormatter, FORMAT_PYTHON, FORMAT_NUMPY
+
+def _cell(v):
+    return "" if v is None else str(v)
+
+class TestCsvBlockFormatter(unittest.TestCase):
+    def _block(self, step, schema):
+        rng = np.random.default_rng(7)
+        n = 200
+        xs = np.cumsum(rng.uniform(0, 2 * step, n)) + 250000.0
+        ys = np.cumsum(rng.uniform(-3, 3, n)) + 2700000.0
+        d = digits_for_distance(step)
+        dist = round_array(rng.uniform(0, 2 * step, n), d); dist[0] = np.nan
+        elev = rng.uniform(10, 90, n); elev[::17] = np.nan
+        rec = FeatureRecord(1, "route, A", (3, 'say "hi"'), schema.attr_columns)
+        return SampleBlock(rec, xs, ys, round_array(xs / 1e6, 8), round_array(ys / 1e6, 8), elev,
+                           dist, dist, round_array(rng.uniform(0, 360, n), 3),
+                           round_array(np.cumsum(dist[1:].tolist() + [0.0]), d), np.full(n, np.nan))
+
+    def test_matches_csv_writer(self):
+        for step in (0.5, 5.0, 25.0):
+            schema = RowSchema("name", ["a", "name"], int_distances=digits_for_distance(step) == 0)
+            block = self._block(step, schema)
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            for row in block.rows(schema):
+                w.writerow([_cell(v) for v in row])
+            for numeric in (FORMAT_PYTHON, FORMAT_NUMPY):
+                fmt = CsvBlockFormatter(schema, numeric=numeric, distance_digits=digits_for_distance(step))
+                self.assertEqual(fmt.text(block, _cell), buf.getvalue(), (step, numeric))
+
+class TestFeatureRecord(unittest.TestCase):
+    def test_cells_follow_the_formatter(self):
+        rec = FeatureRecord(1, "A", (1.5, None))
+        self.assertEqual(rec.cells(_cell), ["A", "1.5", ""])
+        self.assertEqual(rec.cells(lambda v: "x"), ["x", "x", "x"])
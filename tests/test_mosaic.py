@@ -0,0 +1,90 @@
+import os, tempfile, unittest
+import numpy as np
+from qgis.core import QgsApplication, QgsCoordinateReferenceSystem, QgsProject
+from line_node_processor.cli import init_qgis
+from line_node_processor.core.mosaic import MosaicIndex, MosaicSampler, ORDER_PRIORITY, ORDER_RESOLUTION
+
+try:
+    from osgeo import gdal, osr
+except ImportError:
+    gdal = None
+
+NODATA = -9999.0
+X0, Y0 = 500000.0, 4500000.0   # EPSG:32633, about 15° E 40.65° N
+
+_app = None
+
+def setUpModule():
+    global _app
+    if QgsApplication.instance() is None:
+        _app = init_qgis()
+
+def _srs(epsg: int):
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(epsg)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return srs
+
+def _tif(path: str, epsg: int, xmin: float, ymax: float, res: float, values: np.ndarray):
+    ds = gdal.GetDriverByName("GTiff").Create(path, values.shape[1], values.shape[0], 1, gdal.GDT_Float32)
+    ds.SetGeoTransform((xmin, res, 0.0, ymax, 0.0, -res))
+    ds.SetProjection(_srs(epsg).ExportToWkt())
+    band = ds.GetRasterBand(1)
+    band.SetNoDataValue(NODATA)
+    band.WriteArray(values.astype(np.float32))
+    ds = None
+    return path
+
+@unittest.skipIf(gdal is None, "GDAL Python bindings required")
+class TestMosaic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        d = self.tmp.name
+        # 10 m cells, value 1, no data over its western half
+        coarse = np.ones((10, 10))
+        coarse[:, :5] = NODATA
+        self.coarse = _tif(os.path.join(d, "coarse.tif"), 32633, X0, Y0 + 100.0, 10.0, coarse)
+        # 1 m cells, value 2, same 100 m square
+        self.fine = _tif(os.path.join(d, "fine.tif"), 32633, X0, Y0 + 100.0, 1.0, np.full((100, 100), 2.0))
+        # 0.001° cells, value 3, around the square
+        self.degrees = _tif(os.path.join(d, "degrees.tif"), 4326, 14.9, 40.8, 0.001, np.full((300, 200), 3.0))
+        # 12 m Web Mercator cells (about 9.1 m on the ground here), value 4, around the square
+        to_merc = osr.CoordinateTransformation(_srs(32633), _srs(3857))
+        mx, my, _ = to_merc.TransformPoint(X0 + 50.0, Y0 + 50.0)
+        self.mercator = _tif(os.path.join(d, "mercator.tif"), 3857, mx - 1800.0, my + 1800.0, 12.0,
+                             np.full((300, 300), 4.0))
+        self.crs = QgsCoordinateReferenceSystem("EPSG:32633")
+        # western half, eastern half, outside every raster
+        self.xs = np.array([X0 + 20.0, X0 + 80.0, X0 + 50000.0])
+        self.ys = np.array([Y0 + 50.0, Y0 + 50.0, Y0 + 50.0])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _sample(self, paths, order):
+        mosaic = MosaicIndex(paths, self.crs, QgsProject.instance().transformContext(), order=order)
+        return MosaicSampler(mosaic).sample_xy(self.xs, self.ys)
+
+    def test_priority_fills_gaps_from_later_rasters(self):
+        z = self._sample([self.coarse, self.fine], ORDER_PRIORITY)
+        np.testing.assert_array_equal(z[:2], [2.0, 1.0])
+        self.assertTrue(np.isnan(z[2]))
+
+    def test_resolution_puts_finest_first(self):
+        z = self._sample([self.coarse, self.fine], ORDER_RESOLUTION)
+        np.testing.assert_array_equal(z[:2], [2.0, 2.0])
+
+    def test_resolution_compares_cells_in_layer_units(self):
+        # 12 m in Web Mercator is finer than 10 m in UTM here despite the larger number
+        mosaic = MosaicIndex([self.coarse, self.mercator], self.crs, QgsProject.instance().transformContext(),
+                             order=ORDER_RESOLUTION)
+        res = {os.path.basename(fp.path): fp.res for fp in mosaic.footprints}
+        self.assertAlmostEqual(res["coarse.tif"], 10.0)
+        self.assertTrue(8.0 < res["mercator.tif"] < 10.0)
+        z = MosaicSampler(mosaic).sample_xy(self.xs, self.ys)
+        np.testing.assert_array_equal(z[:2], [4.0, 4.0])
+
+    def test_rasters_in_degrees_are_rejected(self):
+        with self.assertRaises(ValueError) as cm:
+            MosaicIndex([self.coarse, self.degrees], self.crs, QgsProject.instance().transformContext())
+        self.assertIn("degrees.tif", str(cm.exception))
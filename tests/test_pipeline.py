@@ -0,0 +1,90 @@
+import os, tempfile, unittest
+from qgis.core import QgsApplication, QgsRectangle
+from line_node_processor.cli import init_qgis
+from line_node_processor.benchmarks.synthetic import line_geometry, line_layer, write_dem
+from line_node_processor.core.options import ENGINE_QGIS
+from line_node_processor.infra.pipeline import NodePipeline, PipelineParams
+
+_app = None
+
+def setUpModule():
+    global _app
+    if QgsApplication.instance() is None:
+        _app = init_qgis()
+
+def _outputs(out_dir: str) -> dict:
+    out = {}
+    for name in sorted(os.listdir(out_dir)):
+        if name.endswith(".csv"):
+            with open(os.path.join(out_dir, name), "rb") as f:
+                out[name] = f.read()
+    return out
+
+class TestParallelRun(unittest.TestCase):
+    def test_workers_match_serial_output(self):
+        # single and multipart lines spread over three groups
+        geoms = [line_geometry(40 + 7 * i, parts=1 + i % 3, seed=i) for i in range(24)]
+        layer = line_layer(geoms, groups=3)
+        with tempfile.TemporaryDirectory() as d:
+            outputs = []
+            for workers in (1, 4):
+                out_dir = os.path.join(d, f"w{workers}")
+                params = PipelineParams(out_dir, distances=[2.5, 10.0], write_shp=False, group_field="route",
+                                        workers=workers, chunk_size=2)
+                result = NodePipeline(layer, None, params).run()
+                self.assertFalse(result.canceled)
+                self.assertEqual(result.features, len(geoms))
+                outputs.append(_outputs(out_dir))
+        self.assertEqual(len(outputs[0]), 6)
+        self.assertEqual(outputs[0], outputs[1])
+
+class TestFilterExtent(unittest.TestCase):
+    def test_corridor_extent_is_kept(self):
+        # zero height: an east-west corridor, not "no extent"
+        params = PipelineParams("out", filter_extent=QgsRectangle(0.0, 50.0, 100.0, 50.0))
+        self.assertIsNotNone(params.filter_extent)
+        rect = NodePipeline.filter_rect(params.filter_extent)
+        self.assertTrue(rect.width() > 0 and rect.height() > 0)
+        self.assertTrue(rect.contains(QgsRectangle(0.0, 50.0, 100.0, 50.0)))
+
+    def test_null_extent_is_dropped(self):
+        self.assertIsNone(PipelineParams("out", filter_extent=QgsRectangle()).filter_extent)
+
+    def test_invalid_extent_raises(self):
+        with self.assertRaises(ValueError):
+            NodePipeline.filter_rect(QgsRectangle(10.0, 0.0, 0.0, 10.0, False))
+        with self.assertRaises(ValueError):
+            NodePipeline.filter_rect(QgsRectangle(0.0, 0.0, float("inf"), 10.0))
+
+class TestCellCrossings(unittest.TestCase):
+    def test_unsupported_settings_raise(self):
+        layer = line_layer([line_geometry(20, seed=1)])
+        with self.assertRaises(ValueError):
+            NodePipeline(layer, None, PipelineParams("out", cell_crossings=True))
+        with tempfile.TemporaryDirectory() as d:
+            dem = write_dem(os.path.join(d, "dem.tif"), -1000.0, -1000.0, 1000.0, 1000.0)
+            with self.assertRaises(ValueError):
+                NodePipeline(layer, dem, PipelineParams("out", cell_crossings=True, engine=ENGINE_QGIS))
+
+class _Feedback:
+    def __init__(self):
+        self.values = []
+
+    def setProgress(self, value):
+        self.values.append(value)
+
+    def isCanceled(self):
+        return False
+
+class TestFilteredProgress(unittest.TestCase):
+    def test_progress_counts_filtered_features(self):
+        layer = line_layer([line_geometry(20, seed=i) for i in range(10)], groups=2)
+        with tempfile.TemporaryDirectory() as d:
+            for workers in (1, 2):
+                feedback = _Feedback()
+                params = PipelineParams(os.path.join(d, f"w{workers}"), distance=5.0, write_shp=False,
+                                        workers=workers, chunk_size=1, filter_expression='"route" = 0')
+                result = NodePipeline(layer, None, params).run(feedback)
+                self.assertEqual(result.features, 5)
+                self.assertGreaterEqual(max(feedback.values[:-1]), 80.0)
+                self.assertEqual(feedback.values[-1], 100.0)
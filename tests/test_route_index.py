@@ -0,0 +1,106 @@
+import os, tempfile, time, unittest
+import numpy as np
+from line_node_processor.core.route_index import ChainageIndex
+
+def _index():
+    idx = ChainageIndex()
+    # an L-shaped route: 10 m east, then 20 m north, Z rising 1 m per metre
+    idx.add_part("A", np.array([0.0, 10.0, 10.0]), np.array([0.0, 0.0, 20.0]), np.array([0.0, 10.0, 30.0]), fid=1)
+    idx.add_part("B", np.array([100.0, 100.0]), np.array([0.0, 50.0]), fid=2)
+    return idx
+
+class TestLocate(unittest.TestCase):
+    def test_kp_to_position(self):
+        x, y, z, az = _index().locate("A", [0.0, 5.0, 10.0, 25.0, 30.0])
+        np.testing.assert_allclose(x, [0, 5, 10, 10, 10])
+        np.testing.assert_allclose(y, [0, 0, 0, 15, 20])
+        np.testing.assert_allclose(z, [0, 5, 10, 25, 30])
+        np.testing.assert_allclose(az, [90, 90, 0, 0, 0])
+
+    def test_off_route_is_nan(self):
+        x, _, z, _ = _index().locate("B", [-1.0, 10.0, 51.0])
+        self.assertTrue(np.isnan(x[0]) and np.isnan(x[2]))
+        self.assertEqual(x[1], 100.0)
+        self.assertTrue(np.isnan(z[1]))
+
+    def test_unknown_route(self):
+        with self.assertRaises(KeyError):
+            _index().locate("C", [0.0])
+
+class TestProject(unittest.TestCase):
+    def test_point_to_kp(self):
+        hit = _index().project([6.0, 12.0, 98.0], [1.0, 15.0, 40.0])
+        self.assertEqual(hit.route, ["A", "A", "B"])
+        np.testing.assert_allclose(hit.kp, [6.0, 25.0, 40.0])
+        np.testing.assert_allclose(hit.offset, [1.0, 2.0, 2.0])
+        np.testing.assert_array_equal(hit.fid, [1, 1, 2])
+
+    def test_route_filter_and_max_distance(self):
+        idx = _index()
+        hit = idx.project([98.0], [40.0], route="A")
+        self.assertEqual(hit.route, ["A"])
+        hit = idx.project([98.0], [40.0], route="A", max_distance=10.0)
+        self.assertIsNone(hit.route[0])
+        self.assertTrue(np.isnan(hit.kp[0]))
+
+class TestPersistence(unittest.TestCase):
+    def test_roundtrip(self):
+        idx = _index()
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "index.npz")
+            idx.save(path)
+            back = ChainageIndex.load(path)
+        self.assertEqual(back.routes, ["A", "B"])
+        for a, b in zip(idx.locate("A", [3.0, 17.0]), back.locate("A", [3.0, 17.0])):
+            np.testing.assert_array_equal(a, b)
+
+class TestManyPieces(unittest.TestCase):
+    N = 20000
+
+    def test_locate_continuous_route(self):
+        # pieces 10 m long end to end along the x axis, added out of order
+        idx = ChainageIndex()
+        for i in np.random.default_rng(0).permutation(self.N).tolist():
+            idx.add_part("A", np.array([10.0 * i, 10.0 * i + 4.0, 10.0 * i + 10.0]), np.zeros(3),
+                         fid=i, kp0=10.0 * i)
+        kps = np.random.default_rng(1).uniform(-5.0, 10.0 * self.N + 5.0, 100_000)
+        t0 = time.perf_counter()
+        x, y, _, az = idx.locate("A", kps)
+        self.assertLess(time.perf_counter() - t0, 2.0)
+        inside = (kps >= 0) & (kps <= 10.0 * self.N)
+        np.testing.assert_allclose(x[inside], kps[inside])
+        np.testing.assert_allclose(az[inside], 90.0)
+        self.assertTrue(np.isnan(x[~inside]).all())
+
+    def test_locate_overlapping_pieces(self):
+        # every feature restarts at KP 0: the first piece wins unless fid selects one
+        idx = ChainageIndex()
+        for i in range(50):
+            idx.add_part("A", np.array([0.0, 10.0 + i]), np.full(2, float(i)), fid=i)
+        _, y, _, _ = idx.locate("A", [5.0, 30.0, 58.0, 60.0])
+        np.testing.assert_array_equal(y[:3], [0.0, 20.0, 48.0])
+        self.assertTrue(np.isnan(y[3]))
+        _, y, _, _ = idx.locate("A", [5.0], fid=7)
+        self.assertEqual(y[0], 7.0)
+
+    def test_project_matches_brute_force(self):
+        rng = np.random.default_rng(2)
+        idx = ChainageIndex()
+        segs = []
+        for i in range(2000):
+            xs = np.cumsum(rng.uniform(0.5, 20.0, 6)) + 200.0 * (i % 50)
+            ys = rng.uniform(-50.0, 50.0, 6) + 300.0 * (i // 50)
+            idx.add_part(f"R{i % 7}", xs, ys, fid=i)
+            segs.extend(zip(xs[:-1], ys[:-1], xs[1:], ys[1:]))
+        x0, y0, x1, y1 = np.array(segs).T
+        px = rng.uniform(-500.0, 10500.0, 2000)
+        py = rng.uniform(-500.0, 12500.0, 2000)
+        t0 = time.perf_counter()
+        hit = idx.project(px, py)
+        self.assertLess(time.perf_counter() - t0, 5.0)
+        dx, dy = x1 - x0, y1 - y0
+        t = np.clip(((px[:, None] - x0) * dx + (py[:, None] - y0) * dy) / (dx * dx + dy * dy), 0.0, 1.0)
+        d = np.hypot(x0 + t * dx - px[:, None], y0 + t * dy - py[:, None]).min(axis=1)
+        np.testing.assert_allclose(hit.offset, d, atol=1e-9)
+        near = idx.project(px, py, max_distance=25.0)
+        np.testing.assert_array_equal(np.isnan(near.kp), d > 25.0)
@@ -1,10 +1,101 @@
 import unittest
+import numpy as np
 from qgis.core import QgsGeometry, QgsPointXY
 from line_node_processor.core.sampling import GeometrySampler
+from line_node_processor.core.chainage import (
+    merge_station_lists, merge_sorted, drop_coincident, cell_crossings, cumulative_lengths, interpolate_z
+)
 
 class TestGeometrySampler(unittest.TestCase):
     def test_sample_distance(self):
         line = QgsGeometry.fromPolylineXY([QgsPointXY(0,0), QgsPointXY(10,0)])
         sampler = GeometrySampler(5.0, False)
-        pts = sampler.sample_geometry(line)
+        pts = sampler.sample_geometry_with_kp(line)
         self.assertTrue(len(pts) >= 3)
+        self.assertEqual([kp for _, kp in pts], [0.0, 5.0, 10.0])
+
+def _legacy_sort_dedupe(pts):
+    # sort + rounded-key set dedupe used before the streaming merge
+    pts = sorted(pts, key=lambda t: (round(t[1],6), round(t[0].x(),6), round(t[0].y(),6)))
+    uniq, seen = [], set()
+    for p,kp in pts:
+        key = (round(kp,6), round(p.x(),6), round(p.y(),6))
+        if key in seen: continue
+        seen.add(key); uniq.append((p,kp))
+    return uniq
+
+class TestStationMerge(unittest.TestCase):
+    def setUp(self):
+        # stations every 2.5 m along an L-shaped line, plus its vertices (one repeated)
+        verts = [(0.0, 0.0, 0.0), (5.0, 0.0, 5.0), (5.0, 0.0, 5.0), (5.0, 3.0, 8.0), (5.0, 8.0, 13.0)]
+        stations = [(0.0, 0.0, 0.0), (2.5, 0.0, 2.5), (5.0, 0.0, 5.0), (5.0, 2.5, 7.5),
+                    (5.0, 5.0, 10.0), (5.0, 7.5, 12.5), (5.0, 8.0, 13.0)]
+        self.a = [(QgsPointXY(x, y), k) for x, y, k in stations]
+        self.b = [(QgsPointXY(x, y), k) for x, y, k in verts]
+
+    def _xyk(self, pts):
+        return [(round(p.x(),9), round(p.y(),9), round(k,9)) for p, k in pts]
+
+    def test_streaming_merge_matches_legacy(self):
+        merged = merge_station_lists([p for p, _ in self.a], [k for _, k in self.a],
+                                     [p for p, _ in self.b], [k for _, k in self.b])
+        self.assertEqual(self._xyk(merged), self._xyk(_legacy_sort_dedupe(self.a + self.b)))
+
+    def test_array_merge_matches_legacy(self):
+        arr = lambda pts, f: np.array([f(t) for t in pts], dtype=float)
+        xs, ys, ks = merge_sorted(arr(self.a, lambda t: t[0].x()), arr(self.a, lambda t: t[0].y()), arr(self.a, lambda t: t[1]),
+                                  arr(self.b, lambda t: t[0].x()), arr(self.b, lambda t: t[0].y()), arr(self.b, lambda t: t[1]))
+        xs, ys, ks = drop_coincident(xs, ys, ks)
+        got = [(round(x,9), round(y,9), round(k,9)) for x, y, k in zip(xs, ys, ks)]
+        self.assertEqual(got, self._xyk(_legacy_sort_dedupe(self.a + self.b)))
+
+    def test_engines_agree(self):
+        line = QgsGeometry.fromPolylineXY([QgsPointXY(0,0), QgsPointXY(5,0), QgsPointXY(5,8)])
+        for dist in (0.0, 2.5, 3.0):
+            legacy = GeometrySampler(dist, True, engine="qgis").sample_geometry_with_kp(line)
+            fast = GeometrySampler(dist, True, engine="numpy").sample_geometry_with_kp(line)
+            self.assertEqual(self._xyk(fast), self._xyk(legacy))
+
+    def test_multi_distance_matches_single(self):
+        line = QgsGeometry.fromPolylineXY([QgsPointXY(0,0), QgsPointXY(7.3,0), QgsPointXY(7.3,25.1)])
+        dists = (1.0, 10.0, 0.0, 2.5)
+        multi = GeometrySampler(1.0, True).sample_arrays_multi(line, dists)
+        for dist, got in zip(dists, multi):
+            ref = GeometrySampler(dist, True).sample_arrays(line)
+            for a, b in zip(got, ref):
+                np.testing.assert_array_equal(a, b)
+
+class TestCellCrossings(unittest.TestCase):
+    def test_crossings_on_both_axes(self):
+        # pixel coordinates: three column lines, then two row lines
+        col, row = np.array([0.5, 3.5, 3.5]), np.array([0.5, 0.5, 2.2])
+        ds = cell_crossings(col, row, cumulative_lengths(col, row))
+        np.testing.assert_allclose(ds, [0.5, 1.5, 2.5, 3.5, 4.5])
+
+    def test_no_crossing_inside_one_cell(self):
+        col, row = np.array([0.1, 0.9]), np.array([0.2, 0.8])
+        self.assertEqual(len(cell_crossings(col, row, cumulative_lengths(col, row))), 0)
+
+class TestInterpolateZ(unittest.TestCase):
+    def test_linear_between_vertices(self):
+        chain, zs = np.array([0.0, 10.0, 20.0]), np.array([100.0, 110.0, 90.0])
+        np.testing.assert_allclose(interpolate_z(chain, zs, np.array([0.0, 5.0, 15.0, 20.0])),
+                                   [100.0, 105.0, 100.0, 90.0])
+
+    def test_missing_z_stays_nan(self):
+        chain, zs = np.array([0.0, 10.0, 20.0]), np.array([100.0, np.nan, 90.0])
+        got = interpolate_z(chain, zs, np.array([0.0, 5.0, 20.0]))
+        self.assertEqual(got[0], 100.0)
+        self.assertTrue(np.isnan(got[1]))
+        self.assertEqual(got[2], 90.0)
+
+class TestMultipartKP(unittest.TestCase):
+    def test_kp_continues_over_parts(self):
+        # the second part lies "behind" the first; its stations must not interleave
+        geom = QgsGeometry.fromMultiPolylineXY([[QgsPointXY(0, 0), QgsPointXY(10, 0)],
+                                                [QgsPointXY(-5, 5), QgsPointXY(-5, 9)]])
+        xs, ys, kps = GeometrySampler(2.0, True).sample_arrays(geom)
+        self.assertTrue(np.all(np.diff(kps) >= 0))
+        self.assertEqual(kps[-1], 14.0)
+        np.testing.assert_array_equal(xs[-3:], [-5.0, -5.0, -5.0])
+        np.testing.assert_array_equal(kps[-3:], [10.0, 12.0, 14.0])
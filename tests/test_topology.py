@@ -0,0 +1,57 @@
+import random, time, unittest
+from line_node_processor.core.topology import build_route, EndpointIndex, GAP, BRANCH
+
+class TestEndpointIndex(unittest.TestCase):
+    def test_snaps_within_tolerance(self):
+        idx = EndpointIndex(0.01)
+        a = idx.node(10.0, 0.0)
+        self.assertEqual(idx.node(10.005, -0.004), a)
+        self.assertNotEqual(idx.node(10.02, 0.0), a)
+
+class TestBuildRoute(unittest.TestCase):
+    def test_chain_flips_pieces_against_the_route(self):
+        # middle piece listed first and digitised backwards
+        r = build_route("g", ["m", "s", "e"], [(20, 0), (0, 0), (20, 0)], [(10, 0), (10, 0), (30, 0)], [10, 10, 10])
+        self.assertEqual(r.pieces, {"e": (0.0, True), "m": (10.0, False), "s": (20.0, True)})
+        self.assertEqual(r.order, ["e", "m", "s"])
+        self.assertEqual(r.issues, [])
+        self.assertEqual(r.length, 30.0)
+
+    def test_gap_is_reported_not_counted(self):
+        r = build_route("g", ["a", "b"], [(0, 0), (15, 0)], [(10, 0), (25, 0)], [10, 10])
+        self.assertEqual(r.pieces["b"], (10.0, False))
+        self.assertEqual([(t.kind, t.size, t.kp) for t in r.issues], [(GAP, 5.0, 10.0)])
+
+    def test_branch_prefers_the_longer_chain(self):
+        keys = ["a", "spur", "main"]
+        r = build_route("g", keys, [(0, 0), (10, 0), (10, 0)], [(10, 0), (10, 5), (40, 0)], [10, 5, 30])
+        self.assertEqual(r.order, ["a", "main", "spur"])
+        branch = [t for t in r.issues if t.kind == BRANCH]
+        self.assertEqual(len(branch), 1)
+        self.assertEqual((branch[0].x, branch[0].y, branch[0].size, branch[0].kp), (10, 0, 3, 10.0))
+
+    def test_closed_loop(self):
+        r = build_route("g", ["a", "b"], [(0, 0), (5, 0)], [(5, 0), (0, 0)], [5, 5])
+        self.assertEqual(r.pieces, {"a": (0.0, False), "b": (5.0, False)})
+        self.assertEqual(r.issues, [])
+
+    def test_many_disjoint_pieces_scale_linearly(self):
+        # pieces 1 m long with 0.5 m gaps, listed in a shuffled order
+        def run(n):
+            idx = list(range(n))
+            random.Random(n).shuffle(idx)
+            idx.remove(0)
+            idx.insert(0, 0)
+            t0 = time.perf_counter()
+            r = build_route("g", idx, [(1.5 * i, 0.0) for i in idx], [(1.5 * i + 1, 0.0) for i in idx],
+                            [1.0] * n, tol=0.01)
+            return r, time.perf_counter() - t0
+
+        r, small = run(2000)
+        self.assertEqual(r.order, list(range(2000)))
+        self.assertEqual(len(r.issues), 1999)
+        self.assertEqual(r.length, 2000.0)
+        r, large = run(16000)
+        self.assertEqual(r.order, list(range(16000)))
+        # quadratic linking would take 64 times as long
+        self.assertLess(large, 24 * small + 0.5)
@@ -3,13 +3,12 @@ from typing import Optional
 from qgis.PyQt.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
     QLineEdit, QCheckBox, QFileDialog, QMessageBox, QWidget,
-    QGroupBox, QGridLayout, QFormLayout, QSizePolicy, QSpacerItem
+    QGroupBox, QGridLayout, QFormLayout, QSizePolicy, QSpacerItem, QSpinBox,
+    QProgressBar
 )
-from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtCore import Qt, QTimer
 from qgis.core import (
-    QgsProject, QgsVectorLayer, QgsRasterLayer, QgsCoordinateReferenceSystem,
-    QgsCoordinateTransform, QgsWkbTypes, QgsFeatureRequest, QgsFeature, QgsGeometry,
-    QgsPointXY, QgsUnitTypes
+    QgsApplication, QgsProject, QgsVectorLayer, QgsRasterLayer, QgsWkbTypes, QgsCoordinateTransform
 )
 from qgis.gui import QgsMapLayerComboBox
 try:
@@ -17,20 +16,23 @@ try:
 except ImportError:
     from qgis.gui import QgsMapLayerProxyModel    # 後備（少數客製環境）
 
-from ..core.sampling import GeometrySampler
-from ..core.assembler import AttributeAssembler
-from ..core.elevation import ElevationSampler
-from ..core.rounding import round_by_distance
-from ..core.azimuth import Azimuth
-from ..infra.layer_io import CRSGuard
-from ..infra.exporter import Exporter, sanitize_name
-
-WGS84 = QgsCoordinateReferenceSystem('EPSG:4326')
+from ..core.options import (
+    ENGINE_NUMPY, ENGINE_QGIS, MODE_POINT, MODE_WINDOW, MODE_TILED, NEAREST, BILINEAR,
+    ORDER_PRIORITY, ORDER_RESOLUTION, Z_GEOMETRY, Z_DEM, GPKG_SINGLE, GPKG_LAYERS,
+    FORMAT_PYTHON, FORMAT_NUMPY, INDEX_FILE, TOPOLOGY_FILE
+)
+from ..infra.layer_io import CRSGuard, LayerHandleCache
+from ..infra.pipeline import NodePipeline, PipelineParams, parse_distances
+from ..infra.task import NodePipelineTask
+from ..infra.timing import TIMINGS_FILE
 
 class LineNodeProcessorDialog(QDialog):
     def __init__(self, iface):
         super().__init__(iface.mainWindow())
         self.iface = iface
+        self._task = None
+        self._run_layers = None
+        self._layers = LayerHandleCache()
         self.setWindowTitle("Line Node Processor")
         self.setMinimumSize(800, 560)
         self.setSizeGripEnabled(True)
@@ -82,7 +84,18 @@ class LineNodeProcessorDialog(QDialog):
 
         frmVec.addRow(self._L("Project line:"), self.cmbLine)
         frmVec.addRow(self._L("External:"), self._wrap(row_ext_vec))
+        row_filter = QHBoxLayout()
+        self.txtFilter = QLineEdit()
+        self.txtFilter.setPlaceholderText("expression, e.g. \"route\" = 'A'; blank ⇒ all features")
+        self.txtFilter.setClearButtonEnabled(True)
+        self.chkExtent = QCheckBox("Map extent only")
+        self.chkExtent.setToolTip("Process only the features intersecting the current map view")
+        row_filter.addWidget(self.txtFilter, 1)
+        row_filter.addWidget(self.chkExtent)
+        row_filter.setSpacing(8)
+
         frmVec.addRow(self._L("Group field:"), self.cmbGroup)
+        frmVec.addRow(self._L("Filter:"), self._wrap(row_filter))
 
         # ---- Right: Raster (DEM) ----
         grpRas = QGroupBox("Elevation (Raster)")
@@ -111,7 +124,41 @@ class LineNodeProcessorDialog(QDialog):
 
         frmRas.addRow(self._L("Project raster:"), self.cmbRas)
         frmRas.addRow(self._L("External:"), self._wrap(row_ext_ras))
+        self.cmbDemMode = QComboBox()
+        self.cmbDemMode.addItem("Per-part window – nearest", f"{MODE_WINDOW}:{NEAREST}")
+        self.cmbDemMode.addItem("Per-part window – bilinear", f"{MODE_WINDOW}:{BILINEAR}")
+        self.cmbDemMode.addItem("Per point (provider.sample)", f"{MODE_POINT}:{NEAREST}")
+        self.cmbDemMode.addItem("Tiled cache – nearest", f"{MODE_TILED}:{NEAREST}")
+        self.cmbDemMode.addItem("Tiled cache – bilinear", f"{MODE_TILED}:{BILINEAR}")
+        self.spnCacheMB = QSpinBox()
+        self.spnCacheMB.setRange(16, 65536)
+        self.spnCacheMB.setValue(256)
+        self.spnCacheMB.setSuffix(" MB")
+
+        row_tiles = QHBoxLayout()
+        self.txtTiles = QLineEdit()
+        self.txtTiles.setPlaceholderText("files/folders, ';'-separated ⇒ mosaic")
+        self.txtTiles.setClearButtonEnabled(True)
+        self.btnPickTiles = QPushButton("Folder…")
+        self.cmbTileOrder = QComboBox()
+        self.cmbTileOrder.addItem("listed order", ORDER_PRIORITY)
+        self.cmbTileOrder.addItem("finest first", ORDER_RESOLUTION)
+        self.cmbTileOrder.setToolTip("Which raster is used where tiles overlap; the next one fills nodata")
+        row_tiles.addWidget(self.txtTiles, 1)
+        row_tiles.addWidget(self.btnPickTiles)
+        row_tiles.addWidget(self.cmbTileOrder)
+        row_tiles.setSpacing(8)
+        frmRas.addRow(self._L("DEM tiles:"), self._wrap(row_tiles))
+
         frmRas.addRow(self._L("DEM band:"), self.cmbBand)
+        frmRas.addRow(self._L("Read mode:"), self.cmbDemMode)
+        frmRas.addRow(self._L("Tile cache:"), self.spnCacheMB)
+
+        self.cmbZSource = QComboBox()
+        self.cmbZSource.addItem("Geometry Z (DEM fills gaps)", Z_GEOMETRY)
+        self.cmbZSource.addItem("DEM only", Z_DEM)
+        self.cmbZSource.setToolTip("For 3D lines: use the vertex Z values and read the DEM only where Z is missing")
+        frmRas.addRow(self._L("Elevation from:"), self.cmbZSource)
 
         # ---- Bottom: Sampling / Options ----
         grpOpt = QGroupBox("Sampling / Options")
@@ -123,19 +170,64 @@ class LineNodeProcessorDialog(QDialog):
         frmOpt.setFieldGrowthPolicy(QFormLayout.AllNonFixedFieldsGrow)
 
         self.txtDist = QLineEdit()
-        self.txtDist.setPlaceholderText("blank ⇒ vertices only")
+        self.txtDist.setPlaceholderText("blank ⇒ vertices only; 1, 10, 100 ⇒ one run")
         self.txtDist.setClearButtonEnabled(True)
 
         optRow = QHBoxLayout()
         self.chkKeepVerts = QCheckBox("Preserve vertices"); self.chkKeepVerts.setChecked(True)
         self.chkPreserveAttrs = QCheckBox("Keep attributes"); self.chkPreserveAttrs.setChecked(True)
         self.chkWriteSHP = QCheckBox("Write Shapefile"); self.chkWriteSHP.setChecked(True)
+        self.chkBulkCsv = QCheckBox("NumPy CSV formatting"); self.chkBulkCsv.setChecked(False)
+        self.chkCache = QCheckBox("Reuse unchanged features"); self.chkCache.setChecked(False)
+        self.chkCache.setToolTip("Keep a result cache in the output folder; only edited or new features are resampled")
+        self.chkProfile = QCheckBox("Stage timings"); self.chkProfile.setChecked(False)
+        self.chkCells = QCheckBox("DEM cell crossings"); self.chkCells.setChecked(False)
+        self.chkCells.setToolTip("Add a station wherever the line enters a new DEM cell (single raster, NumPy engine)")
+        self.chkProfile.setToolTip("Report time per stage when done and write node_timings.json to the output folder")
+        self.chkRoute = QCheckBox("Continuous KP"); self.chkRoute.setChecked(False)
+        self.chkRoute.setToolTip("Chain the parts and features of each group end to end; KP and Total_3D_Length "
+                                 f"run over the whole route. Gaps and branches go to {TOPOLOGY_FILE}")
+        self.chkGroupOrdered = QCheckBox("Group by group"); self.chkGroupOrdered.setChecked(False)
+        self.chkGroupOrdered.setToolTip("Read the features one group at a time and finish each group's outputs "
+                                        "before the next; memory is bounded by the largest group")
+        self.chkIndex = QCheckBox("KP index"); self.chkIndex.setChecked(False)
+        self.chkIndex.setToolTip(f"Write {INDEX_FILE} for KP ↔ coordinate lookups on the processed routes")
         optRow.setSpacing(14)
         optRow.addWidget(self.chkKeepVerts)
         optRow.addWidget(self.chkPreserveAttrs)
         optRow.addWidget(self.chkWriteSHP)
+        optRow.addWidget(self.chkBulkCsv)
+        optRow.addWidget(self.chkCache)
+        optRow.addWidget(self.chkProfile)
+        optRow.addWidget(self.chkCells)
+        optRow.addWidget(self.chkRoute)
+        optRow.addWidget(self.chkGroupOrdered)
+        optRow.addWidget(self.chkIndex)
         optRow.addStretch(1)
 
+        self.cmbEngine = QComboBox()
+        self.cmbEngine.addItem("NumPy (chainage arrays)", ENGINE_NUMPY)
+        self.cmbEngine.addItem("QGIS (legacy lineLocatePoint)", ENGINE_QGIS)
+
+        fmtRow = QHBoxLayout()
+        self.chkWriteCSV = QCheckBox("CSV"); self.chkWriteCSV.setChecked(True)
+        self.chkWriteGPKG = QCheckBox("GeoPackage"); self.chkWriteGPKG.setChecked(False)
+        self.cmbGpkgLayout = QComboBox()
+        self.cmbGpkgLayout.addItem("one layer (group column)", GPKG_SINGLE)
+        self.cmbGpkgLayout.addItem("layer per group", GPKG_LAYERS)
+        self.chkWriteParquet = QCheckBox("GeoParquet"); self.chkWriteParquet.setChecked(False)
+        fmtRow.setSpacing(14)
+        fmtRow.addWidget(self.chkWriteCSV)
+        fmtRow.addWidget(self.chkWriteGPKG)
+        fmtRow.addWidget(self.cmbGpkgLayout)
+        fmtRow.addWidget(self.chkWriteParquet)
+        fmtRow.addStretch(1)
+
+        self.spnWorkers = QSpinBox()
+        self.spnWorkers.setRange(1, max(os.cpu_count() or 1, 1))
+        self.spnWorkers.setValue(1)
+        self.spnWorkers.setToolTip("Features are processed in chunks on this many threads; output order is unchanged.")
+
         outRow = QHBoxLayout()
         self.txtOut = QLineEdit()
         self.btnOut = QPushButton("Browse…")
@@ -145,14 +237,23 @@ class LineNodeProcessorDialog(QDialog):
 
         frmOpt.addRow(self._L("Distance (m):"), self.txtDist)
         frmOpt.addRow(self._L("Options:"), self._wrap(optRow))
+        frmOpt.addRow(self._L("Formats:"), self._wrap(fmtRow))
+        frmOpt.addRow(self._L("Engine:"), self.cmbEngine)
+        frmOpt.addRow(self._L("Workers:"), self.spnWorkers)
         frmOpt.addRow(self._L("Output folder:"), self._wrap(outRow))
 
         # ---- Buttons ----
         btnRow = QHBoxLayout()
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 100)
+        self.progress.setVisible(False)
         self.btnRun = QPushButton("Run")
+        self.btnCancel = QPushButton("Cancel"); self.btnCancel.setEnabled(False)
         self.btnClose = QPushButton("Close")
+        btnRow.addWidget(self.progress, 1)
         btnRow.addStretch(1)
         btnRow.addWidget(self.btnRun)
+        btnRow.addWidget(self.btnCancel)
         btnRow.addWidget(self.btnClose)
         btnRow.setSpacing(10)
 
@@ -170,16 +271,23 @@ class LineNodeProcessorDialog(QDialog):
         self.btnPickVec.clicked.connect(self.pick_vec)
         self.btnPickRas.clicked.connect(self.pick_ras)
         self.btnOut.clicked.connect(self.pick_out)
+        self.btnPickTiles.clicked.connect(self.pick_tiles)
         self.btnRun.clicked.connect(self.run_now)
+        self.btnCancel.clicked.connect(self.cancel_run)
         self.btnClose.clicked.connect(self.close)
 
         self.cmbLine.layerChanged.connect(self.on_line_layer_changed)
         self.cmbRas.layerChanged.connect(self.on_raster_layer_changed)
 
-        # Project layer change listeners → update dependent combos
+        # Project layer change listeners → update dependent combos. A project load adds
+        # layers in bursts: refreshes are coalesced, and a hidden dialog refreshes when shown
+        self._refresh_pending = False
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(300)
+        self._refresh_timer.timeout.connect(self.refresh_from_project)
         QgsProject.instance().layersAdded.connect(self.on_project_layers_changed)
         QgsProject.instance().layersRemoved.connect(self.on_project_layers_changed)
-        QgsProject.instance().layerWasAdded.connect(self.on_project_layers_changed)
 
         # Initial populate
         self.on_line_layer_changed(self.cmbLine.currentLayer())
@@ -193,6 +301,18 @@ class LineNodeProcessorDialog(QDialog):
 
     # ----- project layer changes -----
     def on_project_layers_changed(self, *args, **kwargs):
+        if not self.isVisible():
+            self._refresh_pending = True
+            return
+        self._refresh_timer.start()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._refresh_pending:
+            self._refresh_pending = False
+            self.refresh_from_project()
+
+    def refresh_from_project(self):
         if not self.chkExtVec.isChecked():
             self.on_line_layer_changed(self.cmbLine.currentLayer())
         if not self.chkExtRas.isChecked():
@@ -206,7 +326,7 @@ class LineNodeProcessorDialog(QDialog):
         if self.chkExtVec.isChecked():
             path = self.btnPickVec.property("path")
             if path:
-                lyr = QgsVectorLayer(path, os.path.basename(path), "ogr")
+                lyr = self._layers.vector(path)
         else:
             lyr = layer
         if isinstance(lyr, QgsVectorLayer) and lyr.isValid():
@@ -223,7 +343,7 @@ class LineNodeProcessorDialog(QDialog):
         if self.chkExtRas.isChecked():
             path = self.btnPickRas.property("path")
             if path:
-                rlyr = QgsRasterLayer(path, os.path.basename(path))
+                rlyr = self._layers.raster(path)
         else:
             rlyr = layer
         if isinstance(rlyr, QgsRasterLayer) and rlyr.isValid():
@@ -265,6 +385,12 @@ class LineNodeProcessorDialog(QDialog):
             self.btnPickRas.setText(os.path.basename(path))
             self.on_raster_layer_changed(self.cmbRas.currentLayer())
 
+    def pick_tiles(self):
+        path = QFileDialog.getExistingDirectory(self, "Select DEM tile folder", "")
+        if path:
+            cur = self.txtTiles.text().strip()
+            self.txtTiles.setText(f"{cur};{path}" if cur else path)
+
     def pick_out(self):
         path = QFileDialog.getExistingDirectory(self, "Select output folder", "")
         if path:
@@ -275,7 +401,7 @@ class LineNodeProcessorDialog(QDialog):
         if self.chkExtVec.isChecked():
             path = self.btnPickVec.property("path")
             if not path: return None
-            v = QgsVectorLayer(path, os.path.basename(path), "ogr")
+            v = self._layers.vector(path)
             return v if (v and v.isValid() and v.geometryType()==QgsWkbTypes.LineGeometry) else None
         else:
             lyr = self.cmbLine.currentLayer()
@@ -285,7 +411,7 @@ class LineNodeProcessorDialog(QDialog):
         if self.chkExtRas.isChecked():
             path = self.btnPickRas.property("path")
             if not path: return None
-            r = QgsRasterLayer(path, os.path.basename(path))
+            r = self._layers.raster(path)
             return r if (r and r.isValid()) else None
         else:
             lyr = self.cmbRas.currentLayer()
@@ -304,139 +430,99 @@ class LineNodeProcessorDialog(QDialog):
             return
 
         dist_txt = self.txtDist.text().strip()
-        if dist_txt == "":
-            distance = 0.0
-            keep_vertices = True   # vertices only
-            dist_label = "verts"
-        else:
-            try:
-                distance = float(dist_txt)
-            except:
-                QMessageBox.critical(self, "Error", "Distance must be a number or left blank.")
-                return
-            if distance < 0:
-                QMessageBox.critical(self, "Error", "Distance must be >= 0.")
-                return
-            keep_vertices = self.chkKeepVerts.isChecked()
-            dist_label = (str(int(distance)) if abs(distance - int(distance)) < 1e-9 else str(distance))
+        try:
+            # "1, 10, 100" → one pass, one set of outputs per distance
+            distances, dist_labels = parse_distances(dist_txt)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        keep_vertices = True if dist_txt == "" else self.chkKeepVerts.isChecked()   # blank ⇒ vertices only
+
+        if not any(c.isChecked() for c in (self.chkWriteCSV, self.chkWriteSHP, self.chkWriteGPKG, self.chkWriteParquet)):
+            QMessageBox.critical(self, "Error", "Please select at least one output format.")
+            return
 
         preserve_attrs = self.chkPreserveAttrs.isChecked()
         write_shp = self.chkWriteSHP.isChecked()
         group_field = self.cmbGroup.currentData() or None
+        engine = self.cmbEngine.currentData() or ENGINE_NUMPY
 
         crs = vlyr.crs()
         if CRSGuard.is_geographic(crs) or CRSGuard.map_units_not_meters(crs):
             QMessageBox.critical(self, "Error", "Input layer must be projected in meters (not geographic).")
             return
 
-        rlyr = self._load_raster()
+        extent = None
+        if self.chkExtent.isChecked():
+            canvas = self.iface.mapCanvas()
+            extent = QgsCoordinateTransform(canvas.mapSettings().destinationCrs(), crs,
+                                            QgsProject.instance()).transformBoundingBox(canvas.extent())
+
+        dem_sources = [t.strip() for t in self.txtTiles.text().split(";") if t.strip()]
+        rlyr = None if dem_sources else self._load_raster()
         band = int(self.cmbBand.currentData() or 1)
+        dem_mode, dem_interp = (self.cmbDemMode.currentData() or f"{MODE_WINDOW}:{NEAREST}").split(":")
         if rlyr:
             if CRSGuard.is_geographic(rlyr.crs()) or CRSGuard.map_units_not_meters(rlyr.crs()):
                 QMessageBox.critical(self, "Error", "Elevation raster must be projected in meters.")
                 return
 
+        params = PipelineParams(
+            out_dir, distances=distances, dist_labels=dist_labels, keep_vertices=keep_vertices,
+            preserve_attrs=preserve_attrs, write_shp=write_shp, group_field=group_field,
+            band=band, engine=engine, dem_mode=dem_mode, dem_interp=dem_interp,
+            cache_mb=self.spnCacheMB.value(), workers=self.spnWorkers.value(),
+            csv_numeric=FORMAT_NUMPY if self.chkBulkCsv.isChecked() else FORMAT_PYTHON,
+            write_csv=self.chkWriteCSV.isChecked(), write_gpkg=self.chkWriteGPKG.isChecked(),
+            gpkg_layout=self.cmbGpkgLayout.currentData() or GPKG_SINGLE,
+            write_parquet=self.chkWriteParquet.isChecked(), use_cache=self.chkCache.isChecked(),
+            profile_path=os.path.join(out_dir, TIMINGS_FILE) if self.chkProfile.isChecked() else None,
+            cell_crossings=self.chkCells.isChecked(), dem_sources=dem_sources,
+            dem_order=self.cmbTileOrder.currentData() or ORDER_PRIORITY,
+            z_source=self.cmbZSource.currentData() or Z_GEOMETRY, build_index=self.chkIndex.isChecked(),
+            continuous_kp=self.chkRoute.isChecked(), group_ordered=self.chkGroupOrdered.isChecked(),
+            filter_expression=self.txtFilter.text().strip() or None, filter_extent=extent
+        )
         try:
-            os.makedirs(out_dir, exist_ok=True)
-            from qgis.core import QgsCoordinateTransform, QgsProject
-            xform_to_wgs84 = QgsCoordinateTransform(crs, WGS84, QgsProject.instance())
-            xform_to_raster = None
-            if rlyr and rlyr.crs() != crs:
-                xform_to_raster = QgsCoordinateTransform(crs, rlyr.crs(), QgsProject.instance())
-
-            elev_sampler = ElevationSampler(rlyr, xform_to_raster, band=band)
-            sampler = GeometrySampler(distance, keep_vertices)
-            assembler = AttributeAssembler(xform_to_wgs84, preserve_attrs)
-            exporter = Exporter(out_dir, write_shp)
-
-            from collections import defaultdict
-            group_rows = defaultdict(list)
-            group_pts  = defaultdict(list)
-
-            def round_policy(val):
-                return round_by_distance(val, distance)
-
-            has_dem = bool(rlyr)
-
-            total = vlyr.featureCount() or 0
-            req = QgsFeatureRequest()
-            for i, feat in enumerate(vlyr.getFeatures(req)):
-                if i % 50 == 0:
-                    self.iface.mainWindow().statusBar().showMessage(f"Processing {i}/{total}…")
-
-                geom = feat.geometry()
-                if not geom or geom.isEmpty():
-                    continue
-                if vlyr.wkbType() and vlyr.geometryType() != QgsWkbTypes.LineGeometry:
-                    continue
-
-                if group_field and group_field in feat.fields().names():
-                    gval = str(feat[group_field])
-                else:
-                    gval = f"feat_{feat.id()}"
-                safe = sanitize_name(gval)
-
-                parts = [geom] if not geom.isMultipart() else [QgsGeometry(p.clone()) for p in geom.constParts()]
-                for part in parts:
-                    # sample points with KP (lineLocatePoint)
-                    samples = sampler.sample_geometry_with_kp(part)
-
-                    prev_xy = None
-                    prev_elev = None
-                    total_3d = 0.0 if has_dem else None
-
-                    for xy, kp in samples:
-                        elev = elev_sampler.sample(xy) if has_dem else None
-
-                        d2d = None; d3d = None
-                        if prev_xy is not None:
-                            dx = xy.x() - prev_xy.x()
-                            dy = xy.y() - prev_xy.y()
-                            d2d = (dx*dx + dy*dy) ** 0.5
-
-                            if has_dem:
-                                # 若任一端 elevation 缺值 ⇒ 用 2D 代替該段 3D；否則真 3D
-                                if (prev_elev is None) or (elev is None):
-                                    d3d = d2d
-                                else:
-                                    dz = elev - prev_elev
-                                    d3d = (d2d*d2d + dz*dz) ** 0.5
-
-                        az = Azimuth.compute(prev_xy, xy)
-
-                        d2d_r = round_policy(d2d) if d2d is not None else None
-                        d3d_r = round_policy(d3d) if d3d is not None else None
-
-                        # 保障 3D >= 2D
-                        if has_dem and d2d_r is not None and d3d_r is not None and d3d_r < d2d_r:
-                            d3d_r = d2d_r
-
-                        # 累積 3D：只有 DEM 時才累積；缺值段已等同 2D
-                        if has_dem and d3d_r is not None:
-                            total_3d = (total_3d or 0.0) + d3d_r
-
-                        row = assembler.assemble_row(
-                            xy=xy,
-                            elev=elev if has_dem else None,
-                            d2d=d2d_r,
-                            d3d=d3d_r if has_dem else None,
-                            azimuth=az,
-                            kp=round_policy(kp) if kp is not None else None,
-                            total3d=round_policy(total_3d) if (has_dem and total_3d) else None,
-                            feature=feat, group_field=group_field, group_value=gval
-                        )
-                        group_rows[safe].append(row)
-                        group_pts[safe].append((xy, row))
-
-                        prev_xy = xy
-                        prev_elev = elev if has_dem else None
-
-            # write outputs
-            for g, rows in group_rows.items():
-                exporter.write_csv(g, rows, dist_label)
-                exporter.write_point_shp(g, group_pts[g], rows, crs, dist_label)
-
-            QMessageBox.information(self, "Done", f"Export finished to:\n{out_dir}")
-
+            pipeline = NodePipeline(vlyr, rlyr, params)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Processing failed:\n{e}")
+            return
+
+        # keep external layers alive while the task runs
+        self._run_layers = (vlyr, rlyr)
+        self._task = NodePipelineTask(pipeline, self.on_run_finished)
+        self._task.progressChanged.connect(lambda v: self.progress.setValue(int(v)))
+        self._set_running(True)
+        QgsApplication.taskManager().addTask(self._task)
+
+    def cancel_run(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def _set_running(self, running: bool):
+        self.btnRun.setEnabled(not running)
+        self.btnCancel.setEnabled(running)
+        self.progress.setValue(0)
+        self.progress.setVisible(running)
+
+    def on_run_finished(self, result, error):
+        self._task = None
+        self._run_layers = None
+        self._set_running(False)
+        if error is not None:
+            QMessageBox.critical(self, "Error", f"Processing failed:\n{error}")
+        elif result is None or result.canceled:
+            QMessageBox.warning(self, "Canceled", "Processing was canceled; outputs may be incomplete.")
+        else:
+            msg = f"Export finished to:\n{result.out_dir}"
+            if result.cache_hits or result.cache_misses:
+                msg += f"\n\nCache: {result.cache_hits} reused, {result.cache_misses} resampled"
+            if result.topology_path:
+                msg += (f"\n\nRoutes: {result.route_gaps} gaps, {result.route_branches} branches"
+                        + (f" (see {TOPOLOGY_FILE})" if result.route_gaps or result.route_branches else ""))
+            if result.index_path:
+                msg += f"\n\nKP index: {result.index_path}"
+            if result.timings is not None:
+                msg += f"\n\nTotal {result.seconds:.2f} s; per stage (summed over workers):\n{result.timings.summary()}"
+            QMessageBox.information(self, "Done", msg)